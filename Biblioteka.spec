@@ -6,7 +6,7 @@ a = Analysis(
     pathex=[],
     binaries=[],
     datas=[('frontend', 'frontend'), ('config', 'config')],
-    hiddenimports=['uvicorn.logging', 'uvicorn.loops', 'uvicorn.loops.auto', 'uvicorn.protocols', 'uvicorn.protocols.http', 'uvicorn.protocols.http.auto', 'uvicorn.protocols.websockets', 'uvicorn.protocols.websockets.auto', 'uvicorn.lifespan', 'uvicorn.lifespan.on', 'app.main', 'app.routes.auth', 'app.routes.books', 'app.routes.members', 'app.routes.loans', 'app.routes.reservations', 'app.routes.reports', 'app.routes.settings', 'app.routes.import_export'],
+    hiddenimports=['uvicorn.logging', 'uvicorn.loops', 'uvicorn.loops.auto', 'uvicorn.protocols', 'uvicorn.protocols.http', 'uvicorn.protocols.http.auto', 'uvicorn.protocols.websockets', 'uvicorn.protocols.websockets.auto', 'uvicorn.lifespan', 'uvicorn.lifespan.on', 'app.main', 'app.routes.auth', 'app.routes.books', 'app.routes.members', 'app.routes.loans', 'app.routes.reservations', 'app.routes.reports', 'app.routes.settings', 'app.routes.import_export', 'app.routes.search'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
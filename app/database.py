@@ -1,26 +1,108 @@
 import os
+import threading
+from fastapi import HTTPException
 from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
 DATABASE_PATH = os.environ.get("DATABASE_PATH", "library.db")
 DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
+# Named PRAGMA profiles, selected with SQLITE_PROFILE.
+# safe       — fsync on every commit (SQLite default durability)
+# balanced   — WAL + synchronous=NORMAL: a power loss may drop the last commits, never corrupts
+# throughput — no fsync at all; only for hardware with a UPS / easily restorable data
+SQLITE_PROFILES = {
+    "safe": {
+        "synchronous": "FULL",
+        "cache_size": -16000,        # KiB (negative = size, not pages)
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,        # ms
+        "wal_autocheckpoint": 1000,  # pages
+    },
+    "balanced": {
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 134217728,      # 128 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+        "wal_autocheckpoint": 1000,
+    },
+    "throughput": {
+        "synchronous": "OFF",
+        "cache_size": -256000,
+        "mmap_size": 536870912,      # 512 MiB
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+        "wal_autocheckpoint": 4000,
+    },
+}
+
+SQLITE_PROFILE = os.environ.get("SQLITE_PROFILE", "safe").strip().lower()
+if SQLITE_PROFILE not in SQLITE_PROFILES:
+    raise ValueError(
+        f"Unknown SQLITE_PROFILE '{SQLITE_PROFILE}'. Use one of: {', '.join(SQLITE_PROFILES)}"
+    )
+
+# All writes go through a single connection; requests queue for it instead of
+# racing each other into "database is locked". WRITE_QUEUE_SIZE bounds how many
+# write requests may wait at once, WRITE_QUEUE_TIMEOUT how long each one waits.
+WRITE_QUEUE_SIZE = int(os.environ.get("WRITE_QUEUE_SIZE", "32"))
+WRITE_QUEUE_TIMEOUT = float(os.environ.get("WRITE_QUEUE_TIMEOUT", "30"))
+READ_POOL_SIZE = int(os.environ.get("READ_POOL_SIZE", "8"))
+
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},
     echo=False,
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=WRITE_QUEUE_TIMEOUT,
 )
 
+read_engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    echo=False,
+    pool_size=READ_POOL_SIZE,
+    max_overflow=READ_POOL_SIZE,
+)
 
-@event.listens_for(engine, "connect")
-def _set_sqlite_pragma(dbapi_connection, connection_record):
+_write_slots = threading.BoundedSemaphore(WRITE_QUEUE_SIZE)
+
+
+def _configure_connection(dbapi_connection):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA journal_mode=WAL")
     cursor.execute("PRAGMA foreign_keys=ON")
+    for pragma, value in SQLITE_PROFILES[SQLITE_PROFILE].items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragma(dbapi_connection, connection_record):
+    _configure_connection(dbapi_connection)
+    # Let SQLAlchemy emit BEGIN itself (see _begin_immediate)
+    dbapi_connection.isolation_level = None
+
+
+@event.listens_for(engine, "begin")
+def _begin_immediate(conn):
+    # Take the write lock up front so a transaction never fails halfway on lock upgrade
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@event.listens_for(read_engine, "connect")
+def _set_sqlite_pragma_readonly(dbapi_connection, connection_record):
+    _configure_connection(dbapi_connection)
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
     cursor.close()
 
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 
 class Base(DeclarativeBase):
@@ -28,47 +110,39 @@ class Base(DeclarativeBase):
 
 
 def get_db():
+    """Writer session — for endpoints that modify data."""
+    if not _write_slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Server je zauzet, pokušajte ponovo")
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+        _write_slots.release()
+
+
+def get_read_db():
+    """Read-only session — for GET endpoints; never waits for the writer."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
 
 
 def init_db():
     from app.models import (
         Member, Membership, Book, BookCopy, Loan,
         Reservation, Staff, ActivityLog, Setting,
-        UserPermission, Notification,
+        UserPermission, Notification, NotificationOutbox,
     )
+    from app.services import counters  # noqa: F401 — registers the dashboard counter hook
+    from app.migrations import run_migrations
     Base.metadata.create_all(bind=engine)
-    _create_indices()
+    run_migrations(engine)
     _seed_defaults()
 
 
-def _create_indices():
-    from sqlalchemy import text
-    indices = [
-        "CREATE INDEX IF NOT EXISTS idx_books_title ON books(title)",
-        "CREATE INDEX IF NOT EXISTS idx_books_author ON books(author)",
-        "CREATE INDEX IF NOT EXISTS idx_books_genre ON books(genre)",
-        "CREATE INDEX IF NOT EXISTS idx_copies_lib_number ON book_copies(library_number)",
-        "CREATE INDEX IF NOT EXISTS idx_copies_status ON book_copies(status)",
-        "CREATE INDEX IF NOT EXISTS idx_members_last_name ON members(last_name)",
-        "CREATE INDEX IF NOT EXISTS idx_members_number ON members(member_number)",
-        "CREATE INDEX IF NOT EXISTS idx_loans_member ON loans(member_id)",
-        "CREATE INDEX IF NOT EXISTS idx_loans_due_date ON loans(due_date)",
-        "CREATE INDEX IF NOT EXISTS idx_loans_status ON loans(status)",
-        "CREATE INDEX IF NOT EXISTS idx_activity_user ON activity_log(user_id)",
-        "CREATE INDEX IF NOT EXISTS idx_activity_entity ON activity_log(entity, entity_id)",
-        "CREATE INDEX IF NOT EXISTS idx_notifications_trigger ON notifications(trigger_type, entity_id)",
-    ]
-    with engine.connect() as conn:
-        for idx in indices:
-            conn.execute(text(idx))
-        conn.commit()
-
-
 def _seed_defaults():
     from app.models.staff import Staff
     from app.models.setting import Setting
@@ -99,6 +173,7 @@ def _seed_defaults():
             "email_smtp_password": "",
             "email_sender_name": "Biblioteka",
             "email_enabled": "false",
+            "email_digest": "false",
             "currency": "RSD",
             "language": "sr",
         }
@@ -2,11 +2,9 @@ import os
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, Depends
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, HTTPException
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse
-from sqlalchemy.orm import Session
 
 # Load env
 from dotenv import load_dotenv
@@ -14,21 +12,36 @@ env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "config", ".
 if os.path.exists(env_path):
     load_dotenv(env_path)
 
-from app.database import init_db, get_db
+from app.database import init_db, ReadSessionLocal, read_engine
 from app.utils.scheduler import start_scheduler, stop_scheduler
-from app.utils.auth import decode_token
-from app.models.staff import Staff
-from app.models.user_permission import UserPermission
-from app.routes import auth, books, members, loans, reservations, reports, settings, import_export
+from app.utils.auth import resolve_principal
+from app.routes import auth, books, members, loans, reservations, reports, settings, import_export, search
+from app.services import typeahead
+from app.utils.cache import start_version_sync, table_versions
+from app.utils.static_assets import STATIC_DIR, static_files
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(name)s] %(levelname)s: %(message)s")
 logger = logging.getLogger("biblioteka")
 
 
+def _rebuild_typeahead():
+    db = ReadSessionLocal()
+    try:
+        typeahead.index.rebuild(db)
+    finally:
+        db.close()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Initializing database...")
     init_db()
+    # Pick up writes from other worker processes; their book/member edits rebuild our typeahead,
+    # at most once every TYPEAHEAD_REBUILD_INTERVAL seconds
+    start_version_sync(read_engine)
+    table_versions.on_foreign_change(("books", "members"), typeahead.CoalescedRebuild(_rebuild_typeahead).request)
+    logger.info("Building typeahead index...")
+    _rebuild_typeahead()
     logger.info("Starting scheduler...")
     start_scheduler()
     yield
@@ -43,13 +56,14 @@ app = FastAPI(
 )
 
 # Static files and templates
-static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "static")
 templates_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "frontend", "templates")
-os.makedirs(static_dir, exist_ok=True)
+os.makedirs(STATIC_DIR, exist_ok=True)
 os.makedirs(templates_dir, exist_ok=True)
 
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+# Content-hashed, immutably cached and precompressed (app.utils.static_assets)
+app.mount("/static", static_files, name="static")
 templates = Jinja2Templates(directory=templates_dir)
+templates.env.globals["asset_url"] = static_files.url
 
 # API Routes
 app.include_router(auth.router)
@@ -60,18 +74,17 @@ app.include_router(reservations.router)
 app.include_router(reports.router)
 app.include_router(settings.router)
 app.include_router(import_export.router)
+app.include_router(search.router)
 
 
-def _page_user(request: Request, db: Session):
-    """Resolve logged-in Staff from the access_token cookie. Returns None if missing/invalid."""
+def _page_principal(request: Request):
+    """Resolve the logged-in principal from the access_token cookie. Returns None if missing/invalid."""
     token = request.cookies.get("access_token")
     if not token:
         return None
     try:
-        payload = decode_token(token)
-        user_id = int(payload.get("sub"))
-        return db.query(Staff).filter(Staff.id == user_id, Staff.is_active == True).first()
-    except Exception:
+        return resolve_principal(token)
+    except HTTPException:
         return None
 
 
@@ -112,17 +125,13 @@ async def reports_page(request: Request):
 
 
 @app.get("/podesavanja", response_class=HTMLResponse)
-async def settings_page(request: Request, db: Session = Depends(get_db)):
-    user = _page_user(request, db)
-    if not user:
+async def settings_page(request: Request):
+    principal = _page_principal(request)
+    if not principal:
         return RedirectResponse(url="/login")
-    if not user.is_admin:
-        perms = {
-            p.module: p
-            for p in db.query(UserPermission).filter(UserPermission.user_id == user.id).all()
-        }
-        has_settings = bool(perms.get("settings") and perms["settings"].can_read)
-        has_books_write = bool(perms.get("books") and perms["books"].can_write)
+    if not principal.user.is_admin:
+        has_settings = principal.permissions.get("settings", (False, False))[0]
+        has_books_write = principal.permissions.get("books", (False, False))[1]
         if not has_settings and not has_books_write:
             return RedirectResponse(url="/dashboard")
     return templates.TemplateResponse("settings.html", {"request": request})
@@ -0,0 +1,175 @@
+"""
+Versioned schema migrations.
+
+Every migration runs exactly once; applied versions are recorded in the
+schema_migrations table. Tables for new models are still created by
+Base.metadata.create_all — migrations cover what create_all cannot:
+indices, virtual tables, triggers, new columns on existing tables and
+data backfills. A step is either an SQL string or a callable that receives
+the open connection.
+"""
+
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+logger = logging.getLogger("migrations")
+
+
+def _books_fts(conn):
+    from app.services.search import CREATE_BOOKS_FTS, rebuild_book_index
+    conn.execute(text(CREATE_BOOKS_FTS))
+    rebuild_book_index(conn)
+
+
+def _book_trigrams(conn):
+    from app.services.search import CREATE_BOOK_TRIGRAMS, rebuild_trigram_index
+    for statement in CREATE_BOOK_TRIGRAMS:
+        conn.execute(text(statement))
+    rebuild_trigram_index(conn)
+
+
+def _add_column(conn, table: str, column: str, ddl: str):
+    """ALTER TABLE ... ADD COLUMN unless create_all already made it (fresh databases)."""
+    columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _member_current_membership(conn):
+    from app.services.memberships import rebuild_current_memberships
+    _add_column(conn, "members", "current_membership_id", "INTEGER")
+    _add_column(conn, "members", "membership_valid_until", "DATE")
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS idx_members_membership_valid ON members(membership_valid_until)"
+    ))
+    rebuild_current_memberships(conn)
+
+
+def _dashboard_counters(conn):
+    from app.services.counters import actual_counts, write_counts
+    conn.execute(text("CREATE TABLE IF NOT EXISTS dashboard_counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)"))
+    write_counts(conn, actual_counts(conn, date.today()), date.today())
+
+
+def _circulation_rollups(conn):
+    from app.services.circulation import CREATE_TABLES, rebuild
+    for statement in CREATE_TABLES:
+        conn.execute(text(statement))
+    rebuild(conn)
+
+
+def _members_fts(conn):
+    from app.services.search import CREATE_MEMBERS_FTS, rebuild_member_index
+    conn.execute(text(CREATE_MEMBERS_FTS))
+    rebuild_member_index(conn)
+
+
+MIGRATIONS = [
+    (1, "baseline indices", [
+        "CREATE INDEX IF NOT EXISTS idx_books_title ON books(title)",
+        "CREATE INDEX IF NOT EXISTS idx_books_author ON books(author)",
+        "CREATE INDEX IF NOT EXISTS idx_books_genre ON books(genre)",
+        "CREATE INDEX IF NOT EXISTS idx_copies_lib_number ON book_copies(library_number)",
+        "CREATE INDEX IF NOT EXISTS idx_copies_status ON book_copies(status)",
+        "CREATE INDEX IF NOT EXISTS idx_members_last_name ON members(last_name)",
+        "CREATE INDEX IF NOT EXISTS idx_members_number ON members(member_number)",
+        "CREATE INDEX IF NOT EXISTS idx_loans_member ON loans(member_id)",
+        "CREATE INDEX IF NOT EXISTS idx_loans_due_date ON loans(due_date)",
+        "CREATE INDEX IF NOT EXISTS idx_loans_status ON loans(status)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_user ON activity_log(user_id)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_entity ON activity_log(entity, entity_id)",
+        "CREATE INDEX IF NOT EXISTS idx_notifications_trigger ON notifications(trigger_type, entity_id)",
+    ]),
+    (2, "composite and partial indices for hot queries", [
+        # overdue / active loans: status IN (...) AND due_date < ?
+        "CREATE INDEX IF NOT EXISTS idx_loans_status_due ON loans(status, due_date)",
+        "DROP INDEX IF EXISTS idx_loans_status",
+        # next waiting reservation for a book, ordered by queue position
+        "CREATE INDEX IF NOT EXISTS idx_reservations_book_status_queue "
+        "ON reservations(book_id, status, queue_position)",
+        # available copies per book (live copies only)
+        "CREATE INDEX IF NOT EXISTS idx_copies_book_status "
+        "ON book_copies(book_id, status) WHERE is_deleted = 0",
+        # latest membership per member
+        "CREATE INDEX IF NOT EXISTS idx_memberships_member_valid ON memberships(member_id, valid_until)",
+        "CREATE INDEX IF NOT EXISTS idx_activity_created ON activity_log(created_at)",
+        # already-sent checks in the notification run
+        "CREATE INDEX IF NOT EXISTS idx_notifications_lookup "
+        "ON notifications(trigger_type, entity_id, success, sent_at)",
+        "DROP INDEX IF EXISTS idx_notifications_trigger",
+        # list pages only ever show live rows
+        "CREATE INDEX IF NOT EXISTS idx_books_live_title ON books(title, id) WHERE is_deleted = 0",
+        "CREATE INDEX IF NOT EXISTS idx_members_live_name "
+        "ON members(last_name, first_name, id) WHERE is_deleted = 0",
+    ]),
+    (3, "books_fts full-text catalog index", [_books_fts]),
+    (4, "members_fts member search index", [_members_fts]),
+    (5, "book_trigrams fuzzy search index", [_book_trigrams]),
+    (6, "reservation listing indices", [
+        # newest-first listing and its keyset cursor
+        "CREATE INDEX IF NOT EXISTS idx_reservations_reserved ON reservations(reserved_at, id)",
+        "CREATE INDEX IF NOT EXISTS idx_reservations_member_status ON reservations(member_id, status)",
+    ]),
+    (7, "current membership projection on members", [_member_current_membership]),
+    (8, "notification outbox dispatch index", [
+        # the dispatcher's "due now" scan
+        "CREATE INDEX IF NOT EXISTS idx_outbox_status_next ON notification_outbox(status, next_attempt_at)",
+    ]),
+    (9, "digest items on notification outbox", [
+        lambda conn: _add_column(conn, "notification_outbox", "entities", "TEXT"),
+    ]),
+    (10, "cross-process data versions and scheduler leader lock", [
+        # bumped in every committing transaction; worker processes poll it to invalidate their caches
+        "CREATE TABLE IF NOT EXISTS data_versions (table_name TEXT PRIMARY KEY, version INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS scheduler_leader ("
+        " name TEXT PRIMARY KEY, holder TEXT NOT NULL, heartbeat_at REAL NOT NULL)",
+    ]),
+    (11, "incrementally maintained dashboard counters", [_dashboard_counters]),
+    (12, "daily circulation rollups", [_circulation_rollups]),
+]
+
+
+def _applied_versions(conn) -> set:
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at DATETIME NOT NULL)"
+    ))
+    return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+def schema_version(conn) -> int:
+    return max(_applied_versions(conn), default=0)
+
+
+def run_migrations(engine) -> list:
+    """Apply pending migrations in order. Returns the versions applied."""
+    with engine.begin() as conn:
+        applied = _applied_versions(conn)
+
+    done = []
+    for version, name, steps in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            # another worker process may have applied it while we waited for the write lock
+            if version in _applied_versions(conn):
+                continue
+            logger.info(f"Applying migration {version}: {name}")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(text(step))
+            conn.execute(
+                text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)"),
+                {"v": version, "n": name, "t": datetime.utcnow()},
+            )
+        done.append(version)
+
+    if done:
+        # Refresh planner statistics so the new indices are actually picked
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    return done
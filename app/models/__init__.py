@@ -9,9 +9,10 @@ from app.models.activity_log import ActivityLog
 from app.models.setting import Setting
 from app.models.user_permission import UserPermission
 from app.models.notification import Notification
+from app.models.notification_outbox import NotificationOutbox
 
 __all__ = [
     "Member", "Membership", "Book", "BookCopy", "Loan",
     "Reservation", "Staff", "ActivityLog", "Setting",
-    "UserPermission", "Notification",
+    "UserPermission", "Notification", "NotificationOutbox",
 ]
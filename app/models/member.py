@@ -25,5 +25,8 @@ class Member(Base):
     deleted_by = Column(Integer, nullable=True)
     notes = Column(Text, nullable=True)
     registered_at = Column(DateTime, default=datetime.utcnow)
+    # Latest membership, kept up to date by app.services.memberships
+    current_membership_id = Column(Integer, nullable=True)
+    membership_valid_until = Column(Date, nullable=True)
     
     memberships = relationship("Membership", back_populates="member", cascade="all, delete-orphan")
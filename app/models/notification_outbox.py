@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, Text, DateTime
+from app.database import Base
+
+
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key = Column(Text, unique=True, nullable=False)  # e.g. reservation_available:42
+    trigger_type = Column(Text, nullable=False)
+    entity_id = Column(Integer, nullable=False)
+    member_id = Column(Integer, nullable=False)
+    email_to = Column(Text, nullable=False)
+    subject = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+    # digest messages: JSON list of {"trigger_type", "entity_id", "key"} for every item they cover
+    entities = Column(Text, nullable=True)
+    status = Column(Text, nullable=False, default="pending")  # pending|sent|dead
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
@@ -1,31 +1,37 @@
 from datetime import datetime
 import os
 from fastapi import APIRouter, Depends, HTTPException, Response, Request
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.staff import Staff
-from app.models.user_permission import UserPermission
 from app.schemas.auth import LoginRequest, LoginResponse, StaffCreate, StaffUpdate, StaffOut
 from app.utils.auth import (
-    verify_password, hash_password, create_access_token,
-    get_current_user, require_admin, EXPIRATION_MINUTES,
+    verify_password, hash_password, create_access_token, permission_claims,
+    get_current_user, get_principal, require_admin, principal_cache, Principal, EXPIRATION_MINUTES,
 )
 from app.utils.activity_logger import log_activity
+from app.utils.cache import CachedJSON
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
 @router.post("/login", response_model=LoginResponse)
-def login(data: LoginRequest, request: Request, response: Response, db: Session = Depends(get_db)):
-    user = db.query(Staff).filter(Staff.username == data.username).first()
+def login(data: LoginRequest, request: Request, response: Response,
+          read_db: Session = Depends(get_read_db), db: Session = Depends(get_db)):
+    # Lookup and bcrypt check on the read side: the writer is only taken for last_login
+    user = read_db.query(Staff).filter(Staff.username == data.username).first()
     if not user or not verify_password(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Pogrešno korisničko ime ili lozinka")
     if not user.is_active:
         raise HTTPException(status_code=403, detail="Nalog je deaktiviran")
 
-    token = create_access_token({"sub": str(user.id)})
-    user.last_login = datetime.utcnow()
+    token = create_access_token({"sub": str(user.id), **permission_claims(read_db, user)})
+    # On the connection, past the session's change tracking: last_login is not part of a cached principal,
+    # so a login must not bump the staff version and evict every signed-in user's principal
+    db.connection().execute(update(Staff.__table__).where(Staff.__table__.c.id == user.id)
+                            .values(last_login=datetime.utcnow()))
     db.commit()
 
     log_activity(db, user.id, "LOGIN", "staff", user.id,
@@ -46,6 +52,7 @@ def logout(request: Request, response: Response, current_user: Staff = Depends(g
            db: Session = Depends(get_db)):
     log_activity(db, current_user.id, "LOGOUT", "staff", current_user.id,
                  ip_address=request.client.host if request.client else None)
+    principal_cache.invalidate_user(current_user.id)
     response.delete_cookie("access_token")
     return {"message": "Odjavljeni ste"}
 
@@ -56,40 +63,45 @@ def me(current_user: Staff = Depends(get_current_user)):
 
 
 @router.get("/me/permissions")
-def my_permissions(current_user: Staff = Depends(get_current_user), db: Session = Depends(get_db)):
-    if current_user.is_admin:
+def my_permissions(principal: Principal = Depends(get_principal)):
+    if principal.user.is_admin:
         return {"is_admin": True, "permissions": []}
-    perms = db.query(UserPermission).filter(UserPermission.user_id == current_user.id).all()
     return {
         "is_admin": False,
         "permissions": [
-            {"module": p.module, "can_read": p.can_read, "can_write": p.can_write}
-            for p in perms
+            {"module": module, "can_read": can_read, "can_write": can_write}
+            for module, (can_read, can_write) in principal.permissions.items()
         ],
     }
 
 
+_session_config = CachedJSON(cache_control="no-cache")  # environment only: fixed for the process
+
+
 @router.get("/config")
-def get_config():
+def get_config(request: Request):
     """Get session configuration (timeout in minutes)"""
-    session_timeout = int(os.environ.get("SESSION_TIMEOUT_MINUTES", "30"))
-    return {"session_timeout_minutes": session_timeout, "session_warning_minutes": 5}
+    def compute():
+        session_timeout = int(os.environ.get("SESSION_TIMEOUT_MINUTES", "30"))
+        return {"session_timeout_minutes": session_timeout, "session_warning_minutes": 5}
+    return _session_config.response(request, compute)
 
 
 @router.get("/staff", response_model=list[StaffOut])
-def list_staff(current_user: Staff = Depends(require_admin), db: Session = Depends(get_db)):
+def list_staff(current_user: Staff = Depends(require_admin), db: Session = Depends(get_read_db)):
     return db.query(Staff).all()
 
 
 @router.post("/staff", response_model=StaffOut)
 def create_staff(data: StaffCreate, request: Request,
                  current_user: Staff = Depends(require_admin), db: Session = Depends(get_db)):
+    password_hash = hash_password(data.password)  # before the first writer query
     if db.query(Staff).filter(Staff.username == data.username).first():
         raise HTTPException(status_code=400, detail="Korisničko ime već postoji")
     user = Staff(
         username=data.username,
         full_name=data.full_name,
-        password_hash=hash_password(data.password),
+        password_hash=password_hash,
         is_admin=data.is_admin,
     )
     db.add(user)
@@ -104,6 +116,7 @@ def create_staff(data: StaffCreate, request: Request,
 @router.put("/staff/{user_id}", response_model=StaffOut)
 def update_staff(user_id: int, data: StaffUpdate, request: Request,
                  current_user: Staff = Depends(require_admin), db: Session = Depends(get_db)):
+    password_hash = hash_password(data.password) if data.password is not None else None  # before the first writer query
     user = db.query(Staff).filter(Staff.id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Korisnik nije pronađen")
@@ -111,8 +124,8 @@ def update_staff(user_id: int, data: StaffUpdate, request: Request,
     old_values = {"full_name": user.full_name, "is_admin": user.is_admin, "is_active": user.is_active}
     if data.full_name is not None:
         user.full_name = data.full_name
-    if data.password is not None:
-        user.password_hash = hash_password(data.password)
+    if password_hash is not None:
+        user.password_hash = password_hash
     if data.is_admin is not None:
         user.is_admin = data.is_admin
     if data.is_active is not None:
@@ -120,6 +133,7 @@ def update_staff(user_id: int, data: StaffUpdate, request: Request,
 
     db.commit()
     db.refresh(user)
+    principal_cache.invalidate_user(user.id)
     log_activity(db, current_user.id, "UPDATE", "staff", user.id,
                  old_values=old_values,
                  new_values={"full_name": user.full_name, "is_admin": user.is_admin, "is_active": user.is_active},
@@ -1,19 +1,22 @@
 from datetime import datetime
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import func, literal, select, union_all
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.book import Book
 from app.models.book_copy import BookCopy
 from app.schemas.book import (
     BookCreate, BookUpdate, BookOut, BookDetailOut,
-    BookCopyCreate, BookCopyUpdate, BookCopyOut,
+    BookCopyCreate, BookCopyUpdate, BookCopyOut, BookBrowseOut,
 )
 from app.utils.auth import get_current_user, check_permission
 from app.models.staff import Staff
 from app.utils.activity_logger import log_activity
+from app.services import search, typeahead
+from app.utils.pagination import paginate, NEXT_CURSOR_HEADER
+from app.utils.cache import set_total_count, CachedJSON, TOTAL_COUNT_HEADER
 
 router = APIRouter(prefix="/books", tags=["books"])
 
@@ -30,25 +33,35 @@ def _update_total_copies(db: Session, book_id: int):
 
 @router.get("", response_model=list[BookOut])
 def list_books(
+    response: Response,
     q: Optional[str] = Query(None),
     genre: Optional[str] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    fuzzy: bool = Query(False),
     current_user: Staff = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     query = db.query(Book).filter(Book.is_deleted == False)
-    if q:
-        search = f"%{q}%"
-        query = query.filter(or_(
-            Book.title.ilike(search),
-            Book.author.ilike(search),
-        ))
+    scores = search.fuzzy_book_matches(db, q) if q and fuzzy else None
+    hits = search.book_matches(q) if q and not fuzzy else None
+    if scores is not None:
+        query = query.filter(Book.id.in_(scores))
+    if hits is not None:
+        query = query.join(hits, hits.c.book_id == Book.id)
     if genre:
         query = query.filter(Book.genre == genre)
-    query = query.order_by(Book.title)
-    total = query.count()
-    books = query.offset((page - 1) * per_page).limit(per_page).all()
+
+    if scores is not None:
+        # Fuzzy candidates are capped (search.FUZZY_CANDIDATES), so ranking in Python stays cheap
+        books = sorted(query.all(), key=lambda b: (-scores[b.id], b.title))
+        response.headers[TOTAL_COUNT_HEADER] = str(len(books))
+        books = books[(page - 1) * per_page:page * per_page]
+    else:
+        set_total_count(response, query, ("books",), ("books", q, genre), broad=not (q or genre))
+        keys = [hits.c.rank, Book.id] if hits is not None else [Book.title, Book.id]
+        books = paginate(query, keys, cursor=cursor, page=page, per_page=per_page, response=response)
 
     # Compute available copies for each book
     book_ids = [b.id for b in books]
@@ -74,14 +87,119 @@ def list_books(
     return result
 
 
+_genres = CachedJSON("books")
+
+
 @router.get("/genres")
-def list_genres(current_user: Staff = Depends(get_current_user), db: Session = Depends(get_db)):
-    rows = db.query(Book.genre).filter(Book.is_deleted == False, Book.genre.isnot(None)).distinct().all()
-    return [r[0] for r in rows if r[0]]
+def list_genres(request: Request, current_user: Staff = Depends(get_current_user),
+                db: Session = Depends(get_read_db)):
+    def compute():
+        rows = db.query(Book.genre).filter(Book.is_deleted == False, Book.genre.isnot(None)).distinct().all()
+        return [r[0] for r in rows if r[0]]
+    return _genres.response(request, compute)
+
+
+FACETS = ("genre", "language", "decade", "available")
+
+
+def _browse_conditions(columns: dict, genre, language, decade, available) -> dict:
+    conditions = {}
+    if genre:
+        conditions["genre"] = columns["genre"] == genre
+    if language:
+        conditions["language"] = columns["language"] == language
+    if decade is not None:
+        conditions["decade"] = columns["decade"] == decade
+    if available is not None:
+        conditions["available"] = (columns["available_copies"] > 0) == available
+    return conditions
+
+
+@router.get("/browse", response_model=BookBrowseOut)
+def browse_books(
+    response: Response,
+    q: Optional[str] = Query(None),
+    genre: Optional[str] = Query(None),
+    language: Optional[str] = Query(None),
+    decade: Optional[int] = Query(None),
+    available: Optional[bool] = Query(None),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    current_user: Staff = Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    """Page of books plus facet counts for the current filters.
+
+    Each facet is counted with every active filter except its own, so the
+    genre list still shows the other genres while one is selected. All four
+    facets come from one UNION ALL over a materialized candidate set; the
+    page itself is a second query with available copies inlined.
+    """
+    hits = search.book_matches(q) if q else None
+    columns = {
+        "id": Book.id,
+        "genre": Book.genre,
+        "language": Book.language,
+        "decade": (Book.year_published // 10) * 10,
+        "available_copies": (
+            select(func.count(BookCopy.id))
+            .where(BookCopy.book_id == Book.id, BookCopy.status == "available",
+                   BookCopy.is_deleted == False)
+            .correlate(Book)
+            .scalar_subquery()
+        ),
+    }
+
+    candidates = select(*[expr.label(name) for name, expr in columns.items()]).where(Book.is_deleted == False)
+    if hits is not None:
+        candidates = candidates.join(hits, hits.c.book_id == Book.id)
+    candidates = candidates.cte("candidates").prefix_with("MATERIALIZED")
+    conditions = _browse_conditions(candidates.c, genre, language, decade, available)
+
+    branches = []
+    for facet in FACETS:
+        value = (candidates.c.available_copies > 0) if facet == "available" else candidates.c[facet]
+        others = [cond for name, cond in conditions.items() if name != facet]
+        branches.append(
+            select(literal(facet).label("facet"), value.label("value"), func.count().label("count"))
+            .where(*others)
+            .group_by(value)
+        )
+    facets = {facet: [] for facet in FACETS}
+    total = 0
+    for facet, value, count in db.execute(union_all(*branches)):
+        if facet == "available":
+            value = bool(value)
+            if available is None or value == available:
+                total += count
+        facets[facet].append({"value": value, "count": count})
+    for facet in ("genre", "language", "decade"):
+        facets[facet].sort(key=lambda f: (-f["count"], str(f["value"])))
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+
+    query = db.query(Book, columns["available_copies"]).filter(Book.is_deleted == False)
+    if hits is not None:
+        query = query.join(hits, hits.c.book_id == Book.id)
+    query = query.filter(*_browse_conditions(columns, genre, language, decade, available).values())
+    keys = [hits.c.rank, Book.id] if hits is not None else [Book.title, Book.id]
+    rows = paginate(query, keys, cursor=cursor, page=page, per_page=per_page, response=response)
+
+    items = []
+    for book, copies in rows:
+        out = BookOut.model_validate(book)
+        out.available_copies = copies
+        items.append(out)
+    return BookBrowseOut(
+        items=items,
+        total=total,
+        next_cursor=response.headers.get(NEXT_CURSOR_HEADER),
+        facets=facets,
+    )
 
 
 @router.get("/{book_id}", response_model=BookDetailOut)
-def get_book(book_id: int, current_user: Staff = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_book(book_id: int, current_user: Staff = Depends(get_current_user), db: Session = Depends(get_read_db)):
     book = db.query(Book).filter(Book.id == book_id, Book.is_deleted == False).first()
     if not book:
         raise HTTPException(status_code=404, detail="Knjiga nije pronađena")
@@ -99,8 +217,11 @@ def create_book(data: BookCreate, request: Request,
                 db: Session = Depends(get_db)):
     book = Book(**data.model_dump())
     db.add(book)
+    db.flush()
+    search.index_book(db, book)
     db.commit()
     db.refresh(book)
+    typeahead.index.update_book(book)
     log_activity(db, current_user.id, "CREATE", "book", book.id,
                  new_values=data.model_dump(),
                  ip_address=request.client.host if request.client else None)
@@ -117,8 +238,10 @@ def update_book(book_id: int, data: BookUpdate, request: Request,
     old_values = {"title": book.title, "author": book.author}
     for field, value in data.model_dump(exclude_unset=True).items():
         setattr(book, field, value)
+    search.index_book(db, book)
     db.commit()
     db.refresh(book)
+    typeahead.index.update_book(book)
     log_activity(db, current_user.id, "UPDATE", "book", book.id,
                  old_values=old_values,
                  new_values=data.model_dump(exclude_unset=True),
@@ -136,7 +259,9 @@ def delete_book(book_id: int, request: Request,
     book.is_deleted = True
     book.deleted_at = datetime.utcnow()
     book.deleted_by = current_user.id
+    search.unindex_book(db, book.id)
     db.commit()
+    typeahead.index.update_book(book)
     log_activity(db, current_user.id, "DELETE", "book", book.id,
                  old_values={"title": book.title},
                  ip_address=request.client.host if request.client else None)
@@ -199,7 +324,7 @@ def delete_copy(copy_id: int, request: Request,
 
 @router.get("/copy/{library_number}", response_model=BookCopyOut)
 def get_copy_by_number(library_number: str, current_user: Staff = Depends(get_current_user),
-                       db: Session = Depends(get_db)):
+                       db: Session = Depends(get_read_db)):
     copy = db.query(BookCopy).filter(
         BookCopy.library_number == library_number, BookCopy.is_deleted == False
     ).first()
@@ -209,7 +334,7 @@ def get_copy_by_number(library_number: str, current_user: Staff = Depends(get_cu
 
 
 @router.get("/{book_id}/availability")
-def book_availability(book_id: int, db: Session = Depends(get_db)):
+def book_availability(book_id: int, db: Session = Depends(get_read_db)):
     book = db.query(Book).filter(Book.id == book_id, Book.is_deleted == False).first()
     if not book:
         raise HTTPException(status_code=404, detail="Knjiga nije pronađena")
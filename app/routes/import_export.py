@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
 from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db, ReadSessionLocal
 from app.models.staff import Staff
 from app.utils.auth import get_current_user, require_admin
 from app.utils.activity_logger import log_activity
@@ -14,6 +14,7 @@ from app.services.excel import (
     generate_import_template,
 )
 from app.services.backup import manual_backup, export_full_database, list_backups
+from app.services import typeahead
 
 router = APIRouter(tags=["import_export"])
 
@@ -22,8 +23,8 @@ router = APIRouter(tags=["import_export"])
 
 @router.get("/export/books")
 def export_books(request: Request, current_user: Staff = Depends(get_current_user),
-                 db: Session = Depends(get_db)):
-    path = export_books_to_excel(db)
+                 db: Session = Depends(get_db), read_db: Session = Depends(get_read_db)):
+    path = export_books_to_excel(read_db)
     log_activity(db, current_user.id, "EXPORT", "books", ip_address=request.client.host if request.client else None)
     return FileResponse(path, filename="knjige.xlsx",
                         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
@@ -31,8 +32,8 @@ def export_books(request: Request, current_user: Staff = Depends(get_current_use
 
 @router.get("/export/members")
 def export_members(request: Request, current_user: Staff = Depends(get_current_user),
-                   db: Session = Depends(get_db)):
-    path = export_members_to_excel(db)
+                   db: Session = Depends(get_db), read_db: Session = Depends(get_read_db)):
+    path = export_members_to_excel(read_db)
     log_activity(db, current_user.id, "EXPORT", "members", ip_address=request.client.host if request.client else None)
     return FileResponse(path, filename="clanovi.xlsx",
                         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
@@ -63,6 +64,8 @@ async def import_books(request: Request, file: UploadFile = File(...),
 
     try:
         result = import_books_from_excel(tmp_path, db)
+        with ReadSessionLocal() as read_db:
+            typeahead.index.rebuild(read_db)
         log_activity(db, current_user.id, "IMPORT", "books",
                      new_values={"imported": result["imported"], "errors_count": len(result.get("errors", []))},
                      ip_address=request.client.host if request.client else None)
@@ -85,6 +88,8 @@ async def import_members(request: Request, file: UploadFile = File(...),
 
     try:
         result = import_members_from_excel(tmp_path, db)
+        with ReadSessionLocal() as read_db:
+            typeahead.index.rebuild(read_db)
         log_activity(db, current_user.id, "IMPORT", "members",
                      new_values={"imported": result["imported"], "errors_count": len(result.get("errors", []))},
                      ip_address=request.client.host if request.client else None)
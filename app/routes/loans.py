@@ -1,26 +1,28 @@
 from datetime import datetime, timedelta, date
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.loan import Loan
 from app.models.book_copy import BookCopy
 from app.models.book import Book
 from app.models.member import Member
 from app.models.reservation import Reservation
-from app.models.setting import Setting
 from app.schemas.loan import LoanCreate, LoanOut
 from app.utils.auth import get_current_user, check_permission
 from app.models.staff import Staff
 from app.utils.activity_logger import log_activity
+from app.utils.pagination import paginate
+from app.utils.cache import set_total_count
+from app.utils.settings_cache import settings_cache
+from app.services import loan_view, notifications, counters, circulation
 
 router = APIRouter(prefix="/loans", tags=["loans"])
 
 
-def _get_loan_duration(db: Session) -> int:
-    s = db.query(Setting).filter(Setting.key == "loan_duration_days").first()
-    return int(s.value) if s else 30
+def _get_loan_duration() -> int:
+    return settings_cache.get_int("loan_duration_days", 30)
 
 
 @router.post("", response_model=LoanOut)
@@ -41,7 +43,7 @@ def create_loan(data: LoanCreate, request: Request,
     if not member.is_active:
         raise HTTPException(status_code=400, detail="Član nije aktivan")
 
-    duration = _get_loan_duration(db)
+    duration = _get_loan_duration()
     due = date.today() + timedelta(days=duration)
 
     loan = Loan(
@@ -54,10 +56,11 @@ def create_loan(data: LoanCreate, request: Request,
     )
     db.add(loan)
     copy.status = "loaned"
+    book = db.query(Book).filter(Book.id == copy.book_id).first()
+    circulation.record_loan(db, loan.loaned_at, copy.book_id, book.genre if book else None, member.member_type)
     db.commit()
     db.refresh(loan)
 
-    book = db.query(Book).filter(Book.id == copy.book_id).first()
     log_activity(db, current_user.id, "CREATE", "loan", loan.id,
                  new_values={"member_id": data.member_id, "copy_id": data.copy_id,
                              "book_title": book.title if book else None, "due_date": str(due)},
@@ -103,11 +106,18 @@ def return_loan(loan_id: int, request: Request,
             reservation.notified_at = datetime.utcnow()
             # expires in 7 days
             reservation.expires_at = datetime.utcnow() + timedelta(days=7)
+            # queued in this transaction, sent by the outbox dispatcher
+            db.flush()
+            notifications.enqueue_event(db, "reservation_available", reservation.id)
         else:
             copy.status = "available"
 
-    db.commit()
     book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
+    if copy:
+        # daily circulation rollups, in this transaction
+        member_type = db.query(Member.member_type).filter(Member.id == loan.member_id).scalar()
+        circulation.record_return(db, loan.returned_at, copy.book_id, book.genre if book else None, member_type)
+    db.commit()
     log_activity(db, current_user.id, "UPDATE", "loan", loan.id,
                  new_values={"status": "returned", "returned_at": str(loan.returned_at)},
                  ip_address=request.client.host if request.client else None)
@@ -136,7 +146,7 @@ def extend_loan(loan_id: int, request: Request,
         if waiting > 0:
             raise HTTPException(status_code=400, detail="Knjiga je rezervisana — ne može se produžiti")
 
-    duration = _get_loan_duration(db)
+    duration = _get_loan_duration()
     loan.due_date = loan.due_date + timedelta(days=duration)
     loan.extensions_count += 1
     db.commit()
@@ -147,62 +157,42 @@ def extend_loan(loan_id: int, request: Request,
     return {"message": "Pozajmica produžena", "new_due_date": str(loan.due_date)}
 
 
+OVERDUE_FIELDS = ("id", "book_title", "book_author", "library_number",
+                  "member_name", "member_number", "member_email", "due_date")
+ACTIVE_FIELDS = ("id", "copy_id", "member_id", "loaned_at", "due_date", "status", "extensions_count",
+                 "book_title", "book_author", "library_number", "member_name", "member_number")
+
+
 @router.get("/overdue")
 def overdue_loans(current_user: Staff = Depends(get_current_user), db: Session = Depends(get_db)):
-    loans = db.query(Loan).filter(
-        Loan.status.in_(["active", "overdue"]),
-        Loan.due_date < date.today(),
-    ).order_by(Loan.due_date).all()
-
-    result = []
-    for loan in loans:
-        if loan.status == "active":
-            loan.status = "overdue"
-        copy = db.query(BookCopy).filter(BookCopy.id == loan.copy_id).first()
-        book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
-        member = db.query(Member).filter(Member.id == loan.member_id).first()
-        days_late = (date.today() - loan.due_date).days
-        result.append({
-            "id": loan.id,
-            "book_title": book.title if book else None,
-            "book_author": book.author if book else None,
-            "library_number": copy.library_number if copy else None,
-            "member_name": f"{member.first_name} {member.last_name}" if member else None,
-            "member_number": member.member_number if member else None,
-            "member_email": member.email if member else None,
-            "due_date": str(loan.due_date),
-            "days_late": days_late,
-        })
+    today = date.today()
+    marked = db.query(Loan).filter(Loan.status == "active", Loan.due_date < today).update(
+        {Loan.status: "overdue"}, synchronize_session=False
+    )
+    # bulk update bypasses the flush hook
+    counters.add(db, overdue_loans=marked)
     db.commit()
+
+    rows = loan_view.loan_query(db, OVERDUE_FIELDS).filter(
+        Loan.status == "overdue", Loan.due_date < today,
+    ).order_by(Loan.due_date).all()
+    result = loan_view.as_dicts(rows, OVERDUE_FIELDS)
+    for loan in result:
+        loan["days_late"] = (today - loan["due_date"]).days
     return result
 
 
 @router.get("/active")
 def active_loans(
+    response: Response,
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
     current_user: Staff = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    query = db.query(Loan).filter(Loan.status.in_(["active", "overdue"])).order_by(Loan.due_date)
-    loans = query.offset((page - 1) * per_page).limit(per_page).all()
-    result = []
-    for loan in loans:
-        copy = db.query(BookCopy).filter(BookCopy.id == loan.copy_id).first()
-        book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
-        member = db.query(Member).filter(Member.id == loan.member_id).first()
-        result.append({
-            "id": loan.id,
-            "copy_id": loan.copy_id,
-            "member_id": loan.member_id,
-            "loaned_at": loan.loaned_at,
-            "due_date": str(loan.due_date),
-            "status": loan.status,
-            "extensions_count": loan.extensions_count,
-            "book_title": book.title if book else None,
-            "book_author": book.author if book else None,
-            "library_number": copy.library_number if copy else None,
-            "member_name": f"{member.first_name} {member.last_name}" if member else None,
-            "member_number": member.member_number if member else None,
-        })
-    return result
+    query = loan_view.loan_query(db, ACTIVE_FIELDS).filter(Loan.status.in_(["active", "overdue"]))
+    set_total_count(response, query, ("loans",), ("active_loans",), broad=True)
+    rows = paginate(query, [Loan.due_date, Loan.id], cursor=cursor, page=page, per_page=per_page,
+                    response=response)
+    return loan_view.as_dicts(rows, ACTIVE_FIELDS)
@@ -1,15 +1,12 @@
 from datetime import datetime, date
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.member import Member
 from app.models.membership import Membership
 from app.models.loan import Loan
-from app.models.book_copy import BookCopy
-from app.models.book import Book
 from app.schemas.member import (
     MemberCreate, MemberUpdate, MemberOut,
     MemberBlockRequest, MembershipCreate, MembershipOut,
@@ -18,6 +15,9 @@ from app.schemas.loan import LoanOut
 from app.utils.auth import get_current_user, check_permission
 from app.models.staff import Staff
 from app.utils.activity_logger import log_activity
+from app.services import search, typeahead, loan_view, memberships, notifications
+from app.utils.pagination import paginate
+from app.utils.cache import set_total_count
 
 router = APIRouter(prefix="/members", tags=["members"])
 
@@ -28,110 +28,63 @@ def _generate_member_number(db: Session) -> str:
     return f"MBR-{next_num:05d}"
 
 
+def _member_out(member: Member, membership: Optional[Membership]) -> MemberOut:
+    out = MemberOut.model_validate(member)
+    out.last_membership = MembershipOut.model_validate(membership) if membership else None
+    return out
+
+
+def _with_current_membership(db: Session):
+    """Members joined to their current membership through the maintained projection."""
+    return db.query(Member, Membership).outerjoin(
+        Membership, Membership.id == Member.current_membership_id
+    )
+
+
 @router.get("", response_model=list[MemberOut])
 def list_members(
+    response: Response,
     q: Optional[str] = Query(None),
     member_type: Optional[str] = Query(None),
     active_only: bool = Query(True),
+    membership: Optional[str] = Query(None, description="current|expiring|expired"),
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
     current_user: Staff = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    query = db.query(Member).filter(Member.is_deleted == False)
+    if membership and membership not in memberships.STATUSES:
+        raise HTTPException(status_code=400, detail="Nepoznat status članarine")
+    query = _with_current_membership(db).filter(Member.is_deleted == False)
     if active_only:
         query = query.filter(Member.is_active == True)
-    if q:
-        search = f"%{q}%"
-        query = query.filter(or_(
-            Member.first_name.ilike(search),
-            Member.last_name.ilike(search),
-            Member.member_number.ilike(search),
-            Member.email.ilike(search),
-            Member.phone.ilike(search),
-        ))
+    hits = search.member_matches(q) if q else None
+    if hits is not None:
+        query = query.join(hits, hits.c.member_id == Member.id)
     if member_type:
         query = query.filter(Member.member_type == member_type)
-    query = query.order_by(Member.last_name, Member.first_name)
-    members = query.offset((page - 1) * per_page).limit(per_page).all()
-    
-    # Add last_membership to each member
-    result = []
-    for member in members:
-        member_dict = {
-            'id': member.id,
-            'member_number': member.member_number,
-            'first_name': member.first_name,
-            'last_name': member.last_name,
-            'date_of_birth': member.date_of_birth,
-            'email': member.email,
-            'phone': member.phone,
-            'address': member.address,
-            'member_type': member.member_type,
-            'is_active': member.is_active,
-            'is_blocked': member.is_blocked,
-            'block_reason': member.block_reason,
-            'allow_notifications': member.allow_notifications,
-            'notes': member.notes,
-            'registered_at': member.registered_at,
-            'last_membership': None
-        }
-        if member.memberships:
-            last_ms = sorted(member.memberships, key=lambda m: m.valid_until, reverse=True)[0]
-            member_dict['last_membership'] = {
-                'id': last_ms.id,
-                'member_id': last_ms.member_id,
-                'year': last_ms.year,
-                'amount_paid': last_ms.amount_paid,
-                'paid_at': last_ms.paid_at,
-                'valid_from': last_ms.valid_from,
-                'valid_until': last_ms.valid_until,
-                'recorded_by': last_ms.recorded_by,
-            }
-        result.append(member_dict)
-
-    return result
+    if membership:
+        query = query.filter(memberships.status_filter(membership))
+    filters = (q, member_type, active_only, membership, date.today() if membership else None)
+    set_total_count(response, query, ("members",), ("members",) + filters,
+                    broad=not (q or member_type or membership))
+    if hits is not None:
+        # exact member-number / phone hits first, then relevance
+        keys = [hits.c.exact, hits.c.rank, Member.id]
+    else:
+        keys = [Member.last_name, Member.first_name, Member.id]
+    rows = paginate(query, keys, cursor=cursor, page=page, per_page=per_page, response=response)
+    return [_member_out(member, ms) for member, ms in rows]
 
 
 @router.get("/{member_id}", response_model=MemberOut)
 def get_member(member_id: int, current_user: Staff = Depends(get_current_user),
-               db: Session = Depends(get_db)):
-    member = db.query(Member).filter(Member.id == member_id, Member.is_deleted == False).first()
-    if not member:
+               db: Session = Depends(get_read_db)):
+    row = _with_current_membership(db).filter(Member.id == member_id, Member.is_deleted == False).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Član nije pronađen")
-    
-    # Add last_membership
-    member_dict = {
-        'id': member.id,
-        'member_number': member.member_number,
-        'first_name': member.first_name,
-        'last_name': member.last_name,
-        'date_of_birth': member.date_of_birth,
-        'email': member.email,
-        'phone': member.phone,
-        'address': member.address,
-        'member_type': member.member_type,
-        'is_active': member.is_active,
-        'is_blocked': member.is_blocked,
-        'block_reason': member.block_reason,
-        'allow_notifications': member.allow_notifications,
-        'notes': member.notes,
-        'registered_at': member.registered_at,
-        'last_membership': None
-    }
-    if member.memberships:
-        last_ms = sorted(member.memberships, key=lambda m: m.valid_until, reverse=True)[0]
-        member_dict['last_membership'] = {
-            'id': last_ms.id,
-            'member_id': last_ms.member_id,
-            'year': last_ms.year,
-            'amount_paid': last_ms.amount_paid,
-            'paid_at': last_ms.paid_at,
-            'valid_from': last_ms.valid_from,
-            'valid_until': last_ms.valid_until,
-            'recorded_by': last_ms.recorded_by,
-        }
-    return member_dict
+    return _member_out(*row)
 
 
 @router.post("", response_model=MemberOut)
@@ -151,8 +104,11 @@ def create_member(data: MemberCreate, request: Request,
         notes=data.notes,
     )
     db.add(member)
+    db.flush()
+    search.index_member(db, member)
     db.commit()
     db.refresh(member)
+    typeahead.index.update_member(member)
     log_activity(db, current_user.id, "CREATE", "member", member.id,
                  new_values={"member_number": member.member_number, "name": f"{member.first_name} {member.last_name}"},
                  ip_address=request.client.host if request.client else None)
@@ -167,10 +123,15 @@ def update_member(member_id: int, data: MemberUpdate, request: Request,
     if not member:
         raise HTTPException(status_code=404, detail="Član nije pronađen")
     old_values = {"first_name": member.first_name, "last_name": member.last_name}
-    for field, value in data.model_dump(exclude_unset=True).items():
+    values = data.model_dump(exclude_unset=True)
+    if values.get("member_number") is not None:
+        values["member_number"] = str(values["member_number"])  # stored as text, as in create_member
+    for field, value in values.items():
         setattr(member, field, value)
+    search.index_member(db, member)
     db.commit()
     db.refresh(member)
+    typeahead.index.update_member(member)
     log_activity(db, current_user.id, "UPDATE", "member", member.id,
                  old_values=old_values,
                  new_values=data.model_dump(exclude_unset=True),
@@ -188,7 +149,9 @@ def delete_member(member_id: int, request: Request,
     member.is_deleted = True
     member.deleted_at = datetime.utcnow()
     member.deleted_by = current_user.id
+    search.unindex_member(db, member.id)
     db.commit()
+    typeahead.index.update_member(member)
     log_activity(db, current_user.id, "DELETE", "member", member.id,
                  old_values={"name": f"{member.first_name} {member.last_name}"},
                  ip_address=request.client.host if request.client else None)
@@ -216,7 +179,7 @@ def block_member(member_id: int, data: MemberBlockRequest, request: Request,
 
 @router.get("/{member_id}/memberships", response_model=list[MembershipOut])
 def list_memberships(member_id: int, current_user: Staff = Depends(get_current_user),
-                     db: Session = Depends(get_db)):
+                     db: Session = Depends(get_read_db)):
     return db.query(Membership).filter(Membership.member_id == member_id).order_by(Membership.year.desc()).all()
 
 
@@ -233,6 +196,9 @@ def add_membership(member_id: int, data: MembershipCreate, request: Request,
         **data.model_dump(),
     )
     db.add(membership)
+    db.flush()
+    memberships.refresh_current_membership(db, member)
+    notifications.enqueue_event(db, "membership_paid", membership.id)
     db.commit()
     db.refresh(membership)
     log_activity(db, current_user.id, "CREATE", "membership", membership.id,
@@ -243,29 +209,16 @@ def add_membership(member_id: int, data: MembershipCreate, request: Request,
 
 # --- Member loans ---
 
+MEMBER_LOAN_FIELDS = ("id", "copy_id", "member_id", "loaned_at", "due_date", "returned_at", "status",
+                      "extensions_count", "book_title", "book_author", "library_number")
+
+
 @router.get("/{member_id}/loans")
 def member_loans(member_id: int, status: Optional[str] = Query(None),
                  current_user: Staff = Depends(get_current_user),
-                 db: Session = Depends(get_db)):
-    query = db.query(Loan).filter(Loan.member_id == member_id)
+                 db: Session = Depends(get_read_db)):
+    query = loan_view.loan_query(db, MEMBER_LOAN_FIELDS).filter(Loan.member_id == member_id)
     if status:
         query = query.filter(Loan.status == status)
-    loans = query.order_by(Loan.loaned_at.desc()).all()
-    result = []
-    for loan in loans:
-        copy = db.query(BookCopy).filter(BookCopy.id == loan.copy_id).first()
-        book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
-        result.append({
-            "id": loan.id,
-            "copy_id": loan.copy_id,
-            "member_id": loan.member_id,
-            "loaned_at": loan.loaned_at,
-            "due_date": loan.due_date,
-            "returned_at": loan.returned_at,
-            "status": loan.status,
-            "extensions_count": loan.extensions_count,
-            "book_title": book.title if book else None,
-            "book_author": book.author if book else None,
-            "library_number": copy.library_number if copy else None,
-        })
-    return result
+    rows = query.order_by(Loan.loaned_at.desc()).all()
+    return loan_view.as_dicts(rows, MEMBER_LOAN_FIELDS)
@@ -1,173 +1,249 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.loan import Loan
-from app.models.book_copy import BookCopy
-from app.models.book import Book
 from app.models.member import Member
 from app.models.membership import Membership
-from app.models.reservation import Reservation
 from app.models.activity_log import ActivityLog
 from app.models.staff import Staff
 from app.utils.auth import get_current_user, check_permission
+from app.utils.pagination import paginate
+from app.utils.cache import set_total_count, etag_response
+from app.services import loan_view, memberships, counters, circulation
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
 @router.get("/dashboard")
-def dashboard(current_user: Staff = Depends(get_current_user), db: Session = Depends(get_db)):
-    active_loans = db.query(Loan).filter(Loan.status.in_(["active", "overdue"])).count()
-    overdue_loans = db.query(Loan).filter(Loan.status == "overdue").count()
+def dashboard(request: Request, current_user: Staff = Depends(get_current_user)):
+    # Maintained counters (app.services.counters) instead of seven COUNT queries
+    return etag_response(request, counters.cached_dashboard())
 
-    # Expired memberships: members whose latest membership valid_until < today
-    today = date.today()
-    from sqlalchemy import and_
-    # Members with no valid membership for this year
-    members_total = db.query(Member).filter(Member.is_deleted == False, Member.is_active == True).count()
-    members_with_valid = db.query(Membership.member_id).filter(
-        Membership.valid_until >= today
-    ).distinct().count()
-    expired_memberships = members_total - members_with_valid
-
-    waiting_reservations = db.query(Reservation).filter(Reservation.status == "waiting").count()
-    total_books = db.query(Book).filter(Book.is_deleted == False).count()
-    total_copies = db.query(BookCopy).filter(BookCopy.is_deleted == False).count()
-
-    return {
-        "active_loans": active_loans,
-        "overdue_loans": overdue_loans,
-        "expired_memberships": expired_memberships,
-        "waiting_reservations": waiting_reservations,
-        "total_books": total_books,
-        "total_copies": total_copies,
-        "total_members": members_total,
-    }
+
+def _date_range(column, date_from: Optional[date], date_to: Optional[date]) -> list:
+    """Filters for an inclusive date range on a date or datetime column."""
+    filters = []
+    if date_from:
+        filters.append(column >= date_from)
+    if date_to:
+        filters.append(column < date_to + timedelta(days=1))
+    return filters
 
 
 @router.get("/activity")
 def recent_activity(
+    response: Response,
     limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
     current_user: Staff = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    logs = db.query(ActivityLog).order_by(ActivityLog.created_at.desc()).limit(limit).all()
-    result = []
-    for log in logs:
-        staff = db.query(Staff).filter(Staff.id == log.user_id).first()
-        result.append({
-            "id": log.id,
-            "user": staff.full_name if staff else "Sistem",
-            "action": log.action,
-            "entity": log.entity,
-            "entity_id": log.entity_id,
-            "new_values": log.new_values,
-            "created_at": log.created_at.isoformat() if log.created_at else None,
-        })
-    return result
+    query = (
+        db.query(
+            ActivityLog.id,
+            func.coalesce(Staff.full_name, "Sistem"),
+            ActivityLog.action,
+            ActivityLog.entity,
+            ActivityLog.entity_id,
+            ActivityLog.new_values,
+            ActivityLog.created_at,
+        )
+        .outerjoin(Staff, Staff.id == ActivityLog.user_id)
+        .filter(*_date_range(ActivityLog.created_at, date_from, date_to))
+    )
+    set_total_count(response, query, ("activity_log",), ("activity", date_from, date_to),
+                    broad=not (date_from or date_to))
+    rows = paginate(query, [ActivityLog.created_at, ActivityLog.id], cursor=cursor,
+                    per_page=limit, descending=True, response=response)
+    return [
+        {
+            "id": log_id,
+            "user": user,
+            "action": action,
+            "entity": entity,
+            "entity_id": entity_id,
+            "new_values": new_values,
+            "created_at": created_at.isoformat() if created_at else None,
+        }
+        for log_id, user, action, entity, entity_id, new_values, created_at in rows
+    ]
+
+
+OVERDUE_FIELDS = ("id", "book_title", "library_number", "member_name", "member_number",
+                  "member_email", "member_phone", "due_date")
 
 
 @router.get("/overdue")
-def overdue_report(current_user: Staff = Depends(check_permission("reports")),
-                   db: Session = Depends(get_db)):
-    loans = db.query(Loan).filter(
+def overdue_report(
+    response: Response,
+    due_from: Optional[date] = Query(None),
+    due_to: Optional[date] = Query(None),
+    page: int = Query(1, ge=1),
+    per_page: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
+    current_user: Staff = Depends(check_permission("reports")),
+    db: Session = Depends(get_read_db),
+):
+    today = date.today()
+    query = loan_view.loan_query(db, OVERDUE_FIELDS).filter(
         Loan.status.in_(["active", "overdue"]),
-        Loan.due_date < date.today(),
-    ).order_by(Loan.due_date).all()
-
+        Loan.due_date < today,
+        *_date_range(Loan.due_date, due_from, due_to),
+    )
+    if per_page:
+        set_total_count(response, query, ("loans",), ("overdue_report", today, due_from, due_to))
+    rows = paginate(query, [Loan.due_date, Loan.id], cursor=cursor, page=page, per_page=per_page,
+                    response=response)
     result = []
-    for loan in loans:
-        copy = db.query(BookCopy).filter(BookCopy.id == loan.copy_id).first()
-        book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
-        member = db.query(Member).filter(Member.id == loan.member_id).first()
-        result.append({
-            "loan_id": loan.id,
-            "book_title": book.title if book else None,
-            "library_number": copy.library_number if copy else None,
-            "member_name": f"{member.first_name} {member.last_name}" if member else None,
-            "member_number": member.member_number if member else None,
-            "member_email": member.email if member else None,
-            "member_phone": member.phone if member else None,
-            "due_date": str(loan.due_date),
-            "days_late": (date.today() - loan.due_date).days,
-        })
+    for loan in loan_view.as_dicts(rows, OVERDUE_FIELDS):
+        loan["loan_id"] = loan.pop("id")
+        loan["days_late"] = (today - loan["due_date"]).days
+        loan["due_date"] = str(loan["due_date"])
+        result.append(loan)
     return result
 
 
 @router.get("/memberships")
 def membership_report(
+    response: Response,
     year: Optional[int] = Query(None),
+    paid_from: Optional[date] = Query(None),
+    paid_to: Optional[date] = Query(None),
+    page: int = Query(1, ge=1),
+    per_page: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     current_user: Staff = Depends(check_permission("reports")),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    query = db.query(Membership)
+    filters = _date_range(Membership.paid_at, paid_from, paid_to)
     if year:
-        query = query.filter(Membership.year == year)
-    memberships = query.order_by(Membership.paid_at.desc()).all()
+        filters.append(Membership.year == year)
 
-    result = []
-    total_amount = 0
-    for m in memberships:
-        member = db.query(Member).filter(Member.id == m.member_id).first()
-        total_amount += m.amount_paid
-        result.append({
-            "membership_id": m.id,
-            "member_name": f"{member.first_name} {member.last_name}" if member else None,
-            "member_number": member.member_number if member else None,
-            "member_type": member.member_type if member else None,
-            "year": m.year,
-            "amount_paid": m.amount_paid,
-            "paid_at": str(m.paid_at),
-            "valid_until": str(m.valid_until),
-        })
-    return {"memberships": result, "total_amount": total_amount, "count": len(result)}
+    # Totals cover the whole filtered set, not just the returned page
+    count, total_amount = db.query(
+        func.count(Membership.id), func.coalesce(func.sum(Membership.amount_paid), 0)
+    ).filter(*filters).one()
+
+    query = (
+        db.query(
+            Membership.id,
+            Member.first_name + " " + Member.last_name,
+            Member.member_number,
+            Member.member_type,
+            Membership.year,
+            Membership.amount_paid,
+            Membership.paid_at,
+            Membership.valid_until,
+        )
+        .outerjoin(Member, Member.id == Membership.member_id)
+        .filter(*filters)
+    )
+    rows = paginate(query, [Membership.paid_at, Membership.id], cursor=cursor, page=page,
+                    per_page=per_page, descending=True, response=response)
+    result = [
+        {
+            "membership_id": membership_id,
+            "member_name": member_name,
+            "member_number": member_number,
+            "member_type": member_type,
+            "year": year_,
+            "amount_paid": amount_paid,
+            "paid_at": str(paid_at),
+            "valid_until": str(valid_until),
+        }
+        for (membership_id, member_name, member_number, member_type,
+             year_, amount_paid, paid_at, valid_until) in rows
+    ]
+    return {"memberships": result, "total_amount": total_amount, "count": count}
 
 
 @router.get("/popular-books")
 def popular_books(
     limit: int = Query(20, ge=1, le=100),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
     current_user: Staff = Depends(check_permission("reports")),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    results = (
-        db.query(
-            Book.id, Book.title, Book.author,
-            func.count(Loan.id).label("loan_count"),
-        )
-        .join(BookCopy, BookCopy.book_id == Book.id)
-        .join(Loan, Loan.copy_id == BookCopy.id)
-        .filter(Book.is_deleted == False)
-        .group_by(Book.id)
-        .order_by(func.count(Loan.id).desc())
-        .limit(limit)
-        .all()
-    )
-    return [{"id": r[0], "title": r[1], "author": r[2], "loan_count": r[3]} for r in results]
+    """Most loaned books, optionally within an inclusive loan-date range (from the daily rollups)."""
+    return circulation.popular_books(db, limit, date_from, date_to)
+
+
+@router.get("/circulation")
+def circulation_series(
+    period: str = Query("month", description="day|month|year"),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    genre: Optional[str] = Query(None),
+    member_type: Optional[str] = Query(None),
+    by: Optional[str] = Query(None, description="genre|member_type"),
+    current_user: Staff = Depends(check_permission("reports")),
+    db: Session = Depends(get_read_db),
+):
+    """Loans and returns per day, month or year for charts, optionally split by genre or member type.
+
+    period=year over the whole range gives the year-over-year figures for the annual report.
+    """
+    if period not in circulation.PERIODS:
+        raise HTTPException(status_code=400, detail="Nepoznat period")
+    if by and by not in circulation.DIMENSIONS:
+        raise HTTPException(status_code=400, detail="Nepoznata podela")
+    return circulation.series(db, period, date_from, date_to, genre=genre, member_type=member_type, by=by)
 
 
 @router.get("/expired-memberships")
 def expired_memberships_report(
+    response: Response,
+    expired_from: Optional[date] = Query(None),
+    expired_to: Optional[date] = Query(None),
+    page: int = Query(1, ge=1),
+    per_page: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None),
     current_user: Staff = Depends(check_permission("reports")),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
+    """Active members whose latest membership ended before today (or who never had one).
+
+    expired_from/expired_to narrow the result to memberships that ended in
+    that range, which leaves out members who never had a membership.
+    """
     today = date.today()
-    members = db.query(Member).filter(Member.is_deleted == False, Member.is_active == True).all()
-    result = []
-    for member in members:
-        latest = db.query(Membership).filter(
-            Membership.member_id == member.id
-        ).order_by(Membership.valid_until.desc()).first()
-        if not latest or latest.valid_until < today:
-            result.append({
-                "member_id": member.id,
-                "member_name": f"{member.first_name} {member.last_name}",
-                "member_number": member.member_number,
-                "member_type": member.member_type,
-                "email": member.email,
-                "phone": member.phone,
-                "last_valid_until": str(latest.valid_until) if latest else "Nikad",
-            })
-    return result
+    query = (
+        db.query(
+            Member.id,
+            Member.first_name + " " + Member.last_name,
+            Member.member_number,
+            Member.member_type,
+            Member.email,
+            Member.phone,
+            Member.membership_valid_until,
+        )
+        .filter(
+            Member.is_deleted == False,
+            Member.is_active == True,
+            memberships.status_filter("expired", today),
+            *_date_range(Member.membership_valid_until, expired_from, expired_to),
+        )
+    )
+    if per_page:
+        set_total_count(response, query, ("members",),
+                        ("expired_memberships", today, expired_from, expired_to))
+    rows = paginate(query, [Member.id], cursor=cursor, page=page, per_page=per_page, response=response)
+    return [
+        {
+            "member_id": member_id,
+            "member_name": member_name,
+            "member_number": member_number,
+            "member_type": member_type,
+            "email": email,
+            "phone": phone,
+            "last_valid_until": str(valid_until) if valid_until else "Nikad",
+        }
+        for member_id, member_name, member_number, member_type, email, phone, valid_until in rows
+    ]
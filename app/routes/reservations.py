@@ -1,9 +1,11 @@
-from datetime import datetime
+import os
+from datetime import date, datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import or_
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.reservation import Reservation
 from app.models.book import Book
 from app.models.book_copy import BookCopy
@@ -12,35 +14,83 @@ from app.schemas.reservation import ReservationCreate, ReservationOut
 from app.utils.auth import get_current_user, check_permission
 from app.models.staff import Staff
 from app.utils.activity_logger import log_activity
+from app.utils.pagination import paginate
+from app.utils.cache import set_total_count
 
 router = APIRouter(prefix="/reservations", tags=["reservations"])
 
 
+ACTIVE_STATUSES = ("waiting", "notified")
+TERMINAL_STATUSES = ("fulfilled", "cancelled")
+# Finished reservations older than this are left out of the default listing
+RESERVATION_HISTORY_DAYS = int(os.environ.get("RESERVATION_HISTORY_DAYS", "90"))
+
+
 @router.get("", response_model=list[ReservationOut])
 def list_reservations(
-    status: Optional[str] = Query(None),
+    response: Response,
+    status: Optional[str] = Query(None, description="waiting|notified|fulfilled|cancelled ili active"),
+    book_id: Optional[int] = Query(None),
+    member_id: Optional[int] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    history_days: int = Query(RESERVATION_HISTORY_DAYS, ge=0),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None),
     current_user: Staff = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
-    query = db.query(Reservation)
-    if status:
+    """Newest reservations first, joined to book and member in one query.
+
+    Fulfilled/cancelled reservations older than history_days are hidden
+    unless an explicit date_from is given; history_days=0 shows them all.
+    """
+    query = (
+        db.query(
+            Reservation,
+            Book.title,
+            Book.author,
+            Member.first_name + " " + Member.last_name,
+            Member.member_number,
+        )
+        .outerjoin(Book, Book.id == Reservation.book_id)
+        .outerjoin(Member, Member.id == Reservation.member_id)
+    )
+    if status == "active":
+        query = query.filter(Reservation.status.in_(ACTIVE_STATUSES))
+    elif status:
         query = query.filter(Reservation.status == status)
-    reservations = query.order_by(Reservation.reserved_at.desc()).all()
+    if book_id:
+        query = query.filter(Reservation.book_id == book_id)
+    if member_id:
+        query = query.filter(Reservation.member_id == member_id)
+    if date_from:
+        query = query.filter(Reservation.reserved_at >= date_from)
+    if date_to:
+        query = query.filter(Reservation.reserved_at < date_to + timedelta(days=1))
+    if history_days and not date_from:
+        cutoff = datetime.combine(date.today() - timedelta(days=history_days), datetime.min.time())
+        query = query.filter(or_(
+            Reservation.status.notin_(TERMINAL_STATUSES),
+            Reservation.reserved_at >= cutoff,
+        ))
+
+    filters = (status, book_id, member_id, date_from, date_to, history_days, date.today())
+    set_total_count(response, query, ("reservations",), ("reservations",) + filters)
+    rows = paginate(query, [Reservation.reserved_at, Reservation.id], cursor=cursor, page=page,
+                    per_page=per_page, descending=True, response=response)
 
-    result = []
-    for r in reservations:
-        book = db.query(Book).filter(Book.id == r.book_id).first()
-        member = db.query(Member).filter(Member.id == r.member_id).first()
-        result.append(ReservationOut(
+    return [
+        ReservationOut(
             id=r.id, book_id=r.book_id, member_id=r.member_id,
             reserved_at=r.reserved_at, queue_position=r.queue_position,
             status=r.status, notified_at=r.notified_at, expires_at=r.expires_at,
-            book_title=book.title if book else None,
-            book_author=book.author if book else None,
-            member_name=f"{member.first_name} {member.last_name}" if member else None,
-            member_number=member.member_number if member else None,
-        ))
-    return result
+            book_title=book_title, book_author=book_author,
+            member_name=member_name, member_number=member_number,
+        )
+        for r, book_title, book_author, member_name, member_number in rows
+    ]
 
 
 @router.post("", response_model=ReservationOut)
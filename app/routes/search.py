@@ -0,0 +1,24 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+
+from app.models.staff import Staff
+from app.services.typeahead import index, KINDS
+from app.utils.auth import get_current_user, require_admin
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+
+@router.get("/suggest")
+def suggest(
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = Query(None, description="title,author,member"),
+    limit: int = Query(10, ge=1, le=50),
+    current_user: Staff = Depends(get_current_user),
+):
+    kinds = tuple(t for t in types.split(",") if t in KINDS) if types else KINDS
+    return index.suggest(q, kinds=kinds, limit=limit)
+
+
+@router.get("/suggest/stats")
+def suggest_stats(current_user: Staff = Depends(require_admin)):
+    return index.stats()
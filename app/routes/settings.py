@@ -1,51 +1,63 @@
 import os
 import json
 from datetime import datetime
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Request
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import get_db, get_read_db
 from app.models.setting import Setting
 from app.models.staff import Staff
 from app.models.user_permission import UserPermission
 from app.schemas.settings import SettingUpdate, PermissionSet, PermissionOut, EmailTestRequest
-from app.utils.auth import require_admin, get_current_user
+from app.utils.auth import require_admin, get_current_user, principal_cache
 from app.utils.activity_logger import log_activity
-from app.utils.i18n import CURRENCIES, LANGUAGES, TRANSLATIONS
+from app.utils.i18n import TRANSLATION_BUNDLES
+from app.utils.settings_cache import settings_cache
+from app.utils.cache import CachedJSON, mark_changed
+from app.utils.static_assets import STATIC_DIR, static_files, asset_response
 
 router = APIRouter(prefix="/settings", tags=["settings"])
 
 MODULES = ["books", "members", "reservations", "reports", "settings", "finance"]
 
 
-@router.get("/public/config")
-def get_public_config(db: Session = Depends(get_db)):
-    """Get public configuration (no auth required)"""
-    settings = db.query(Setting).all()
-    config = {}
-    for s in settings:
-        config[s.key] = s.value
-    
+_public_config = CachedJSON("settings", cache_control="no-cache")
+
+
+def _build_public_config() -> dict:
+    config = settings_cache.all()
     return {
         "currency": config.get("currency", "RSD"),
         "language": config.get("language", "sr"),
-        "currencies": CURRENCIES,
-        "languages": LANGUAGES,
-        "translations": TRANSLATIONS.get(config.get("language", "sr"), TRANSLATIONS["sr"]),
+        # bundle digests: the client loads /settings/public/translations/{language}?v=<digest>
+        "translation_versions": {language: bundle.digest for language, bundle in TRANSLATION_BUNDLES.items()},
         "library_name": config.get("library_name", "Biblioteka"),
+        "library_logo_url": static_files.url_for(config.get("library_logo_path", "")),
         "membership_type": config.get("membership_type", "calendar"),
     }
 
 
+@router.get("/public/config")
+def get_public_config(request: Request):
+    """Get public configuration (no auth required)"""
+    return _public_config.response(request, _build_public_config)
+
+
+@router.get("/public/translations/{language}")
+def get_translations(language: str, request: Request, v: Optional[str] = None):
+    """Translation bundle for one language (no auth required); immutable when ?v= is the current digest."""
+    bundle = TRANSLATION_BUNDLES.get(language)
+    if bundle is None:
+        raise HTTPException(status_code=404, detail="Jezik nije podržan")
+    return asset_response(request.headers, v, bundle, "application/json")
+
+
 @router.get("")
-def get_all_settings(current_user: Staff = Depends(get_current_user), db: Session = Depends(get_db)):
-    settings = db.query(Setting).all()
-    result = {}
-    for s in settings:
-        if s.key == "email_smtp_password" and not current_user.is_admin:
-            result[s.key] = "********" if s.value else ""
-        else:
-            result[s.key] = s.value
+def get_all_settings(current_user: Staff = Depends(get_current_user)):
+    result = dict(settings_cache.all())
+    if "email_smtp_password" in result and not current_user.is_admin:
+        result["email_smtp_password"] = "********" if result["email_smtp_password"] else ""
     return result
 
 
@@ -75,9 +87,8 @@ async def upload_logo(file: UploadFile = File(...),
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Fajl mora biti slika")
     ext = file.filename.split(".")[-1] if "." in file.filename else "png"
-    logo_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "frontend", "static")
-    os.makedirs(logo_dir, exist_ok=True)
-    logo_path = os.path.join(logo_dir, f"logo.{ext}")
+    os.makedirs(STATIC_DIR, exist_ok=True)
+    logo_path = os.path.join(STATIC_DIR, f"logo.{ext}")
     content = await file.read()
     with open(logo_path, "wb") as f:
         f.write(content)
@@ -88,6 +99,8 @@ async def upload_logo(file: UploadFile = File(...),
         setting.value = f"/static/logo.{ext}"
     else:
         db.add(Setting(key="library_logo_path", value=f"/static/logo.{ext}"))
+    # the path may be unchanged while the file is new: the versioned logo URL must still move on
+    mark_changed(db, "settings")
     db.commit()
     return {"message": "Logo sačuvan", "path": f"/static/logo.{ext}"}
 
@@ -96,7 +109,7 @@ async def upload_logo(file: UploadFile = File(...),
 
 @router.get("/permissions/{user_id}", response_model=list[PermissionOut])
 def get_user_permissions(user_id: int, current_user: Staff = Depends(require_admin),
-                         db: Session = Depends(get_db)):
+                         db: Session = Depends(get_read_db)):
     return db.query(UserPermission).filter(UserPermission.user_id == user_id).all()
 
 
@@ -122,6 +135,7 @@ def set_permission(data: PermissionSet, request: Request,
         )
         db.add(perm)
     db.commit()
+    principal_cache.invalidate_user(data.user_id)
     log_activity(db, current_user.id, "UPDATE", "permission", data.user_id,
                  new_values={"module": data.module, "can_read": data.can_read, "can_write": data.can_write},
                  ip_address=request.client.host if request.client else None)
@@ -131,10 +145,9 @@ def set_permission(data: PermissionSet, request: Request,
 # --- Email test ---
 
 @router.post("/email/test")
-def test_email(data: EmailTestRequest, current_user: Staff = Depends(require_admin),
-               db: Session = Depends(get_db)):
+def test_email(data: EmailTestRequest, current_user: Staff = Depends(require_admin)):
     from app.services.notifications import send_email, get_email_config
-    config = get_email_config(db)
+    config = get_email_config()
     if not config["enabled"]:
         raise HTTPException(status_code=400, detail="Email notifikacije su isključene")
 
@@ -148,3 +161,47 @@ def test_email(data: EmailTestRequest, current_user: Staff = Depends(require_adm
         return {"message": f"Test email poslat na {data.to_email}"}
     else:
         raise HTTPException(status_code=500, detail=f"Greška pri slanju: {error}")
+
+
+# --- Notification outbox ---
+
+@router.get("/email/outbox")
+def get_outbox(current_user: Staff = Depends(require_admin), db: Session = Depends(get_read_db)):
+    """Queue counts per status and the messages that gave up (dead-letter)."""
+    from sqlalchemy import func
+    from app.models.notification_outbox import NotificationOutbox
+    counts = dict(db.query(NotificationOutbox.status, func.count()).group_by(NotificationOutbox.status).all())
+    dead = (
+        db.query(NotificationOutbox)
+        .filter(NotificationOutbox.status == "dead")
+        .order_by(NotificationOutbox.id.desc())
+        .limit(100)
+        .all()
+    )
+    return {
+        "counts": {status: counts.get(status, 0) for status in ("pending", "sent", "dead")},
+        "dead": [
+            {"id": m.id, "trigger_type": m.trigger_type, "email_to": m.email_to, "subject": m.subject,
+             "attempts": m.attempts, "last_error": m.last_error, "created_at": m.created_at}
+            for m in dead
+        ],
+    }
+
+
+@router.post("/email/outbox/{message_id}/retry")
+def retry_outbox_message(message_id: int, request: Request, current_user: Staff = Depends(require_admin),
+                         db: Session = Depends(get_db)):
+    from app.models.notification_outbox import NotificationOutbox
+    message = db.query(NotificationOutbox).filter(NotificationOutbox.id == message_id).first()
+    if not message:
+        raise HTTPException(status_code=404, detail="Poruka nije pronađena")
+    if message.status != "dead":
+        raise HTTPException(status_code=400, detail="Ponovo se šalju samo neuspele poruke")
+    message.status = "pending"
+    message.attempts = 0
+    message.next_attempt_at = datetime.utcnow()
+    db.commit()
+    log_activity(db, current_user.id, "UPDATE", "notification_outbox", message_id,
+                 new_values={"status": "pending"},
+                 ip_address=request.client.host if request.client else None)
+    return {"message": "Poruka vraćena u red za slanje"}
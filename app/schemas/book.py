@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Union
 from datetime import date
 
 
@@ -73,3 +73,22 @@ class BookCopyOut(BaseModel):
 
 class BookDetailOut(BookOut):
     copies: List[BookCopyOut] = []
+
+
+class FacetCount(BaseModel):
+    value: Optional[Union[bool, int, str]] = None
+    count: int
+
+
+class BookFacets(BaseModel):
+    genre: List[FacetCount] = []
+    language: List[FacetCount] = []
+    decade: List[FacetCount] = []
+    available: List[FacetCount] = []
+
+
+class BookBrowseOut(BaseModel):
+    items: List[BookOut]
+    total: int
+    next_cursor: Optional[str] = None
+    facets: BookFacets
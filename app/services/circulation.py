@@ -0,0 +1,149 @@
+"""
+Daily circulation rollups.
+
+circulation_book_days holds loans and returns per book per day, and
+circulation_days the same per genre and member type per day (genre '' for
+books without one). create_loan and return_loan add to both in their own
+transaction; rebuild() recomputes them from the loans table (migration
+backfill, `python manage.py rebuild-circulation`).
+
+Days are the UTC dates of loaned_at / returned_at, as stored. Genre and
+member type are taken when the loan or return is recorded, so later edits
+do not move past statistics until the next rebuild.
+"""
+
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.utils.cache import mark_changed
+
+TABLES = ("circulation_book_days", "circulation_days")
+
+CREATE_TABLES = [
+    "CREATE TABLE IF NOT EXISTS circulation_book_days ("
+    " day DATE NOT NULL, book_id INTEGER NOT NULL,"
+    " loans INTEGER NOT NULL DEFAULT 0, returns INTEGER NOT NULL DEFAULT 0,"
+    " PRIMARY KEY (day, book_id))",
+    "CREATE TABLE IF NOT EXISTS circulation_days ("
+    " day DATE NOT NULL, genre TEXT NOT NULL, member_type TEXT NOT NULL,"
+    " loans INTEGER NOT NULL DEFAULT 0, returns INTEGER NOT NULL DEFAULT 0,"
+    " PRIMARY KEY (day, genre, member_type))",
+]
+
+_ADD_BOOK_DAY = text(
+    "INSERT INTO circulation_book_days (day, book_id, loans, returns) VALUES (:day, :book_id, :loans, :returns) "
+    "ON CONFLICT(day, book_id) DO UPDATE SET "
+    "loans = loans + excluded.loans, returns = returns + excluded.returns"
+)
+_ADD_DAY = text(
+    "INSERT INTO circulation_days (day, genre, member_type, loans, returns) "
+    "VALUES (:day, :genre, :member_type, :loans, :returns) "
+    "ON CONFLICT(day, genre, member_type) DO UPDATE SET "
+    "loans = loans + excluded.loans, returns = returns + excluded.returns"
+)
+
+# (day, book_id, genre, member_type, loans, returns) for every loan and return
+_EVENTS = (
+    "SELECT date(l.loaned_at) AS day, c.book_id, COALESCE(b.genre, '') AS genre, m.member_type,"
+    " 1 AS loans, 0 AS returns "
+    "FROM loans l JOIN book_copies c ON c.id = l.copy_id JOIN books b ON b.id = c.book_id "
+    "JOIN members m ON m.id = l.member_id WHERE l.loaned_at IS NOT NULL "
+    "UNION ALL "
+    "SELECT date(l.returned_at), c.book_id, COALESCE(b.genre, ''), m.member_type, 0, 1 "
+    "FROM loans l JOIN book_copies c ON c.id = l.copy_id JOIN books b ON b.id = c.book_id "
+    "JOIN members m ON m.id = l.member_id WHERE l.returned_at IS NOT NULL"
+)
+
+
+def _record(db: Session, when: datetime, book_id: int, genre: Optional[str], member_type: str,
+            loans: int, returns: int):
+    day = (when or datetime.utcnow()).date().isoformat()
+    connection = db.connection()
+    connection.execute(_ADD_BOOK_DAY, {"day": day, "book_id": book_id, "loans": loans, "returns": returns})
+    connection.execute(_ADD_DAY, {"day": day, "genre": genre or "", "member_type": member_type,
+                                  "loans": loans, "returns": returns})
+    mark_changed(db, *TABLES)
+
+
+def record_loan(db: Session, loaned_at: datetime, book_id: int, genre: Optional[str], member_type: str):
+    _record(db, loaned_at, book_id, genre, member_type, 1, 0)
+
+
+def record_return(db: Session, returned_at: datetime, book_id: int, genre: Optional[str], member_type: str):
+    _record(db, returned_at, book_id, genre, member_type, 0, 1)
+
+
+def rebuild(conn) -> int:
+    """Recompute both rollups from the loans table. Returns the number of per-book rows."""
+    conn.execute(text("DELETE FROM circulation_book_days"))
+    conn.execute(text("DELETE FROM circulation_days"))
+    conn.execute(text(
+        "INSERT INTO circulation_book_days (day, book_id, loans, returns) "
+        f"SELECT day, book_id, SUM(loans), SUM(returns) FROM ({_EVENTS}) GROUP BY day, book_id"
+    ))
+    conn.execute(text(
+        "INSERT INTO circulation_days (day, genre, member_type, loans, returns) "
+        f"SELECT day, genre, member_type, SUM(loans), SUM(returns) FROM ({_EVENTS}) "
+        "GROUP BY day, genre, member_type"
+    ))
+    return conn.execute(text("SELECT count(*) FROM circulation_book_days")).scalar()
+
+
+# --- reading ---
+
+PERIODS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+DIMENSIONS = ("genre", "member_type")
+
+
+def _day_range(date_from: Optional[date], date_to: Optional[date]) -> tuple:
+    conditions, params = [], {}
+    if date_from:
+        conditions.append("day >= :date_from")
+        params["date_from"] = date_from.isoformat()
+    if date_to:
+        conditions.append("day <= :date_to")
+        params["date_to"] = date_to.isoformat()
+    return conditions, params
+
+
+def popular_books(db: Session, limit: int, date_from: Optional[date], date_to: Optional[date]) -> list:
+    conditions, params = _day_range(date_from, date_to)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = db.execute(text(
+        "SELECT b.id, b.title, b.author, t.loan_count FROM ("
+        f" SELECT book_id, SUM(loans) AS loan_count FROM circulation_book_days {where}"
+        " GROUP BY book_id HAVING SUM(loans) > 0"
+        ") t JOIN books b ON b.id = t.book_id "
+        "WHERE b.is_deleted = 0 ORDER BY t.loan_count DESC, b.id LIMIT :limit"
+    ), {**params, "limit": limit}).all()
+    return [{"id": r[0], "title": r[1], "author": r[2], "loan_count": r[3]} for r in rows]
+
+
+def series(db: Session, period: str, date_from: Optional[date], date_to: Optional[date],
+           genre: Optional[str] = None, member_type: Optional[str] = None, by: Optional[str] = None) -> list:
+    """Loans and returns per period (day, month or year), optionally split by genre or member type."""
+    conditions, params = _day_range(date_from, date_to)
+    if genre is not None:
+        conditions.append("genre = :genre")
+        params["genre"] = genre
+    if member_type is not None:
+        conditions.append("member_type = :member_type")
+        params["member_type"] = member_type
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    group = ["period"] + ([by] if by else [])
+    rows = db.execute(text(
+        f"SELECT strftime('{PERIODS[period]}', day) AS period{', ' + by if by else ''},"
+        f" SUM(loans), SUM(returns) FROM circulation_days {where} "
+        f"GROUP BY {', '.join(group)} ORDER BY {', '.join(group)}"
+    ), params).all()
+    result = []
+    for row in rows:
+        item = {"period": row[0]}
+        if by:
+            item[by] = row[1]
+        item["loans"], item["returns"] = row[-2], row[-1]
+        result.append(item)
+    return result
@@ -0,0 +1,254 @@
+"""
+Dashboard counters, maintained incrementally.
+
+dashboard_counters holds one row per number shown on the dashboard. Every
+ORM flush that creates, changes or deletes a loan, member, reservation,
+book or copy adjusts the affected counters in the same transaction: a
+Session before_flush hook compares each object's counted state before and
+after the change (so new write paths, the Excel importer included, are
+covered without extra calls). Writes that bypass the ORM call add().
+
+Expired memberships depend on today's date, so members are counted per
+current membership end date ("valid_until:YYYY-MM-DD" rows); expired =
+members - members still valid today.
+
+reconcile() recomputes everything from the tables inside one write
+transaction, corrects the rows and logs any drift; the scheduler runs it
+every DASHBOARD_RECONCILE_INTERVAL seconds.
+"""
+
+import logging
+import os
+from datetime import date
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.base import NO_VALUE
+
+from app.models.book import Book
+from app.models.book_copy import BookCopy
+from app.models.loan import Loan
+from app.models.member import Member
+from app.models.reservation import Reservation
+from app.utils.cache import mark_changed, table_versions
+
+logger = logging.getLogger("counters")
+
+DASHBOARD_RECONCILE_INTERVAL = int(os.environ.get("DASHBOARD_RECONCILE_INTERVAL", "3600"))
+VALID_PREFIX = "valid_until:"
+
+COUNT_SQL = {
+    "active_loans": "SELECT count(*) FROM loans WHERE status IN ('active', 'overdue')",
+    "overdue_loans": "SELECT count(*) FROM loans WHERE status = 'overdue'",
+    "members": "SELECT count(*) FROM members WHERE is_deleted = 0 AND is_active = 1",
+    "waiting_reservations": "SELECT count(*) FROM reservations WHERE status = 'waiting'",
+    "books": "SELECT count(*) FROM books WHERE is_deleted = 0",
+    "copies": "SELECT count(*) FROM book_copies WHERE is_deleted = 0",
+}
+VALID_SQL = (
+    "SELECT membership_valid_until, count(*) FROM members "
+    "WHERE is_deleted = 0 AND is_active = 1 AND membership_valid_until >= :today "
+    "GROUP BY membership_valid_until"
+)
+
+
+# --- what each object contributes, from its column values ---
+
+def _loan(v: dict) -> dict:
+    return {"active_loans": v["status"] in ("active", "overdue"), "overdue_loans": v["status"] == "overdue"}
+
+
+def _member(v: dict) -> dict:
+    counted = not v["is_deleted"] and v["is_active"]
+    result = {"members": counted}
+    if counted and v["membership_valid_until"]:
+        result[VALID_PREFIX + v["membership_valid_until"].isoformat()] = True
+    return result
+
+
+def _reservation(v: dict) -> dict:
+    return {"waiting_reservations": v["status"] == "waiting"}
+
+
+def _book(v: dict) -> dict:
+    return {"books": not v["is_deleted"]}
+
+
+def _copy(v: dict) -> dict:
+    return {"copies": not v["is_deleted"]}
+
+
+TRACKED = {
+    Loan: (("status",), _loan),
+    Member: (("is_deleted", "is_active", "membership_valid_until"), _member),
+    Reservation: (("status",), _reservation),
+    Book: (("is_deleted",), _book),
+    BookCopy: (("is_deleted",), _copy),
+}
+
+
+def _current(obj, attrs) -> dict:
+    """Values as they will be written; unset columns take their scalar default."""
+    values = {}
+    columns = inspect(type(obj)).columns
+    for attr in attrs:
+        value = getattr(obj, attr)
+        if value is None and columns[attr].default is not None and columns[attr].default.is_scalar:
+            value = columns[attr].default.arg
+        values[attr] = value
+    return values
+
+
+def _previous(session: Session, obj, attrs, current: dict) -> dict:
+    """Values as they are in the database now, before this flush."""
+    state = inspect(obj)
+    values = dict(current)
+    missing = []
+    for attr in attrs:
+        if attr in state.committed_state:
+            old = state.committed_state[attr]
+            if old is NO_VALUE:  # changed without being loaded first
+                missing.append(attr)
+            else:
+                values[attr] = old
+    if missing:
+        table = inspect(type(obj)).local_table
+        row = session.connection().execute(
+            select(*(table.c[a] for a in missing)).where(table.c.id == obj.id)
+        ).one()
+        values.update(zip(missing, row))
+    return values
+
+
+def _contribution(fn, values: dict) -> dict:
+    return {name: int(bool(counted)) for name, counted in fn(values).items()}
+
+
+@event.listens_for(Session, "before_flush")
+def _track_changes(session, flush_context, instances):
+    deltas = {}
+
+    def apply(fn, old, new):
+        for name, value in (_contribution(fn, new) if new else {}).items():
+            deltas[name] = deltas.get(name, 0) + value
+        for name, value in (_contribution(fn, old) if old else {}).items():
+            deltas[name] = deltas.get(name, 0) - value
+
+    for obj in session.new:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            apply(tracked[1], None, _current(obj, tracked[0]))
+    for obj in session.dirty:
+        tracked = TRACKED.get(type(obj))
+        if tracked and any(a in inspect(obj).committed_state for a in tracked[0]):
+            current = _current(obj, tracked[0])
+            apply(tracked[1], _previous(session, obj, tracked[0], current), current)
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            current = _current(obj, tracked[0])
+            apply(tracked[1], _previous(session, obj, tracked[0], current), None)
+
+    add(session, **{name: delta for name, delta in deltas.items() if delta})
+
+
+def add(db: Session, **deltas):
+    """Adjust counters in db's transaction, e.g. add(db, overdue_loans=5) after a bulk update."""
+    if not deltas:
+        return
+    statement = text(
+        "INSERT INTO dashboard_counters (name, value) VALUES (:name, :delta) "
+        "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value"
+    )
+    connection = db.connection()
+    for name, delta in deltas.items():
+        connection.execute(statement, {"name": name, "delta": delta})
+    mark_changed(db, "dashboard_counters")
+
+
+# --- reading and reconciling ---
+
+def actual_counts(conn, today: date) -> dict:
+    """Every counter computed from the tables (the old seven COUNT queries)."""
+    counts = {name: conn.execute(text(sql)).scalar() for name, sql in COUNT_SQL.items()}
+    for valid_until, count in conn.execute(text(VALID_SQL), {"today": today.isoformat()}):
+        counts[VALID_PREFIX + str(valid_until)] = count
+    return counts
+
+
+def _stored(conn) -> dict:
+    return dict(conn.execute(text("SELECT name, value FROM dashboard_counters")).all())
+
+
+def dashboard_numbers(conn, today: date) -> dict:
+    """The dashboard payload from the counters table: one small read."""
+    counters = _stored(conn)
+    still_valid = sum(
+        value for name, value in counters.items()
+        if name.startswith(VALID_PREFIX) and name[len(VALID_PREFIX):] >= today.isoformat()
+    )
+    members = counters.get("members", 0)
+    return {
+        "active_loans": counters.get("active_loans", 0),
+        "overdue_loans": counters.get("overdue_loans", 0),
+        "expired_memberships": members - still_valid,
+        "waiting_reservations": counters.get("waiting_reservations", 0),
+        "total_books": counters.get("books", 0),
+        "total_copies": counters.get("copies", 0),
+        "total_members": members,
+    }
+
+
+_dashboard_entry = None  # ((counters version, day), payload)
+
+
+def cached_dashboard() -> dict:
+    """dashboard_numbers() for today, re-read only after the counters change."""
+    global _dashboard_entry
+    from app.database import ReadSessionLocal
+
+    today = date.today()
+    key = (table_versions.get("dashboard_counters"), today)
+    entry = _dashboard_entry
+    if entry is not None and entry[0] == key:
+        return entry[1]
+    with ReadSessionLocal() as db:
+        payload = dashboard_numbers(db.connection(), today)
+    _dashboard_entry = (key, payload)
+    return payload
+
+
+def write_counts(conn, counts: dict, today: date):
+    """Replace the stored counters with `counts`; end dates already past are dropped."""
+    conn.execute(text("DELETE FROM dashboard_counters WHERE name LIKE :prefix"), {"prefix": VALID_PREFIX + "%"})
+    for name, value in counts.items():
+        conn.execute(
+            text("INSERT INTO dashboard_counters (name, value) VALUES (:name, :value) "
+                 "ON CONFLICT(name) DO UPDATE SET value = excluded.value"),
+            {"name": name, "value": value},
+        )
+
+
+def reconcile() -> dict:
+    """Recompute the counters under the write lock and fix them. Returns {name: (stored, actual)} for drifted ones."""
+    from app.database import SessionLocal
+
+    today = date.today()
+    with SessionLocal() as db:
+        conn = db.connection()
+        actual = actual_counts(conn, today)
+        stored = {
+            name: value for name, value in _stored(conn).items()
+            if not name.startswith(VALID_PREFIX) or name[len(VALID_PREFIX):] >= today.isoformat()
+        }
+        drift = {
+            name: (stored.get(name, 0), actual.get(name, 0))
+            for name in set(stored) | set(actual)
+            if stored.get(name, 0) != actual.get(name, 0)
+        }
+        write_counts(conn, actual, today)
+        mark_changed(db, "dashboard_counters")
+        db.commit()
+    if drift:
+        logger.warning(f"Dashboard counters drifted, corrected: {drift}")
+    return drift
@@ -4,10 +4,11 @@ from typing import Optional
 from openpyxl import Workbook, load_workbook
 from sqlalchemy.orm import Session
 
-from app.database import SessionLocal
+from app.database import ReadSessionLocal
 from app.models.book import Book
 from app.models.book_copy import BookCopy
 from app.models.member import Member
+from app.services.search import index_book, index_member
 
 EXPORT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "exports")
 
@@ -20,7 +21,7 @@ def export_books_to_excel(db: Session = None) -> str:
     _ensure_export_dir()
     close_db = False
     if db is None:
-        db = SessionLocal()
+        db = ReadSessionLocal()
         close_db = True
 
     try:
@@ -66,7 +67,7 @@ def export_members_to_excel(db: Session = None) -> str:
     _ensure_export_dir()
     close_db = False
     if db is None:
-        db = SessionLocal()
+        db = ReadSessionLocal()
         close_db = True
 
     try:
@@ -177,6 +178,7 @@ def import_books_from_excel(file_path: str, db: Session) -> dict:
             )
             db.add(book)
             db.flush()
+            index_book(db, book)
 
         copy = BookCopy(
             library_number=str(data["library_number"]),
@@ -254,6 +256,8 @@ def import_members_from_excel(file_path: str, db: Session) -> dict:
             member_type=member_type,
         )
         db.add(member)
+        db.flush()
+        index_member(db, member)
         imported += 1
 
     db.commit()
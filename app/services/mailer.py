@@ -0,0 +1,170 @@
+"""
+SMTP transport for notification runs.
+
+A Mailer keeps one authenticated SMTP session per worker thread open for the
+whole run (reconnecting once when the server drops it), sends through a
+bounded thread pool and never exceeds NOTIFICATION_RATE_LIMIT messages per
+second across all workers. The old behaviour — connect, STARTTLS and log in
+for every message, strictly one after another — made large runs take most of
+an hour.
+"""
+
+import os
+import smtplib
+import ssl
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Optional, Tuple
+
+SMTP_TIMEOUT = 15
+# After this many failed sends in a row the server is treated as down for the
+# rest of the run and remaining messages fail fast instead of each timing out
+MAX_CONSECUTIVE_FAILURES = 5
+# A single message refused by the server; says nothing about the connection
+REFUSED = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+# Parallel SMTP sessions per run, and the cap on messages per second (0 = no cap)
+NOTIFICATION_WORKERS = int(os.environ.get("NOTIFICATION_WORKERS", "4"))
+NOTIFICATION_RATE_LIMIT = float(os.environ.get("NOTIFICATION_RATE_LIMIT", "50"))
+
+
+def build_message(config: dict, to_email: str, subject: str, body: str) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg["From"] = f"{config['sender_name']} <{config['user']}>"
+    msg["To"] = to_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain", "utf-8"))
+    return msg
+
+
+class SmtpTransport:
+    """One SMTP session, opened lazily and reopened after a failure."""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self._server = None
+
+    def _connect(self):
+        server = smtplib.SMTP(self.config["host"], self.config["port"], timeout=SMTP_TIMEOUT)
+        try:
+            server.ehlo()
+            if self.config.get("starttls", True):
+                server.starttls(context=ssl.create_default_context())
+                server.ehlo()
+            server.login(self.config["user"], self.config["password"])
+        except Exception:
+            server.close()
+            raise
+        self._server = server
+
+    def send(self, to_email: str, subject: str, body: str):
+        msg = build_message(self.config, to_email, subject, body).as_string()
+        for attempt in (1, 2):
+            try:
+                if self._server is None:
+                    self._connect()
+                self._server.sendmail(self.config["user"], to_email, msg)
+                return
+            except (*REFUSED, smtplib.SMTPAuthenticationError):
+                # the server answered: another attempt would get the same answer
+                raise
+            except OSError:
+                # stale or dropped session: reconnect once, then give up
+                self.close()
+                if attempt == 2:
+                    raise
+
+    def close(self):
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except Exception:
+                self._server.close()
+            self._server = None
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Mailer:
+    """Sends batches of messages over reused SMTP sessions.
+
+        with Mailer(config) as mailer:
+            results = mailer.send_many([(to, subject, body), ...])
+    """
+
+    def __init__(self, config: dict, workers: int = None, rate: float = None):
+        self.config = config
+        self.workers = max(1, workers or NOTIFICATION_WORKERS)
+        self.limiter = RateLimiter(NOTIFICATION_RATE_LIMIT if rate is None else rate)
+        self._local = threading.local()
+        self._transports = []
+        self._lock = threading.Lock()
+        self._pool = None
+        self._failures = 0
+        self._last_error = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _transport(self) -> SmtpTransport:
+        transport = getattr(self._local, "transport", None)
+        if transport is None:
+            transport = self._local.transport = SmtpTransport(self.config)
+            with self._lock:
+                self._transports.append(transport)
+        return transport
+
+    def send(self, to_email: str, subject: str, body: str) -> Tuple[bool, Optional[str]]:
+        if not self.config["enabled"] or not self.config["host"] or not self.config["user"]:
+            return False, "Email nije konfigurisan"
+        if self._failures >= MAX_CONSECUTIVE_FAILURES:
+            return False, self._last_error
+        self.limiter.wait()
+        try:
+            self._transport().send(to_email, subject, body)
+        except REFUSED as e:
+            return False, str(e)
+        except Exception as e:
+            with self._lock:
+                self._failures += 1
+                self._last_error = str(e)
+            return False, str(e)
+        self._failures = 0
+        return True, None
+
+    def send_many(self, messages: list) -> list:
+        """messages are (to_email, subject, body); returns (success, error) per message, in order."""
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="mailer")
+        return list(self._pool.map(lambda m: self.send(*m), messages))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        with self._lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
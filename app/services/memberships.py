@@ -0,0 +1,57 @@
+"""
+Current-membership projection on members.
+
+members.current_membership_id / members.membership_valid_until point at the
+member's latest membership (highest valid_until), so member lists, the
+dashboard and the expiry reports read it without touching the memberships
+table. Every code path that writes a membership calls
+refresh_current_membership() before committing.
+"""
+
+from datetime import date, timedelta
+
+from sqlalchemy import or_, text
+from sqlalchemy.orm import Session
+
+from app.models.member import Member
+from app.models.membership import Membership
+
+EXPIRING_DAYS = 30
+
+STATUSES = ("current", "expiring", "expired")
+
+
+def refresh_current_membership(db: Session, member: Member):
+    latest = (
+        db.query(Membership.id, Membership.valid_until)
+        .filter(Membership.member_id == member.id)
+        .order_by(Membership.valid_until.desc(), Membership.id.desc())
+        .first()
+    )
+    member.current_membership_id = latest.id if latest else None
+    member.membership_valid_until = latest.valid_until if latest else None
+
+
+def rebuild_current_memberships(conn):
+    """Recompute the projection for every member (migration backfill / repair)."""
+    conn.execute(text(
+        "UPDATE members SET "
+        "current_membership_id = (SELECT ms.id FROM memberships ms WHERE ms.member_id = members.id "
+        "ORDER BY ms.valid_until DESC, ms.id DESC LIMIT 1), "
+        "membership_valid_until = (SELECT MAX(ms.valid_until) FROM memberships ms "
+        "WHERE ms.member_id = members.id)"
+    ))
+
+
+def status_filter(status: str, today: date = None):
+    """Indexed range condition on members.membership_valid_until for a membership status."""
+    today = today or date.today()
+    valid_until = Member.membership_valid_until
+    if status == "current":
+        return valid_until >= today
+    if status == "expiring":
+        return valid_until.between(today, today + timedelta(days=EXPIRING_DAYS))
+    if status == "expired":
+        # never having paid counts as expired, as on the dashboard
+        return or_(valid_until.is_(None), valid_until < today)
+    raise ValueError(f"Unknown membership status: {status}")
@@ -1,12 +1,12 @@
-import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import hashlib
+import json
+import logging
+import time
 from datetime import date, datetime, timedelta
 from typing import Tuple, Optional
 from sqlalchemy.orm import Session
 
-from app.models.setting import Setting
+from app.database import SessionLocal
 from app.models.loan import Loan
 from app.models.book_copy import BookCopy
 from app.models.book import Book
@@ -14,12 +14,18 @@ from app.models.member import Member
 from app.models.membership import Membership
 from app.models.reservation import Reservation
 from app.models.notification import Notification
+from app.services import outbox
+from app.services.mailer import Mailer
+from app.utils.settings_cache import settings_cache
 
+logger = logging.getLogger("notifications")
 
-def get_email_config(db: Session) -> dict:
-    settings = {}
-    for s in db.query(Setting).filter(Setting.key.like("email_%")).all():
-        settings[s.key] = s.value
+# entity ids per already-sent lookup (SQLite caps bound parameters per statement)
+IN_CHUNK = 5000
+
+
+def get_email_config() -> dict:
+    settings = settings_cache.all()
     return {
         "host": settings.get("email_smtp_host", ""),
         "port": int(settings.get("email_smtp_port", "587")),
@@ -27,273 +33,418 @@ def get_email_config(db: Session) -> dict:
         "password": settings.get("email_smtp_password", ""),
         "sender_name": settings.get("email_sender_name", "Biblioteka"),
         "enabled": settings.get("email_enabled", "false").lower() == "true",
+        # plain SMTP only for local relays and the benchmark stand-in
+        "starttls": settings.get("email_smtp_starttls", "true").lower() == "true",
+        # one message per member for all loan reminders of a run
+        "digest": settings.get("email_digest", "false").lower() == "true",
     }
 
 
 def send_email(config: dict, to_email: str, subject: str, body: str) -> Tuple[bool, Optional[str]]:
-    if not config["enabled"] or not config["host"] or not config["user"]:
-        return False, "Email nije konfigurisan"
-
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = f"{config['sender_name']} <{config['user']}>"
-        msg["To"] = to_email
-        msg["Subject"] = subject
-        msg.attach(MIMEText(body, "plain", "utf-8"))
-
-        context = ssl.create_default_context()
-        with smtplib.SMTP(config["host"], config["port"], timeout=15) as server:
-            server.ehlo()
-            server.starttls(context=context)
-            server.ehlo()
-            server.login(config["user"], config["password"])
-            server.sendmail(config["user"], to_email, msg.as_string())
-        return True, None
-    except Exception as e:
-        return False, str(e)
-
-
-def _already_sent(db: Session, trigger_type: str, entity_id: int) -> bool:
-    """Check if notification was already sent for this trigger+entity combo."""
-    existing = db.query(Notification).filter(
-        Notification.trigger_type == trigger_type,
-        Notification.entity_id == entity_id,
-        Notification.success == True,
-    ).first()
-    return existing is not None
-
-
-def _already_sent_this_week(db: Session, trigger_type: str, entity_id: int) -> bool:
-    """For weekly triggers — check if sent in last 7 days."""
-    week_ago = datetime.utcnow() - timedelta(days=7)
-    existing = db.query(Notification).filter(
-        Notification.trigger_type == trigger_type,
-        Notification.entity_id == entity_id,
-        Notification.success == True,
-        Notification.sent_at >= week_ago,
-    ).first()
-    return existing is not None
-
-
-def _record_notification(db: Session, trigger_type: str, entity_id: int,
-                         member_id: int, email: str, subject: str, body: str,
-                         success: bool, error: str = None):
-    notif = Notification(
-        trigger_type=trigger_type,
-        entity_id=entity_id,
-        member_id=member_id,
-        email_to=email,
-        subject=subject,
-        body=body,
-        success=success,
-        error_message=error,
+    """Send a single message over its own SMTP session (e.g. the settings test email)."""
+    with Mailer(config, workers=1, rate=0) as mailer:
+        return mailer.send(to_email, subject, body)
+
+
+def _chunks(items: list, size: int = IN_CHUNK):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _sent_keys(db: Session, trigger_type: str, entity_ids: list, since: Optional[datetime] = None) -> set:
+    """Entity ids among `entity_ids` that already got a successful `trigger_type` notification
+    (since `since`, for triggers that repeat)."""
+    sent = set()
+    for chunk in _chunks(entity_ids):
+        query = db.query(Notification.entity_id).filter(
+            Notification.trigger_type == trigger_type,
+            Notification.success == True,
+            Notification.entity_id.in_(chunk),
+        )
+        if since is not None:
+            query = query.filter(Notification.sent_at >= since)
+        sent.update(row[0] for row in query)
+    return sent
+
+
+def _get_library_name() -> str:
+    return settings_cache.get("library_name", "Biblioteka")
+
+
+# --- Candidates: one joined query per trigger, members without email left out ---
+
+def _member_columns():
+    return (
+        Member.id.label("member_id"),
+        Member.first_name.label("first_name"),
+        Member.last_name.label("last_name"),
+        Member.email.label("email"),
     )
-    db.add(notif)
-    db.commit()
 
 
-def _get_library_name(db: Session) -> str:
-    s = db.query(Setting).filter(Setting.key == "library_name").first()
-    return s.value if s else "Biblioteka"
+def _with_email(query):
+    return query.filter(Member.email.isnot(None), Member.email != "")
 
 
-def process_due_tomorrow(db: Session, config: dict):
-    """Rok vraćanja — sutra. Šalje se svako veče."""
-    tomorrow = date.today() + timedelta(days=1)
-    loans = db.query(Loan).filter(
-        Loan.status == "active",
-        Loan.due_date == tomorrow,
+def _loan_candidates(db: Session, *filters) -> list:
+    return _with_email(
+        db.query(Loan.id.label("entity_id"), Loan.due_date.label("due_date"),
+                 Book.title.label("book_title"), *_member_columns())
+        .join(Member, Member.id == Loan.member_id)
+        .outerjoin(BookCopy, BookCopy.id == Loan.copy_id)
+        .outerjoin(Book, Book.id == BookCopy.book_id)
+        .filter(*filters)
     ).all()
 
-    library_name = _get_library_name(db)
 
-    for loan in loans:
-        if _already_sent(db, "due_tomorrow", loan.id):
-            continue
-        member = db.query(Member).filter(Member.id == loan.member_id).first()
-        if not member or not member.email:
-            continue
-        copy = db.query(BookCopy).filter(BookCopy.id == loan.copy_id).first()
-        book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
-        book_title = book.title if book else "Nepoznata knjiga"
-
-        subject = f"Podsetnik: knjiga \"{book_title}\" se vraća sutra"
-        body = (
-            f"Poštovani/a {member.first_name} {member.last_name},\n\n"
-            f"Podsetnik da knjiga \"{book_title}\" treba da se vrati sutra ({tomorrow.strftime('%d.%m.%Y.')}).\n\n"
-            f"Molimo vas da knjigu vratite na vreme.\n\n"
-            f"Srdačan pozdrav,\n{library_name}"
-        )
+def _due_tomorrow_candidates(db: Session, today: date) -> list:
+    return _loan_candidates(db, Loan.status == "active", Loan.due_date == today + timedelta(days=1))
 
-        success, error = send_email(config, member.email, subject, body)
-        _record_notification(db, "due_tomorrow", loan.id, member.id, member.email, subject, body, success, error)
 
+def _due_today_candidates(db: Session, today: date) -> list:
+    return _loan_candidates(db, Loan.status == "active", Loan.due_date == today)
 
-def process_due_today(db: Session, config: dict):
-    """Rok vraćanja — danas. Šalje se ujutro na dan roka."""
-    today = date.today()
-    loans = db.query(Loan).filter(
-        Loan.status == "active",
-        Loan.due_date == today,
-    ).all()
 
-    library_name = _get_library_name(db)
+def _overdue_candidates(db: Session, today: date) -> list:
+    return _loan_candidates(db, Loan.status.in_(["active", "overdue"]), Loan.due_date < today)
 
-    for loan in loans:
-        if _already_sent(db, "due_today", loan.id):
-            continue
-        member = db.query(Member).filter(Member.id == loan.member_id).first()
-        if not member or not member.email:
-            continue
-        copy = db.query(BookCopy).filter(BookCopy.id == loan.copy_id).first()
-        book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
-        book_title = book.title if book else "Nepoznata knjiga"
-
-        subject = f"Danas je rok za vraćanje knjige \"{book_title}\""
-        body = (
-            f"Poštovani/a {member.first_name} {member.last_name},\n\n"
-            f"Danas ({today.strftime('%d.%m.%Y.')}) ističe rok za vraćanje knjige \"{book_title}\".\n\n"
-            f"Molimo vas da knjigu vratite danas.\n\n"
-            f"Srdačan pozdrav,\n{library_name}"
-        )
 
-        success, error = send_email(config, member.email, subject, body)
-        _record_notification(db, "due_today", loan.id, member.id, member.email, subject, body, success, error)
+def _reservation_rows(db: Session, *filters) -> list:
+    return _with_email(
+        db.query(Reservation.id.label("entity_id"), Reservation.expires_at.label("expires_at"),
+                 Book.title.label("book_title"), *_member_columns())
+        .join(Member, Member.id == Reservation.member_id)
+        .outerjoin(Book, Book.id == Reservation.book_id)
+        .filter(Reservation.status == "notified", *filters)
+    ).all()
 
 
-def process_overdue(db: Session, config: dict):
-    """Knjiga kasni. Jednom nedeljno podsetnik."""
-    today = date.today()
-    loans = db.query(Loan).filter(
-        Loan.status.in_(["active", "overdue"]),
-        Loan.due_date < today,
+def _reservation_candidates(db: Session, today: date) -> list:
+    # Normally queued by return_loan already; this catches anything that was missed
+    return _reservation_rows(db)
+
+
+def _membership_candidates(db: Session, valid_until: date) -> list:
+    # Only the member's current membership counts: a renewed membership does not expire
+    return _with_email(
+        db.query(Membership.id.label("entity_id"), Membership.valid_until.label("valid_until"),
+                 *_member_columns())
+        .join(Member, Member.current_membership_id == Membership.id)
+        .filter(Member.membership_valid_until == valid_until)
     ).all()
 
-    library_name = _get_library_name(db)
 
-    for loan in loans:
-        if _already_sent_this_week(db, "overdue_weekly", loan.id):
-            continue
-        member = db.query(Member).filter(Member.id == loan.member_id).first()
-        if not member or not member.email:
-            continue
-        copy = db.query(BookCopy).filter(BookCopy.id == loan.copy_id).first()
-        book = db.query(Book).filter(Book.id == copy.book_id).first() if copy else None
-        book_title = book.title if book else "Nepoznata knjiga"
-        days_late = (today - loan.due_date).days
-
-        subject = f"Knjiga \"{book_title}\" kasni {days_late} dana"
-        body = (
-            f"Poštovani/a {member.first_name} {member.last_name},\n\n"
-            f"Knjiga \"{book_title}\" je trebalo da bude vraćena {loan.due_date.strftime('%d.%m.%Y.')}.\n"
-            f"Kasni već {days_late} dana.\n\n"
-            f"Molimo vas da knjigu vratite što pre.\n\n"
-            f"Srdačan pozdrav,\n{library_name}"
-        )
+def _membership_expiring_candidates(db: Session, today: date) -> list:
+    return _membership_candidates(db, today + timedelta(days=30))
 
-        success, error = send_email(config, member.email, subject, body)
-        _record_notification(db, "overdue_weekly", loan.id, member.id, member.email, subject, body, success, error)
 
+def _membership_expired_candidates(db: Session, today: date) -> list:
+    return _membership_candidates(db, today)
 
-def process_reservation_available(db: Session, config: dict):
-    """Rezervacija dostupna — odmah kad se vrati knjiga.
-    This is triggered from the return_loan endpoint. Here we check for any
-    notified reservations that haven't had an email sent yet."""
-    reservations = db.query(Reservation).filter(
-        Reservation.status == "notified",
+
+def _membership_paid_rows(db: Session, membership_id: int) -> list:
+    return _with_email(
+        db.query(Membership.id.label("entity_id"), Membership.valid_until.label("valid_until"),
+                 *_member_columns())
+        .join(Member, Member.id == Membership.member_id)
+        .filter(Membership.id == membership_id)
     ).all()
 
-    library_name = _get_library_name(db)
 
-    for reservation in reservations:
-        if _already_sent(db, "reservation_available", reservation.id):
-            continue
-        member = db.query(Member).filter(Member.id == reservation.member_id).first()
-        if not member or not member.email:
-            continue
-        book = db.query(Book).filter(Book.id == reservation.book_id).first()
-        book_title = book.title if book else "Nepoznata knjiga"
-
-        expires_str = ""
-        if reservation.expires_at:
-            expires_str = f"\nKnjigu možete preuzeti do {reservation.expires_at.strftime('%d.%m.%Y.')}."
-
-        subject = f"Vaša rezervacija je dostupna: \"{book_title}\""
-        body = (
-            f"Poštovani/a {member.first_name} {member.last_name},\n\n"
-            f"Knjiga \"{book_title}\" koju ste rezervisali je sada dostupna za preuzimanje.{expires_str}\n\n"
-            f"Srdačan pozdrav,\n{library_name}"
-        )
+# --- Messages ---
 
-        success, error = send_email(config, member.email, subject, body)
-        _record_notification(db, "reservation_available", reservation.id, member.id, member.email, subject, body, success, error)
+def _book_title(row) -> str:
+    return row.book_title or "Nepoznata knjiga"
 
 
-def process_membership_expiring(db: Session, config: dict):
-    """Članarina ističe za 30 dana."""
-    target_date = date.today() + timedelta(days=30)
-    memberships = db.query(Membership).filter(
-        Membership.valid_until == target_date,
-    ).all()
+def _due_tomorrow_message(row, today: date, library_name: str) -> Tuple[str, str]:
+    """Rok vraćanja — sutra. Šalje se svako veče."""
+    subject = f"Podsetnik: knjiga \"{_book_title(row)}\" se vraća sutra"
+    body = (
+        f"Poštovani/a {row.first_name} {row.last_name},\n\n"
+        f"Podsetnik da knjiga \"{_book_title(row)}\" treba da se vrati sutra ({row.due_date.strftime('%d.%m.%Y.')}).\n\n"
+        f"Molimo vas da knjigu vratite na vreme.\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
 
-    library_name = _get_library_name(db)
 
-    for membership in memberships:
-        if _already_sent(db, "membership_expiring", membership.id):
-            continue
-        member = db.query(Member).filter(Member.id == membership.member_id).first()
-        if not member or not member.email:
-            continue
+def _due_today_message(row, today: date, library_name: str) -> Tuple[str, str]:
+    """Rok vraćanja — danas. Šalje se ujutro na dan roka."""
+    subject = f"Danas je rok za vraćanje knjige \"{_book_title(row)}\""
+    body = (
+        f"Poštovani/a {row.first_name} {row.last_name},\n\n"
+        f"Danas ({today.strftime('%d.%m.%Y.')}) ističe rok za vraćanje knjige \"{_book_title(row)}\".\n\n"
+        f"Molimo vas da knjigu vratite danas.\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
 
-        subject = "Članarina ističe za 30 dana"
-        body = (
-            f"Poštovani/a {member.first_name} {member.last_name},\n\n"
-            f"Vaša članarina u biblioteci ističe {membership.valid_until.strftime('%d.%m.%Y.')}.\n\n"
-            f"Molimo vas da obnovite članarinu na vreme.\n\n"
-            f"Srdačan pozdrav,\n{library_name}"
-        )
 
-        success, error = send_email(config, member.email, subject, body)
-        _record_notification(db, "membership_expiring", membership.id, member.id, member.email, subject, body, success, error)
+def _overdue_message(row, today: date, library_name: str) -> Tuple[str, str]:
+    """Knjiga kasni. Jednom nedeljno podsetnik."""
+    days_late = (today - row.due_date).days
+    subject = f"Knjiga \"{_book_title(row)}\" kasni {days_late} dana"
+    body = (
+        f"Poštovani/a {row.first_name} {row.last_name},\n\n"
+        f"Knjiga \"{_book_title(row)}\" je trebalo da bude vraćena {row.due_date.strftime('%d.%m.%Y.')}.\n"
+        f"Kasni već {days_late} dana.\n\n"
+        f"Molimo vas da knjigu vratite što pre.\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
+
+
+def _reservation_message(row, today: date, library_name: str) -> Tuple[str, str]:
+    """Rezervacija dostupna — return_loan je postavio status 'notified'."""
+    expires_str = ""
+    if row.expires_at:
+        expires_str = f"\nKnjigu možete preuzeti do {row.expires_at.strftime('%d.%m.%Y.')}."
+    subject = f"Vaša rezervacija je dostupna: \"{_book_title(row)}\""
+    body = (
+        f"Poštovani/a {row.first_name} {row.last_name},\n\n"
+        f"Knjiga \"{_book_title(row)}\" koju ste rezervisali je sada dostupna za preuzimanje.{expires_str}\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
+
 
+def _membership_expiring_message(row, today: date, library_name: str) -> Tuple[str, str]:
+    """Članarina ističe za 30 dana."""
+    subject = "Članarina ističe za 30 dana"
+    body = (
+        f"Poštovani/a {row.first_name} {row.last_name},\n\n"
+        f"Vaša članarina u biblioteci ističe {row.valid_until.strftime('%d.%m.%Y.')}.\n\n"
+        f"Molimo vas da obnovite članarinu na vreme.\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
 
-def process_membership_expired(db: Session, config: dict):
+
+def _membership_expired_message(row, today: date, library_name: str) -> Tuple[str, str]:
     """Članarina istekla — na dan isteka."""
+    subject = "Vaša članarina je istekla"
+    body = (
+        f"Poštovani/a {row.first_name} {row.last_name},\n\n"
+        f"Vaša članarina u biblioteci je istekla danas ({today.strftime('%d.%m.%Y.')}).\n\n"
+        f"Molimo vas da obnovite članarinu kako biste nastavili da koristite usluge biblioteke.\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
+
+
+def _membership_paid_message(row, today: date, library_name: str) -> Tuple[str, str]:
+    """Potvrda uplate članarine — odmah po evidentiranju."""
+    subject = "Članarina je evidentirana"
+    body = (
+        f"Poštovani/a {row.first_name} {row.last_name},\n\n"
+        f"Vaša članarina je evidentirana i važi do {row.valid_until.strftime('%d.%m.%Y.')}.\n\n"
+        f"Hvala vam što ste član biblioteke.\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
+
+
+# (trigger_type, candidates, message, resend_after) — resend_after=None means once per entity
+TRIGGERS = [
+    ("due_tomorrow", _due_tomorrow_candidates, _due_tomorrow_message, None),
+    ("due_today", _due_today_candidates, _due_today_message, None),
+    ("overdue_weekly", _overdue_candidates, _overdue_message, timedelta(days=7)),
+    ("reservation_available", _reservation_candidates, _reservation_message, None),
+    ("membership_expiring", _membership_expiring_candidates, _membership_expiring_message, None),
+    ("membership_expired", _membership_expired_candidates, _membership_expired_message, None),
+]
+
+
+# Loan reminders that digest mode folds into one message per member:
+# trigger_type -> (section heading, line per loan)
+DIGEST_SECTIONS = {
+    "due_tomorrow": (
+        "Rok za vraćanje je sutra:",
+        lambda row, today: f"- \"{_book_title(row)}\" (rok {row.due_date.strftime('%d.%m.%Y.')})",
+    ),
+    "due_today": (
+        "Danas ističe rok za vraćanje:",
+        lambda row, today: f"- \"{_book_title(row)}\"",
+    ),
+    "overdue_weekly": (
+        "Knjige koje kasne:",
+        lambda row, today: (f"- \"{_book_title(row)}\" — rok je bio {row.due_date.strftime('%d.%m.%Y.')}, "
+                            f"kasni {(today - row.due_date).days} dana"),
+    ),
+}
+
+
+def _digest_message(items: list, today: date, library_name: str) -> Tuple[str, str]:
+    """Svi podsetnici o pozajmicama jednog člana u jednoj poruci. items su (trigger_type, row, key)."""
+    first = items[0][1]
+    sections = []
+    for trigger_type, (heading, line) in DIGEST_SECTIONS.items():
+        lines = [line(row, today) for t, row, _ in items if t == trigger_type]
+        if lines:
+            sections.append(heading + "\n" + "\n".join(lines))
+    subject = f"Podsetnik o pozajmljenim knjigama ({len(items)})"
+    body = (
+        f"Poštovani/a {first.first_name} {first.last_name},\n\n"
+        + "\n\n".join(sections)
+        + f"\n\nMolimo vas da knjige vratite na vreme.\n\n"
+        f"Srdačan pozdrav,\n{library_name}"
+    )
+    return subject, body
+
+
+# Event triggers queued by write paths: trigger_type -> (rows for one entity id, message)
+EVENTS = {
+    "reservation_available": (lambda db, entity_id: _reservation_rows(db, Reservation.id == entity_id),
+                              _reservation_message),
+    "membership_paid": (_membership_paid_rows, _membership_paid_message),
+}
+
+
+def _idempotency_key(trigger_type: str, entity_id: int, today: date, resend_after: Optional[timedelta]) -> str:
+    # repeating triggers get one key per resend window
+    if resend_after:
+        return f"{trigger_type}:{entity_id}:{today.toordinal() // resend_after.days}"
+    return f"{trigger_type}:{entity_id}"
+
+
+def _outbox_messages(trigger_type: str, rows: list, keys: list, message, today: date, library_name: str) -> list:
+    result = []
+    for row, key in zip(rows, keys):
+        subject, body = message(row, today, library_name)
+        result.append({
+            "idempotency_key": key,
+            "trigger_type": trigger_type,
+            "entity_id": row.entity_id,
+            "member_id": row.member_id,
+            "email_to": row.email,
+            "subject": subject,
+            "body": body,
+        })
+    return result
+
+
+def enqueue_event(db: Session, trigger_type: str, entity_id: int):
+    """Queue the message for one event (e.g. a reserved book coming back) in db's
+    transaction; the outbox dispatcher sends it within OUTBOX_DISPATCH_INTERVAL."""
+    if not get_email_config()["enabled"]:
+        return
+    rows_for, message = EVENTS[trigger_type]
+    rows = rows_for(db, entity_id)
     today = date.today()
-    memberships = db.query(Membership).filter(
-        Membership.valid_until == today,
-    ).all()
+    keys = [_idempotency_key(trigger_type, row.entity_id, today, None) for row in rows]
+    outbox.enqueue(db, _outbox_messages(trigger_type, rows, keys, message, today, _get_library_name()))
+
+
+def _enqueue(messages: list):
+    if messages:
+        with SessionLocal() as writer:
+            outbox.enqueue(writer, messages)
+            writer.commit()
+
+
+def run_trigger(db: Session, trigger: tuple, today: date, library_name: str,
+                digest_items: Optional[list] = None, skip_keys: frozenset = frozenset()) -> dict:
+    """Candidates -> preloaded already-sent/queued keys -> one bulk enqueue. Returns run stats.
+
+    With digest_items, pending items are appended there as (trigger_type, row, key)
+    for run_digest instead of being queued one message each.
+    """
+    trigger_type, candidates, message, resend_after = trigger
+    started = time.perf_counter()
+
+    rows = candidates(db, today)
+    since = datetime.utcnow() - resend_after if resend_after else None
+    sent = _sent_keys(db, trigger_type, [row.entity_id for row in rows], since)
+    keys = [_idempotency_key(trigger_type, row.entity_id, today, resend_after) for row in rows]
+    queued = outbox.queued_keys(db, keys) | skip_keys
+    pending = [(row, key) for row, key in zip(rows, keys) if row.entity_id not in sent and key not in queued]
+
+    if digest_items is not None:
+        digest_items.extend((trigger_type, row, key) for row, key in pending)
+        messages = []
+    else:
+        messages = _outbox_messages(trigger_type, [row for row, _ in pending], [key for _, key in pending],
+                                    message, today, library_name)
+        _enqueue(messages)
 
-    library_name = _get_library_name(db)
+    return {
+        "trigger": trigger_type,
+        "candidates": len(rows),
+        "already_sent": len(rows) - len(pending),
+        "queued": len(messages),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
 
-    for membership in memberships:
-        if _already_sent(db, "membership_expired", membership.id):
-            continue
-        member = db.query(Member).filter(Member.id == membership.member_id).first()
-        if not member or not member.email:
-            continue
 
-        subject = "Vaša članarina je istekla"
-        body = (
-            f"Poštovani/a {member.first_name} {member.last_name},\n\n"
-            f"Vaša članarina u biblioteci je istekla danas ({today.strftime('%d.%m.%Y.')}).\n\n"
-            f"Molimo vas da obnovite članarinu kako biste nastavili da koristite usluge biblioteke.\n\n"
-            f"Srdačan pozdrav,\n{library_name}"
-        )
+def run_digest(items: list, today: date, library_name: str) -> dict:
+    """Queue one message per member for the collected loan reminders. Every item keeps its
+    own key inside the digest, so history and the already-sent checks stay per loan.
+    A member with a single reminder gets the usual message for it."""
+    started = time.perf_counter()
+    messages_by_trigger = {trigger_type: message for trigger_type, _, message, _ in TRIGGERS}
+    by_member = {}
+    for item in items:
+        by_member.setdefault(item[1].member_id, []).append(item)
+
+    messages = []
+    for member_id, member_items in by_member.items():
+        if len(member_items) == 1:
+            trigger_type, row, key = member_items[0]
+            messages += _outbox_messages(trigger_type, [row], [key], messages_by_trigger[trigger_type],
+                                         today, library_name)
+            continue
+        subject, body = _digest_message(member_items, today, library_name)
+        item_keys = sorted(key for _, _, key in member_items)
+        messages.append({
+            "idempotency_key": f"digest:{member_id}:" + hashlib.sha1("|".join(item_keys).encode()).hexdigest()[:16],
+            "trigger_type": "digest",
+            "entity_id": member_id,
+            "member_id": member_id,
+            "email_to": member_items[0][1].email,
+            "subject": subject,
+            "body": body,
+            "entities": json.dumps([
+                {"trigger_type": trigger_type, "entity_id": row.entity_id, "key": key}
+                for trigger_type, row, key in member_items
+            ]),
+        })
+    _enqueue(messages)
 
-        success, error = send_email(config, member.email, subject, body)
-        _record_notification(db, "membership_expired", membership.id, member.id, member.email, subject, body, success, error)
+    return {
+        "trigger": "digest",
+        "candidates": len(items),
+        "already_sent": 0,
+        "queued": len(messages),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
 
 
-def run_all_notifications(db: Session):
-    """Run all notification checks. Called by scheduler."""
-    config = get_email_config(db)
+def run_all_notifications(db: Session) -> list:
+    """Run all notification checks and queue the messages for the outbox dispatcher.
+    Called by scheduler with a read-only session. Returns per-trigger stats
+    (empty when email is disabled)."""
+    config = get_email_config()
     if not config["enabled"]:
-        return
+        return []
 
-    process_due_tomorrow(db, config)
-    process_due_today(db, config)
-    process_overdue(db, config)
-    process_reservation_available(db, config)
-    process_membership_expiring(db, config)
-    process_membership_expired(db, config)
+    today = date.today()
+    library_name = _get_library_name()
+    digest_items = [] if config["digest"] else None
+    skip_keys = frozenset(outbox.digest_item_keys(db)) if config["digest"] else frozenset()
+    report = []
+    for trigger in TRIGGERS:
+        if trigger[0] in DIGEST_SECTIONS:
+            stats = run_trigger(db, trigger, today, library_name, digest_items, skip_keys)
+        else:
+            stats = run_trigger(db, trigger, today, library_name)
+        report.append(stats)
+    if digest_items is not None:
+        report.append(run_digest(digest_items, today, library_name))
+
+    for stats in report:
+        logger.info(
+            f"{stats['trigger']}: {stats['candidates']} candidates, {stats['already_sent']} already sent "
+            f"or queued, {stats['queued']} queued in {stats['seconds']}s"
+        )
+    return report
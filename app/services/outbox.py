@@ -0,0 +1,173 @@
+"""
+Durable notification outbox.
+
+Write paths and the scheduled notification run never talk to SMTP: they
+enqueue messages into notification_outbox in their own transaction, keyed by
+an idempotency key, so a message is queued at most once and is never lost
+with a rolled-back request. The dispatcher (a scheduler job every
+OUTBOX_DISPATCH_INTERVAL seconds) sends what is due over one Mailer and
+records the outcome; a failed send is retried with exponential backoff and
+moved to the dead-letter state ("dead") after OUTBOX_MAX_ATTEMPTS.
+
+A digest message covers several items (trigger_type, entity_id) listed in its
+`entities` column; its outcome is recorded in the history once per item.
+"""
+
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, ReadSessionLocal
+from app.models.notification import Notification
+from app.models.notification_outbox import NotificationOutbox
+from app.utils.cache import mark_changed
+
+logger = logging.getLogger("outbox")
+
+OUTBOX_DISPATCH_INTERVAL = int(os.environ.get("OUTBOX_DISPATCH_INTERVAL", "20"))
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get("OUTBOX_MAX_ATTEMPTS", "8"))
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_MAX = timedelta(hours=2)
+DISPATCH_BATCH = 100
+# sent messages are kept this long, then pruned (dead ones stay until retried or deleted)
+RETENTION = timedelta(days=30)
+KEY_CHUNK = 5000
+
+
+def backoff(attempts: int) -> timedelta:
+    """Delay before the next try after `attempts` failed sends: 30 s, 1 min, 2 min, ... capped at 2 h."""
+    return min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+
+
+def enqueue(db: Session, messages: list):
+    """Queue messages in db's transaction; keys already in the outbox are skipped.
+
+    Each message is a dict with idempotency_key, trigger_type, entity_id,
+    member_id, email_to, subject and body (and entities for digests).
+    """
+    if not messages:
+        return
+    now = datetime.utcnow()
+    rows = [{"entities": None, **m, "status": "pending", "attempts": 0, "next_attempt_at": now, "created_at": now}
+            for m in messages]
+    statement = sqlite_insert(NotificationOutbox.__table__).on_conflict_do_nothing(
+        index_elements=["idempotency_key"]
+    )
+    db.execute(statement, rows)
+    mark_changed(db, "notification_outbox")
+
+
+def queued_keys(db: Session, keys: list) -> set:
+    """Keys among `keys` that are already in the outbox, whatever their status."""
+    found = set()
+    for i in range(0, len(keys), KEY_CHUNK):
+        chunk = keys[i:i + KEY_CHUNK]
+        found.update(row[0] for row in db.query(NotificationOutbox.idempotency_key).filter(
+            NotificationOutbox.idempotency_key.in_(chunk)
+        ))
+    return found
+
+
+def digest_item_keys(db: Session) -> set:
+    """Item keys covered by digests that are not sent yet (pending or dead).
+    Sent ones are already in the notification history."""
+    keys = set()
+    for (entities,) in db.query(NotificationOutbox.entities).filter(
+        NotificationOutbox.entities.isnot(None), NotificationOutbox.status != "sent"
+    ):
+        keys.update(item["key"] for item in json.loads(entities))
+    return keys
+
+
+def _items(message) -> list:
+    if message.entities:
+        return [(item["trigger_type"], item["entity_id"]) for item in json.loads(message.entities)]
+    return [(message.trigger_type, message.entity_id)]
+
+
+def _record_results(messages: list, results: list, stats: dict):
+    now = datetime.utcnow()
+    updates = []
+    history = []
+    for message, (success, error) in zip(messages, results):
+        attempts = message.attempts + 1
+        if success:
+            updates.append({"id": message.id, "status": "sent", "attempts": attempts,
+                            "sent_at": now, "last_error": None})
+            stats["sent"] += 1
+        elif attempts >= OUTBOX_MAX_ATTEMPTS:
+            updates.append({"id": message.id, "status": "dead", "attempts": attempts, "last_error": error})
+            stats["dead"] += 1
+        else:
+            updates.append({"id": message.id, "attempts": attempts, "last_error": error,
+                            "next_attempt_at": now + backoff(attempts)})
+            stats["retry"] += 1
+            continue
+        # final outcome goes into the notification history (and its already-sent checks)
+        history.extend({
+            "trigger_type": trigger_type,
+            "entity_id": entity_id,
+            "member_id": message.member_id,
+            "email_to": message.email_to,
+            "subject": message.subject,
+            "body": message.body,
+            "sent_at": now,
+            "success": success,
+            "error_message": error,
+        } for trigger_type, entity_id in _items(message))
+
+    with SessionLocal() as writer:
+        writer.execute(update(NotificationOutbox), updates)
+        if history:
+            writer.execute(insert(Notification), history)
+        mark_changed(writer, "notification_outbox", "notifications")
+        writer.commit()
+
+
+def dispatch_due(batch: int = DISPATCH_BATCH) -> dict:
+    """Send every message that is due. Returns counts of sent / retry / dead."""
+    from app.services.mailer import Mailer
+    from app.services.notifications import get_email_config
+
+    stats = {"sent": 0, "retry": 0, "dead": 0}
+    config = get_email_config()
+    if not config["enabled"]:
+        return stats
+
+    with Mailer(config) as mailer:
+        while True:
+            with ReadSessionLocal() as db:
+                due = (
+                    db.query(NotificationOutbox)
+                    .filter(NotificationOutbox.status == "pending",
+                            NotificationOutbox.next_attempt_at <= datetime.utcnow())
+                    .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+                    .limit(batch)
+                    .all()
+                )
+            if not due:
+                break
+            results = mailer.send_many([(m.email_to, m.subject, m.body) for m in due])
+            _record_results(due, results, stats)
+            if len(due) < batch:
+                break
+    if any(stats.values()):
+        logger.info(f"Outbox: {stats['sent']} sent, {stats['retry']} to retry, {stats['dead']} dead")
+    return stats
+
+
+def prune_sent():
+    """Delete sent messages older than RETENTION (their history stays in notifications)."""
+    with SessionLocal() as writer:
+        writer.execute(
+            delete(NotificationOutbox)
+            .where(NotificationOutbox.status == "sent",
+                   NotificationOutbox.sent_at < datetime.utcnow() - RETENTION)
+            .execution_options(synchronize_session=False)
+        )
+        writer.commit()
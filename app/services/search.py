@@ -0,0 +1,265 @@
+"""
+Full-text catalog and member search (SQLite FTS5).
+
+books_fts holds folded copies (see app.utils.text.fold) of the searchable
+book columns under rowid = books.id, so "Andric", "andrić" and "Андрић"
+all match the same title. members_fts does the same for member names and
+adds member number, phone (digits only) and lowercased email. Both indices
+are kept in sync by the write paths (app/routes/books.py,
+app/routes/members.py, the Excel importer) inside their own transaction;
+rebuild them with `python manage.py rebuild-search`.
+
+book_trigrams maps every trigram of a book's folded title and author to
+the book; fuzzy search looks candidates up through it (never scanning the
+catalog) and ranks them by trigram similarity, so "Dostojevskij" still
+finds "Достојевски".
+"""
+
+from typing import Optional
+
+from sqlalchemy import text, select, func, case, and_, bindparam, literal, literal_column, table, column
+
+from app.utils.text import fold, tokens, trigrams, normalize_phone
+
+BOOK_FIELDS = ("title", "author", "publisher", "genre", "description")
+# bm25 column weights, in BOOK_FIELDS order
+BOOK_WEIGHTS = (10.0, 6.0, 1.0, 2.0, 1.0)
+
+CREATE_BOOKS_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5("
+    "title, author, publisher, genre, description, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+
+books_fts = table("books_fts", column("rowid"), *(column(f) for f in BOOK_FIELDS))
+
+CREATE_BOOK_TRIGRAMS = (
+    "CREATE TABLE IF NOT EXISTS book_trigrams ("
+    "trigram TEXT NOT NULL, book_id INTEGER NOT NULL, "
+    "PRIMARY KEY (trigram, book_id)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS idx_book_trigrams_book ON book_trigrams(book_id)",
+)
+
+book_trigrams = table("book_trigrams", column("trigram"), column("book_id"))
+
+FUZZY_MIN_SIMILARITY = 0.3
+FUZZY_CANDIDATES = 200
+
+MEMBER_FIELDS = ("name", "member_number", "phone", "email")
+MEMBER_WEIGHTS = (5.0, 10.0, 8.0, 3.0)
+
+CREATE_MEMBERS_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5("
+    "name, member_number, phone, email, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3 4')"
+)
+
+members_fts = table("members_fts", column("rowid"), *(column(f) for f in MEMBER_FIELDS))
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Turn free user input into an FTS5 query: every word must match as a prefix."""
+    words = tokens(query)
+    if not words:
+        return None
+    return " ".join(f'"{w}"*' for w in words)
+
+
+_INSERT_TRIGRAM = text("INSERT OR IGNORE INTO book_trigrams (trigram, book_id) VALUES (:trigram, :book_id)")
+
+
+def _trigram_rows(book_id: int, title: str, author: str) -> list:
+    grams = trigrams(title or "") | trigrams(author or "")
+    return [{"trigram": g, "book_id": book_id} for g in grams]
+
+
+def index_book(db, book):
+    """(Re)index one book. Call before the commit of the write that changed it."""
+    unindex_book(db, book.id)
+    if book.is_deleted:
+        return
+    db.execute(
+        text("INSERT INTO books_fts (rowid, title, author, publisher, genre, description) "
+             "VALUES (:id, :title, :author, :publisher, :genre, :description)"),
+        {"id": book.id, **{f: fold(getattr(book, f) or "") for f in BOOK_FIELDS}},
+    )
+    rows = _trigram_rows(book.id, book.title, book.author)
+    if rows:
+        db.execute(_INSERT_TRIGRAM, rows)
+
+
+def unindex_book(db, book_id: int):
+    db.execute(text("DELETE FROM books_fts WHERE rowid = :id"), {"id": book_id})
+    db.execute(text("DELETE FROM book_trigrams WHERE book_id = :id"), {"id": book_id})
+
+
+def rebuild_book_index(db) -> int:
+    """Drop and refill books_fts from the books table. Returns the number of indexed books."""
+    db.execute(text("DELETE FROM books_fts"))
+    rows = db.execute(text(
+        "SELECT id, title, author, publisher, genre, description FROM books WHERE is_deleted = 0"
+    )).all()
+    if rows:
+        db.execute(
+            text("INSERT INTO books_fts (rowid, title, author, publisher, genre, description) "
+                 "VALUES (:id, :title, :author, :publisher, :genre, :description)"),
+            [{"id": r[0], **{f: fold(v or "") for f, v in zip(BOOK_FIELDS, r[1:])}} for r in rows],
+        )
+    db.execute(text("INSERT INTO books_fts (books_fts) VALUES ('optimize')"))
+    return len(rows)
+
+
+def rebuild_trigram_index(db):
+    """Drop and refill book_trigrams from the books table."""
+    db.execute(text("DELETE FROM book_trigrams"))
+    rows = db.execute(text("SELECT id, title, author FROM books WHERE is_deleted = 0")).all()
+    grams = [g for book_id, title, author in rows for g in _trigram_rows(book_id, title, author)]
+    if grams:
+        db.execute(_INSERT_TRIGRAM, grams)
+
+
+def book_matches(query: str):
+    """Subquery (book_id, rank) of books matching `query`, best match = lowest rank.
+    Returns None when the input has no searchable words."""
+    expr = match_expression(query)
+    if expr is None:
+        return None
+    return (
+        select(
+            books_fts.c.rowid.label("book_id"),
+            func.bm25(literal_column("books_fts"), *BOOK_WEIGHTS).label("rank"),
+        )
+        .select_from(books_fts)
+        .where(literal_column("books_fts").op("MATCH")(expr))
+        .subquery("book_hits")
+    )
+
+
+def similarity(query_grams: set, field_grams: set) -> float:
+    """Mostly "how much of the query is in the field", with a Jaccard share
+    so that short, close fields beat long ones that merely contain it."""
+    if not query_grams or not field_grams:
+        return 0.0
+    common = len(query_grams & field_grams)
+    return 0.7 * common / len(query_grams) + 0.3 * common / len(query_grams | field_grams)
+
+
+def fuzzy_book_matches(db, query: str) -> dict:
+    """{book_id: similarity} of books resembling `query`, misspellings included.
+
+    Candidates come only from the trigram index (capped at FUZZY_CANDIDATES
+    books sharing the most trigrams); only those are scored in Python."""
+    grams = trigrams(query)
+    if not grams:
+        return {}
+    shared = func.count().label("shared")
+    candidates = db.execute(
+        select(book_trigrams.c.book_id, shared)
+        .where(book_trigrams.c.trigram.in_(grams))
+        .group_by(book_trigrams.c.book_id)
+        .having(shared >= max(1, int(len(grams) * FUZZY_MIN_SIMILARITY)))
+        .order_by(shared.desc())
+        .limit(FUZZY_CANDIDATES)
+    ).all()
+    if not candidates:
+        return {}
+
+    books = db.execute(
+        text("SELECT id, title, author FROM books WHERE is_deleted = 0 AND id IN :ids")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": [c[0] for c in candidates]},
+    ).all()
+    scores = {}
+    for book_id, title, author in books:
+        title_grams, author_grams = trigrams(title), trigrams(author)
+        score = max(
+            similarity(grams, title_grams),
+            similarity(grams, author_grams),
+            similarity(grams, title_grams | author_grams),
+        )
+        if score >= FUZZY_MIN_SIMILARITY:
+            scores[book_id] = score
+    return scores
+
+
+# --- Members ---
+
+def _member_values(member_id, first_name, last_name, member_number, phone, email) -> dict:
+    return {
+        "id": member_id,
+        "name": fold(f"{first_name or ''} {last_name or ''}"),
+        "member_number": (member_number or "").strip().lower(),
+        "phone": normalize_phone(phone),
+        "email": (email or "").strip().lower(),
+    }
+
+
+_INSERT_MEMBER = text(
+    "INSERT INTO members_fts (rowid, name, member_number, phone, email) "
+    "VALUES (:id, :name, :member_number, :phone, :email)"
+)
+
+
+def index_member(db, member):
+    """(Re)index one member. Call before the commit of the write that changed it."""
+    db.execute(text("DELETE FROM members_fts WHERE rowid = :id"), {"id": member.id})
+    if member.is_deleted:
+        return
+    db.execute(_INSERT_MEMBER, _member_values(
+        member.id, member.first_name, member.last_name,
+        member.member_number, member.phone, member.email,
+    ))
+
+
+def unindex_member(db, member_id: int):
+    db.execute(text("DELETE FROM members_fts WHERE rowid = :id"), {"id": member_id})
+
+
+def rebuild_member_index(db) -> int:
+    """Drop and refill members_fts from the members table. Returns the number of indexed members."""
+    db.execute(text("DELETE FROM members_fts"))
+    rows = db.execute(text(
+        "SELECT id, first_name, last_name, member_number, phone, email FROM members WHERE is_deleted = 0"
+    )).all()
+    if rows:
+        db.execute(_INSERT_MEMBER, [_member_values(*r) for r in rows])
+    db.execute(text("INSERT INTO members_fts (members_fts) VALUES ('optimize')"))
+    return len(rows)
+
+
+def member_match_expression(query: str) -> Optional[str]:
+    """Words match as prefixes anywhere; a query with 3+ digits also matches phone prefixes."""
+    parts = []
+    words = tokens(query)
+    if words:
+        parts.append("(" + " ".join(f'"{w}"*' for w in words) + ")")
+    digits = normalize_phone(query)
+    if len(digits) >= 3:
+        parts.append(f'phone : "{digits}"*')
+    return " OR ".join(parts) or None
+
+
+def member_matches(query: str):
+    """Subquery (member_id, exact, rank) of members matching `query`.
+    exact is 0 for an exact member-number hit, 1 for an exact phone hit, 2 otherwise;
+    order by (exact, rank). Returns None when the input has nothing searchable."""
+    expr = member_match_expression(query)
+    if expr is None:
+        return None
+    number = query.strip().lower()
+    digits = normalize_phone(query)
+    exact = case(
+        (members_fts.c.member_number == number, 0),
+        (and_(literal(digits) != "", members_fts.c.phone == digits), 1),
+        else_=2,
+    )
+    return (
+        select(
+            members_fts.c.rowid.label("member_id"),
+            exact.label("exact"),
+            func.bm25(literal_column("members_fts"), *MEMBER_WEIGHTS).label("rank"),
+        )
+        .select_from(members_fts)
+        .where(literal_column("members_fts").op("MATCH")(expr))
+        .subquery("member_hits")
+    )
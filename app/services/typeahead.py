@@ -0,0 +1,219 @@
+"""
+In-process typeahead index for the loan desk.
+
+Normalized (folded) titles, authors, member names and member numbers are
+kept in one sorted list and searched with bisect, so a suggestion costs a
+binary search plus a short scan — no SQL per keystroke. Every word of a
+phrase starts its own key ("ivo andric", "andric"), so typing any word
+finds the entry.
+
+The index is built at startup and updated by the book/member write
+handlers after they commit; bulk imports call rebuild(). Book and member
+writes made by other worker processes trigger a full rebuild, coalesced to
+at most one every TYPEAHEAD_REBUILD_INTERVAL seconds (CoalescedRebuild).
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import Counter
+
+from app.utils.text import tokens
+
+logger = logging.getLogger("typeahead")
+
+KINDS = ("title", "author", "member")
+MAX_WORDS_PER_PHRASE = 6
+# Minimum seconds between rebuilds for writes made by other worker processes
+TYPEAHEAD_REBUILD_INTERVAL = float(os.environ.get("TYPEAHEAD_REBUILD_INTERVAL", "5"))
+
+
+def _keys(text: str) -> list:
+    words = tokens(text)[:MAX_WORDS_PER_PHRASE]
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class TypeaheadIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._clear()
+
+    def _clear(self):
+        self._bulk = False       # while rebuilding: append now, sort once at the end
+        self._keys = []          # sorted (key, kind, ref) tuples
+        self._owned = {}         # (kind, ref) -> keys it owns
+        self._labels = {}        # (kind, ref) -> (label, detail)
+        self._author_refs = Counter()
+        self._book_authors = {}  # book id -> author ref
+
+    # --- building ---
+
+    def _add(self, kind: str, ref, keys: list, label: str, detail=None):
+        owned = self._owned.setdefault((kind, ref), [])
+        for key in keys:
+            entry = (key, kind, ref)
+            if entry not in owned:
+                if self._bulk:
+                    self._keys.append(entry)
+                else:
+                    insort(self._keys, entry)
+                owned.append(entry)
+        self._labels[(kind, ref)] = (label, detail)
+
+    def _remove(self, kind: str, ref):
+        for entry in self._owned.pop((kind, ref), []):
+            i = bisect_left(self._keys, entry)
+            if i < len(self._keys) and self._keys[i] == entry:
+                del self._keys[i]
+        self._labels.pop((kind, ref), None)
+
+    def _remove_book(self, book_id: int):
+        self._remove("title", book_id)
+        author = self._book_authors.pop(book_id, None)
+        if author is not None:
+            self._author_refs[author] -= 1
+            if self._author_refs[author] <= 0:
+                del self._author_refs[author]
+                self._remove("author", author)
+
+    def _put_book(self, book_id: int, title: str, author: str):
+        self._remove_book(book_id)
+        self._add("title", book_id, _keys(title), title, author)
+        author_keys = _keys(author)
+        if author_keys:
+            ref = author_keys[0]
+            self._book_authors[book_id] = ref
+            self._author_refs[ref] += 1
+            if self._author_refs[ref] == 1:
+                self._add("author", ref, author_keys, author)
+
+    def _put_member(self, member_id: int, first_name: str, last_name: str, member_number: str):
+        self._remove("member", member_id)
+        keys = _keys(f"{first_name} {last_name}") + _keys(f"{last_name} {first_name}")
+        number = (member_number or "").strip().lower()
+        if number:
+            keys.append(number)
+        self._add("member", member_id, keys, f"{first_name} {last_name}", member_number)
+
+    # --- public API ---
+
+    def rebuild(self, db):
+        from app.models.book import Book
+        from app.models.member import Member
+
+        books = db.query(Book.id, Book.title, Book.author).filter(Book.is_deleted == False).all()
+        members = db.query(
+            Member.id, Member.first_name, Member.last_name, Member.member_number
+        ).filter(Member.is_deleted == False).all()
+        # Build off to the side so suggestions keep working during a rebuild
+        fresh = TypeaheadIndex()
+        fresh._bulk = True
+        for book_id, title, author in books:
+            fresh._put_book(book_id, title, author)
+        for member_id, first_name, last_name, member_number in members:
+            fresh._put_member(member_id, first_name, last_name, member_number)
+        fresh._keys.sort()
+        with self._lock:
+            self._keys = fresh._keys
+            self._owned = fresh._owned
+            self._labels = fresh._labels
+            self._author_refs = fresh._author_refs
+            self._book_authors = fresh._book_authors
+        logger.info(f"Typeahead index built: {len(self._keys)} keys")
+
+    def update_book(self, book):
+        with self._lock:
+            if book.is_deleted:
+                self._remove_book(book.id)
+            else:
+                self._put_book(book.id, book.title, book.author)
+
+    def update_member(self, member):
+        with self._lock:
+            if member.is_deleted:
+                self._remove("member", member.id)
+            else:
+                self._put_member(member.id, member.first_name, member.last_name, member.member_number)
+
+    def suggest(self, query: str, kinds=KINDS, limit: int = 10) -> list:
+        prefix = " ".join(tokens(query))
+        if not prefix:
+            return []
+        result = []
+        seen = set()
+        with self._lock:
+            i = bisect_left(self._keys, (prefix,))
+            while i < len(self._keys) and len(result) < limit:
+                key, kind, ref = self._keys[i]
+                if not key.startswith(prefix):
+                    break
+                i += 1
+                if kind not in kinds or (kind, ref) in seen:
+                    continue
+                seen.add((kind, ref))
+                label, detail = self._labels[(kind, ref)]
+                result.append({
+                    "type": kind,
+                    "id": ref if kind != "author" else None,
+                    "label": label,
+                    "detail": detail,
+                })
+        return result
+
+    def stats(self) -> dict:
+        """Entry counts and an estimate of the memory held by the index."""
+        with self._lock:
+            size = sys.getsizeof(self._keys) + sys.getsizeof(self._owned) + sys.getsizeof(self._labels)
+            for entry in self._keys:
+                size += sys.getsizeof(entry) + sys.getsizeof(entry[0])
+            for owned in self._owned.values():
+                size += sys.getsizeof(owned)
+            for label, detail in self._labels.values():
+                size += sys.getsizeof(label) + sys.getsizeof(detail)
+            counts = Counter(kind for kind, _ in self._labels)
+            return {
+                "keys": len(self._keys),
+                "entries": dict(counts),
+                "memory_bytes": size,
+            }
+
+
+class CoalescedRebuild:
+    """Runs rebuild() for a burst of change notifications at most once per `interval` seconds.
+
+    request() schedules one run on a timer thread unless one is already
+    pending, so the caller (the data-version poll) never waits for a rebuild.
+    A request arriving while a rebuild runs schedules the next one, so the
+    last change is never missed.
+    """
+
+    def __init__(self, rebuild, interval: float = TYPEAHEAD_REBUILD_INTERVAL):
+        self._rebuild = rebuild
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._timer = None
+        self._last = float("-inf")  # monotonic start of the last run
+
+    def request(self, tables=None):
+        with self._lock:
+            if self._timer is not None:
+                return
+            delay = max(0.0, self._last + self.interval - time.monotonic())
+            self._timer = threading.Timer(delay, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+            self._last = time.monotonic()
+        try:
+            self._rebuild()
+        except Exception as e:
+            logger.error(f"Typeahead rebuild failed: {e}")
+
+
+index = TypeaheadIndex()
@@ -1,4 +1,7 @@
 import os
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -8,9 +11,10 @@ from jose import JWTError, jwt
 from passlib.hash import bcrypt
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import ReadSessionLocal
 from app.models.staff import Staff
 from app.models.user_permission import UserPermission
+from app.utils.cache import table_versions
 
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY")
 if not SECRET_KEY:
@@ -18,6 +22,11 @@ if not SECRET_KEY:
 
 ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
 EXPIRATION_MINUTES = int(os.environ.get("JWT_EXPIRATION_MINUTES", "30"))  # Match frontend session timeout
+# Seconds an authenticated token's staff row and permissions are reused without touching the database
+PRINCIPAL_CACHE_TTL = float(os.environ.get("PRINCIPAL_CACHE_TTL", "60"))
+# Put the module permissions into the token at login: no permission query at all, but a permission
+# change only reaches a session at its next login
+JWT_EMBED_PERMISSIONS = os.environ.get("JWT_EMBED_PERMISSIONS", "false").lower() == "true"
 
 security = HTTPBearer(auto_error=False)
 
@@ -41,20 +50,69 @@ def decode_token(token: str) -> dict:
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
 
-def get_current_user(
-    request: Request,
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-    db: Session = Depends(get_db),
-) -> Staff:
-    token = None
-    if credentials:
-        token = credentials.credentials
-    if not token:
-        token = request.cookies.get("access_token")
-    
-    if not token:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Niste prijavljeni")
+def permission_claims(db: Session, user: Staff) -> dict:
+    """Token claims carrying the user's module permissions (JWT_EMBED_PERMISSIONS)."""
+    if not JWT_EMBED_PERMISSIONS or user.is_admin:
+        return {}
+    perms = db.query(UserPermission).filter(UserPermission.user_id == user.id).all()
+    return {"perms": {p.module: ("r" if p.can_read else "") + ("w" if p.can_write else "") for p in perms}}
+
+
+class Principal:
+    """An authenticated staff member and their permissions: module -> (can_read, can_write)."""
+
+    __slots__ = ("user", "permissions")
+
+    def __init__(self, user: Staff, permissions: dict):
+        self.user = user
+        self.permissions = permissions
+
+
+# Cached principals are dropped when either table changes, in any worker process
+PRINCIPAL_TABLES = ("staff", "user_permissions")
+
+
+class PrincipalCache:
+    """token -> Principal for PRINCIPAL_CACHE_TTL seconds (never past the token's expiry)."""
+
+    def __init__(self, max_entries: int = 4096):
+        self._entries = OrderedDict()  # token -> (expires_at, table versions, principal)
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, versions, principal = entry
+        if expires_at <= time.monotonic() or versions != table_versions.get(*PRINCIPAL_TABLES):
+            self.invalidate_token(token)
+            return None
+        return principal
 
+    def put(self, token: str, principal: Principal, expires_at: float, versions: tuple):
+        with self._lock:
+            self._entries[token] = (expires_at, versions, principal)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_token(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in [t for t, (_, _, p) in self._entries.items() if p.user.id == user_id]:
+                del self._entries[token]
+
+
+principal_cache = PrincipalCache()
+
+
+def _load_principal(token: str) -> Principal:
+    versions = table_versions.get(*PRINCIPAL_TABLES)  # before loading: a concurrent change forces a reload
     try:
         payload = decode_token(token)
         user_id_str: str = payload.get("sub")
@@ -66,10 +124,49 @@ def get_current_user(
     except ValueError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Nevažeći token")
 
-    user = db.query(Staff).filter(Staff.id == user_id, Staff.is_active == True).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Korisnik nije aktivan")
-    return user
+    with ReadSessionLocal() as db:
+        user = db.query(Staff).filter(Staff.id == user_id, Staff.is_active == True).first()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Korisnik nije aktivan")
+        if user.is_admin:
+            permissions = {}
+        elif "perms" in payload:
+            permissions = {m: ("r" in p, "w" in p) for m, p in payload["perms"].items()}
+        else:
+            permissions = {
+                p.module: (p.can_read, p.can_write)
+                for p in db.query(UserPermission).filter(UserPermission.user_id == user.id)
+            }
+
+    principal = Principal(user, permissions)
+    ttl = min(PRINCIPAL_CACHE_TTL, payload.get("exp", 0) - time.time())
+    if ttl > 0:
+        principal_cache.put(token, principal, time.monotonic() + ttl, versions)
+    return principal
+
+
+def resolve_principal(token: str) -> Principal:
+    """The principal for a token, from the cache when possible. Raises 401 for bad tokens."""
+    return principal_cache.get(token) or _load_principal(token)
+
+
+def get_principal(
+    request: Request,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+) -> Principal:
+    token = None
+    if credentials:
+        token = credentials.credentials
+    if not token:
+        token = request.cookies.get("access_token")
+
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Niste prijavljeni")
+    return resolve_principal(token)
+
+
+def get_current_user(principal: Principal = Depends(get_principal)) -> Staff:
+    return principal.user
 
 
 def require_admin(current_user: Staff = Depends(get_current_user)) -> Staff:
@@ -79,18 +176,17 @@ def require_admin(current_user: Staff = Depends(get_current_user)) -> Staff:
 
 
 def check_permission(module: str, write: bool = False):
-    def _checker(current_user: Staff = Depends(get_current_user), db: Session = Depends(get_db)):
+    def _checker(principal: Principal = Depends(get_principal)):
+        current_user = principal.user
         if current_user.is_admin:
             return current_user
-        perm = db.query(UserPermission).filter(
-            UserPermission.user_id == current_user.id,
-            UserPermission.module == module,
-        ).first()
+        perm = principal.permissions.get(module)
         if not perm:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Nemate pristup")
-        if write and not perm.can_write:
+        can_read, can_write = perm
+        if write and not can_write:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Nemate dozvolu za izmene")
-        if not perm.can_read:
+        if not can_read:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Nemate pristup")
         return current_user
     return _checker
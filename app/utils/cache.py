@@ -0,0 +1,248 @@
+"""
+In-process caches invalidated by writes.
+
+Every committed flush bumps a version number for each table it touched
+(tracked through Session events, so every write path is covered without
+extra calls). A cached value remembers the versions of the tables it was
+computed from and is recomputed once any of them moves on.
+Raw SQL writes that bypass the ORM should call mark_changed().
+
+The same commit also bumps the table's row in data_versions, inside the
+transaction. Each process polls that table (start_version_sync) and bumps
+its local versions for changes made by other processes — the other uvicorn
+workers in multi-worker mode, or manage.py.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("cache")
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+TOTAL_COUNT_APPROXIMATE_HEADER = "X-Total-Count-Approximate"
+
+# Broad (unfiltered) counts at or above this size may be served from a stale
+# cache entry, flagged as approximate, for up to COUNT_ESTIMATE_MAX_AGE seconds.
+COUNT_ESTIMATE_THRESHOLD = int(os.environ.get("COUNT_ESTIMATE_THRESHOLD", "50000"))
+COUNT_ESTIMATE_MAX_AGE = float(os.environ.get("COUNT_ESTIMATE_MAX_AGE", "300"))
+# Seconds between polls of data_versions for changes made by other processes
+DATA_VERSION_POLL = float(os.environ.get("DATA_VERSION_POLL", "1"))
+
+
+class TableVersions:
+    def __init__(self):
+        self._versions = {}
+        self._seen = {}       # table -> last data_versions value this process has accounted for
+        self._listeners = []  # (tables, callback) run when another process changes one of tables
+        self._lock = threading.Lock()
+
+    def get(self, *tables) -> tuple:
+        return tuple(self._versions.get(t, 0) for t in tables)
+
+    def bump(self, tables):
+        with self._lock:
+            for t in tables:
+                self._versions[t] = self._versions.get(t, 0) + 1
+
+    def record_own(self, published: dict):
+        """data_versions values set by this process's commit; a gap means another process wrote in between."""
+        with self._lock:
+            for t, version in published.items():
+                if self._seen.get(t, 0) == version - 1:
+                    self._seen[t] = version
+
+    def on_foreign_change(self, tables, callback):
+        """Call callback(changed_tables) when another process commits to any of `tables`."""
+        self._listeners.append((frozenset(tables), callback))
+
+    def sync(self, rows, initial: bool = False) -> set:
+        """Apply data_versions rows; returns the tables changed by other processes."""
+        with self._lock:
+            changed = {t for t, version in rows if self._seen.get(t, 0) != version}
+            for t, version in rows:
+                self._seen[t] = version
+            if initial:
+                return set()
+            for t in changed:
+                self._versions[t] = self._versions.get(t, 0) + 1
+        for tables, callback in self._listeners:
+            if tables & changed:
+                try:
+                    callback(tables & changed)
+                except Exception as e:
+                    logger.error(f"Cache invalidation listener failed: {e}")
+        return changed
+
+
+table_versions = TableVersions()
+
+
+def mark_changed(session: Session, *tables: str):
+    """Record tables written with raw SQL; versions move when the session commits."""
+    session.info.setdefault("changed_tables", set()).update(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changed_tables(session, flush_context):
+    changed = session.info.setdefault("changed_tables", set())
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__tablename__", None)
+        if table:
+            changed.add(table)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _collect_bulk_changes(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) and orm_execute_state.bind_mapper:
+        mark_changed(orm_execute_state.session, orm_execute_state.bind_mapper.local_table.name)
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_versions(session):
+    session.flush()
+    changed = session.info.get("changed_tables")
+    if not changed:
+        return
+    session.info["published_versions"] = {
+        table: session.execute(
+            text("INSERT INTO data_versions (table_name, version) VALUES (:t, 1) "
+                 "ON CONFLICT(table_name) DO UPDATE SET version = version + 1 RETURNING version"),
+            {"t": table},
+        ).scalar()
+        for table in sorted(changed)
+    }
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_versions(session):
+    changed = session.info.pop("changed_tables", None)
+    if changed:
+        table_versions.bump(changed)
+    published = session.info.pop("published_versions", None)
+    if published:
+        table_versions.record_own(published)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop("changed_tables", None)
+    session.info.pop("published_versions", None)
+
+
+def _read_data_versions(engine) -> list:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT table_name, version FROM data_versions")).all()
+
+
+def start_version_sync(engine):
+    """Load the current data_versions, then poll it every DATA_VERSION_POLL seconds in a daemon thread."""
+    table_versions.sync(_read_data_versions(engine), initial=True)
+
+    def poll():
+        while True:
+            time.sleep(DATA_VERSION_POLL)
+            try:
+                table_versions.sync(_read_data_versions(engine))
+            except Exception as e:
+                logger.error(f"Data version poll failed: {e}")
+
+    threading.Thread(target=poll, name="data-version-sync", daemon=True).start()
+
+
+class CountCache:
+    """Cache of query.count() results keyed by endpoint + filter parameters."""
+
+    def __init__(self, max_entries: int = 2048):
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def count(self, query, tables: tuple, key: tuple, broad: bool = False) -> tuple:
+        """Returns (total, approximate)."""
+        versions = table_versions.get(*tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            cached_versions, total, computed_at = entry
+            if cached_versions == versions:
+                return total, False
+            if (broad and total >= COUNT_ESTIMATE_THRESHOLD
+                    and time.monotonic() - computed_at < COUNT_ESTIMATE_MAX_AGE):
+                return total, True
+
+        total = query.order_by(None).count()
+        with self._lock:
+            self._entries[key] = (versions, total, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return total, False
+
+
+count_cache = CountCache()
+
+
+def set_total_count(response: Response, query, tables: tuple, key: tuple, broad: bool = False) -> int:
+    """Count `query` through the cache and expose the result in X-Total-Count."""
+    total, approximate = count_cache.count(query, tables, key, broad=broad)
+    response.headers[TOTAL_COUNT_HEADER] = str(total)
+    if approximate:
+        response.headers[TOTAL_COUNT_APPROXIMATE_HEADER] = "true"
+    return total
+
+
+def _json_body(payload) -> bytes:
+    """The payload rendered exactly as JSONResponse would."""
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def _etag_response(request: Request, body: bytes, etag: str, cache_control: str) -> Response:
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def weak_etag(body: bytes) -> str:
+    return 'W/"%s"' % hashlib.sha1(body).hexdigest()[:16]
+
+
+def etag_response(request: Request, payload, cache_control: str = "private, no-cache") -> Response:
+    """JSON response with a weak ETag of its body; 304 when the client already has it."""
+    body = _json_body(payload)
+    return _etag_response(request, body, weak_etag(body), cache_control)
+
+
+class CachedJSON:
+    """A JSON response body kept until one of `tables` changes, served with a weak ETag.
+
+    The ETag is a hash of the body, so it is the same in every worker process
+    and clients revalidate with a 304 until the data really changes.
+    """
+
+    def __init__(self, *tables: str, cache_control: str = "private, no-cache"):
+        self.tables = tables
+        self.cache_control = cache_control
+        self._entry = None  # (table versions, body, etag), swapped as one
+
+    def response(self, request: Request, compute) -> Response:
+        """compute() builds the payload; it only runs after a change."""
+        versions = table_versions.get(*self.tables)
+        entry = self._entry
+        if entry is None or entry[0] != versions:
+            body = _json_body(compute())
+            entry = (versions, body, weak_etag(body))
+            self._entry = entry
+        return _etag_response(request, entry[1], entry[2], self.cache_control)
@@ -6,6 +6,8 @@ import json
 import os
 from pathlib import Path
 
+from app.utils.static_assets import build_asset
+
 CURRENCIES = {
     "EUR": "€",
     "GBP": "£",
@@ -60,6 +62,19 @@ def load_translations():
 TRANSLATIONS = load_translations()
 
 
+def _build_bundles() -> dict:
+    """One JSON bundle per language, served by /settings/public/translations/{language}?v=<digest>."""
+    return {
+        language: build_asset(
+            json.dumps(strings, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), compressible=True
+        )
+        for language, strings in TRANSLATIONS.items()
+    }
+
+
+TRANSLATION_BUNDLES = _build_bundles()
+
+
 def get_translation(language: str, key: str) -> str:
     """Get translated string by language and key"""
     if language not in TRANSLATIONS:
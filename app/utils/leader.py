@@ -0,0 +1,80 @@
+"""
+Scheduler leader lock for multi-worker mode.
+
+Every worker process runs the scheduler, but jobs that must happen once
+(notifications, outbox dispatch, backups) only run in the process holding
+the lease in scheduler_leader. The holder renews it every
+LEADER_HEARTBEAT seconds; a lease not renewed for LEADER_TIMEOUT seconds
+is taken over by the next worker that heartbeats, so a crashed or stopped
+leader is replaced within about LEADER_TIMEOUT + LEADER_HEARTBEAT.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from sqlalchemy import text
+
+from app.database import engine
+
+logger = logging.getLogger("leader")
+
+LEADER_HEARTBEAT = float(os.environ.get("LEADER_HEARTBEAT", "10"))
+LEADER_TIMEOUT = float(os.environ.get("LEADER_TIMEOUT", "30"))
+LOCK_NAME = "scheduler"
+
+holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_lease_until = 0.0  # monotonic deadline of the lease this process last renewed
+_lock = threading.Lock()
+
+
+def heartbeat() -> bool:
+    """Take or renew the lease. Returns True while this process is the leader."""
+    global _lease_until
+    now = time.time()
+    started = time.monotonic()
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO scheduler_leader (name, holder, heartbeat_at) VALUES (:name, :holder, :now) "
+                "ON CONFLICT(name) DO UPDATE SET holder = excluded.holder, heartbeat_at = excluded.heartbeat_at "
+                "WHERE scheduler_leader.holder = excluded.holder OR scheduler_leader.heartbeat_at < :stale"
+            ),
+            {"name": LOCK_NAME, "holder": holder_id, "now": now, "stale": now - LEADER_TIMEOUT},
+        )
+        holder = conn.execute(
+            text("SELECT holder FROM scheduler_leader WHERE name = :name"), {"name": LOCK_NAME}
+        ).scalar()
+
+    with _lock:
+        was_leader = time.monotonic() < _lease_until
+        if holder == holder_id:
+            # counted from before the write, so the lease never outlives what others see in the table
+            _lease_until = started + LEADER_TIMEOUT
+        else:
+            _lease_until = 0.0
+    leader = holder == holder_id
+    if leader != was_leader:
+        logger.info(f"{'Became' if leader else 'No longer'} scheduler leader ({holder_id})")
+    return leader
+
+
+def is_leader() -> bool:
+    with _lock:
+        return time.monotonic() < _lease_until
+
+
+def release():
+    """Give the lease up on shutdown so another worker takes over at its next heartbeat."""
+    global _lease_until
+    with _lock:
+        _lease_until = 0.0
+    with engine.begin() as conn:
+        conn.execute(
+            text("DELETE FROM scheduler_leader WHERE name = :name AND holder = :holder"),
+            {"name": LOCK_NAME, "holder": holder_id},
+        )
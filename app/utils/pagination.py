@@ -0,0 +1,89 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+A cursor is an opaque, URL-safe encoding of the sort key of the last row
+on a page, e.g. (title, id). The next page is fetched with
+WHERE (title, id) > (:title, :id), so page 5000 costs the same as page 1.
+page/per_page (OFFSET) keep working; every page also returns the cursor
+of its last row in the X-Next-Cursor header.
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_, literal
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values) -> str:
+    raw = json.dumps(list(values), default=str, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, keys: list) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Nevažeći kursor")
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise HTTPException(status_code=400, detail="Nevažeći kursor")
+    return [_load(key, value) for key, value in zip(keys, values)]
+
+
+def _load(key, value):
+    """Turn a JSON cursor value back into the Python type of its column."""
+    if value is None:
+        return None
+    try:
+        python_type = key.type.python_type
+    except NotImplementedError:
+        return value
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Nevažeći kursor")
+    return value
+
+
+def paginate(query, keys: list, *, cursor: Optional[str] = None, page: int = 1,
+             per_page: Optional[int] = 50, descending: bool = False,
+             response: Optional[Response] = None) -> list:
+    """Order `query` by `keys` and return one page of it.
+
+    keys are sort expressions; the last one must be unique (normally the id).
+    With a cursor the page starts right after the cursor row, otherwise at
+    OFFSET (page - 1) * per_page. per_page=None returns everything.
+    The next-page cursor is set on `response` when there are more rows.
+    Returns the query's entities (or rows, for multi-entity queries).
+    """
+    labeled = [key.label(f"_cursor_{i}") for i, key in enumerate(keys)]
+    query = query.add_columns(*labeled).order_by(*[k.desc() if descending else k for k in keys])
+
+    if cursor:
+        values = decode_cursor(cursor, keys)
+        bound = tuple_(*[literal(v, type_=k.type) for k, v in zip(keys, values)])
+        query = query.filter(tuple_(*keys) < bound if descending else tuple_(*keys) > bound)
+    elif per_page is not None and page > 1:
+        query = query.offset((page - 1) * per_page)
+
+    if per_page is None:
+        rows = query.all()
+        more = False
+    else:
+        rows = query.limit(per_page + 1).all()
+        more = len(rows) > per_page
+        rows = rows[:per_page]
+
+    if response is not None and more:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(rows[-1][-len(keys):])
+
+    width = len(rows[0]) - len(keys) if rows else 1
+    return [row[0] if width == 1 else row[:width] for row in rows]
@@ -1,25 +1,65 @@
+import functools
 import logging
 from apscheduler.schedulers.background import BackgroundScheduler
-from app.database import SessionLocal
+from app.database import ReadSessionLocal
 from app.services.notifications import run_all_notifications
+from app.services import outbox
 from app.services.backup import auto_backup
+from app.services import counters
+from app.utils import leader
 
 logger = logging.getLogger("scheduler")
 
 scheduler = BackgroundScheduler()
 
 
+def _leader_only(job):
+    """Every worker process schedules the job; only the leader runs it."""
+    @functools.wraps(job)
+    def run():
+        if leader.is_leader():
+            job()
+    return run
+
+
+def _heartbeat():
+    try:
+        leader.heartbeat()
+    except Exception as e:
+        logger.error(f"Leader heartbeat error: {e}")
+
+
+@_leader_only
 def _run_notifications():
-    db = SessionLocal()
+    db = ReadSessionLocal()
     try:
-        run_all_notifications(db)
-        logger.info("Notification check completed")
+        report = run_all_notifications(db)
+        queued = sum(stats["queued"] for stats in report)
+        logger.info(f"Notification check completed: {queued} queued")
+        outbox.prune_sent()
     except Exception as e:
         logger.error(f"Notification error: {e}")
     finally:
         db.close()
 
 
+@_leader_only
+def _dispatch_outbox():
+    try:
+        outbox.dispatch_due()
+    except Exception as e:
+        logger.error(f"Outbox dispatch error: {e}")
+
+
+@_leader_only
+def _reconcile_counters():
+    try:
+        counters.reconcile()
+    except Exception as e:
+        logger.error(f"Counter reconciliation error: {e}")
+
+
+@_leader_only
 def _run_backup():
     try:
         auto_backup()
@@ -29,18 +69,38 @@ def _run_backup():
 
 
 def start_scheduler():
+    # Take the lease before the first job can fire; renew it for as long as we run
+    _heartbeat()
+    scheduler.add_job(_heartbeat, "interval", seconds=leader.LEADER_HEARTBEAT, id="leader_heartbeat",
+                      max_instances=1, coalesce=True)
+
     # Run notifications every day at 7:00 and 20:00
     scheduler.add_job(_run_notifications, "cron", hour=7, minute=0, id="notifications_morning")
     scheduler.add_job(_run_notifications, "cron", hour=20, minute=0, id="notifications_evening")
 
+    # Send queued notifications; one dispatcher at a time
+    scheduler.add_job(_dispatch_outbox, "interval", seconds=outbox.OUTBOX_DISPATCH_INTERVAL,
+                      id="outbox_dispatch", max_instances=1, coalesce=True)
+
+    # Recompute the dashboard counters from scratch and report drift
+    scheduler.add_job(_reconcile_counters, "interval", seconds=counters.DASHBOARD_RECONCILE_INTERVAL,
+                      id="counters_reconcile", max_instances=1, coalesce=True)
+
     # Run backup every day at midnight
     scheduler.add_job(_run_backup, "cron", hour=0, minute=0, id="auto_backup")
 
     scheduler.start()
-    logger.info("Scheduler started: notifications at 07:00/20:00, backup at 00:00")
+    logger.info(
+        f"Scheduler started: notifications at 07:00/20:00, outbox every "
+        f"{outbox.OUTBOX_DISPATCH_INTERVAL}s, backup at 00:00"
+    )
 
 
 def stop_scheduler():
     if scheduler.running:
         scheduler.shutdown(wait=False)
         logger.info("Scheduler stopped")
+    try:
+        leader.release()
+    except Exception as e:
+        logger.error(f"Leader release error: {e}")
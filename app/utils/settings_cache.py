@@ -0,0 +1,51 @@
+"""
+In-process cache of the settings table.
+
+The whole table (a few dozen rows) is loaded once and served from memory.
+It is reloaded on the next read after any commit that touches `settings`:
+in this process through the table versions bumped on commit, in other
+worker processes through the data_versions poll (see app.utils.cache). So
+update_setting, upload_logo, the startup seed and any future writer
+invalidate it without extra calls.
+"""
+
+from app.utils.cache import table_versions
+
+
+class SettingsCache:
+    def __init__(self):
+        self._entry = None  # (table version, values), swapped as one
+
+    def _load(self) -> dict:
+        from app.database import ReadSessionLocal
+        from app.models.setting import Setting
+
+        # version first: a write landing during the load only causes one more reload
+        version = table_versions.get("settings")
+        with ReadSessionLocal() as db:
+            values = dict(db.query(Setting.key, Setting.value).all())
+        self._entry = (version, values)
+        return values
+
+    def all(self) -> dict:
+        """Every setting as key -> raw string value. Do not modify the result."""
+        entry = self._entry
+        if entry is None or entry[0] != table_versions.get("settings"):
+            return self._load()
+        return entry[1]
+
+    def get(self, key: str, default: str = None) -> str:
+        return self.all().get(key, default)
+
+    def get_int(self, key: str, default: int) -> int:
+        try:
+            return int(self.all()[key])
+        except (KeyError, TypeError, ValueError):
+            return default
+
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        value = self.all().get(key)
+        return default if value is None else value.lower() == "true"
+
+
+settings_cache = SettingsCache()
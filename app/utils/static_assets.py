@@ -0,0 +1,115 @@
+"""
+Fingerprinted static assets.
+
+Templates link assets through asset_url("app.js"), which renders as
+/static/app.js?v=<content hash>. A request carrying the current hash is
+served with a one-year immutable Cache-Control, so a browser loads each
+version of a file once; any other request gets no-cache and revalidates
+against the weak ETag (the same content hash). Text assets are gzipped once
+per version and sent compressed to clients that accept it.
+
+A file is re-hashed when its size or modification time changes (a deploy,
+an uploaded logo), checked with one stat() per lookup. Generated content,
+such as the translation bundles, goes through build_asset() and
+asset_response() the same way.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import NamedTuple, Optional
+
+import anyio
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "frontend", "static")
+STATIC_URL = "/static/"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+COMPRESSIBLE = {".js", ".css", ".json", ".svg", ".html", ".txt"}
+
+
+class Asset(NamedTuple):
+    stamp: tuple     # (size, mtime_ns) the digest was computed for
+    digest: str
+    etag: str
+    content: bytes
+    gzipped: Optional[bytes]
+
+
+def build_asset(content: bytes, compressible: bool, stamp: tuple = ()) -> Asset:
+    digest = hashlib.sha1(content).hexdigest()[:12]
+    gzipped = gzip.compress(content, compresslevel=9, mtime=0) if compressible else None
+    if gzipped is not None and len(gzipped) >= len(content):
+        gzipped = None
+    return Asset(stamp, digest, f'W/"{digest}"', content, gzipped)
+
+
+def _cache_headers(asset: Asset, requested_version: Optional[str]) -> dict:
+    headers = {"ETag": asset.etag, "Cache-Control": IMMUTABLE if requested_version == asset.digest else "no-cache"}
+    if asset.gzipped is not None:
+        headers["Vary"] = "Accept-Encoding"
+    return headers
+
+
+def asset_response(request_headers: Headers, requested_version: Optional[str], asset: Asset,
+                   media_type: str) -> Response:
+    """The asset for a GET: 304 on a matching ETag, gzipped when accepted, immutable when the version is current."""
+    headers = _cache_headers(asset, requested_version)
+    if asset.etag in request_headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if asset.gzipped is not None and "gzip" in request_headers.get("accept-encoding", ""):
+        return Response(asset.gzipped, media_type=media_type, headers={**headers, "Content-Encoding": "gzip"})
+    return Response(asset.content, media_type=media_type, headers=headers)
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles with content-hash URLs, immutable caching and precompressed variants."""
+
+    def __init__(self, directory: str):
+        super().__init__(directory=directory, check_dir=False)
+        self._assets = {}  # path -> Asset
+
+    def asset(self, path: str) -> Optional[Asset]:
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result is None or not os.path.isfile(full_path):
+            return None
+        stamp = (stat_result.st_size, stat_result.st_mtime_ns)
+        asset = self._assets.get(path)
+        if asset is None or asset.stamp != stamp:
+            with open(full_path, "rb") as f:
+                content = f.read()
+            asset = build_asset(content, os.path.splitext(path)[1].lower() in COMPRESSIBLE, stamp)
+            self._assets[path] = asset
+        return asset
+
+    def url(self, path: str) -> str:
+        """Versioned URL of a file under the static directory (plain URL if it does not exist)."""
+        path = path.lstrip("/")
+        asset = self.asset(path)
+        return f"{STATIC_URL}{path}?v={asset.digest}" if asset else f"{STATIC_URL}{path}"
+
+    def url_for(self, static_path: str) -> str:
+        """Versioned form of a stored "/static/..." path, e.g. the library logo setting."""
+        if static_path and static_path.startswith(STATIC_URL):
+            return self.url(static_path[len(STATIC_URL):])
+        return static_path
+
+    async def get_response(self, path: str, scope) -> Response:
+        asset = await anyio.to_thread.run_sync(self.asset, path) if scope["method"] in ("GET", "HEAD") else None
+        if asset is None:
+            return await super().get_response(path, scope)
+
+        requested_version = QueryParams(scope["query_string"]).get("v")
+        if scope["method"] == "GET":
+            media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+            return asset_response(Headers(scope=scope), requested_version, asset, media_type)
+        response = await super().get_response(path, scope)  # HEAD
+        response.headers.update(_cache_headers(asset, requested_version))
+        return response
+
+
+static_files = AssetFiles(directory=STATIC_DIR)
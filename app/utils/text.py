@@ -0,0 +1,61 @@
+"""
+Text normalization for search — Serbian diacritic folding and Cyrillic → Latin transliteration.
+"""
+
+import re
+import unicodedata
+
+_TRANSLIT = str.maketrans({
+    # Serbian Cyrillic
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "ђ": "dj", "е": "e", "ж": "z",
+    "з": "z", "и": "i", "ј": "j", "к": "k", "л": "l", "љ": "lj", "м": "m", "н": "n",
+    "њ": "nj", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "ћ": "c", "у": "u",
+    "ф": "f", "х": "h", "ц": "c", "ч": "c", "џ": "dz", "ш": "s",
+    # Other Cyrillic letters common in catalog data (Russian, Macedonian)
+    "й": "j", "ё": "e", "ы": "y", "э": "e", "ю": "ju", "я": "ja", "щ": "sc",
+    "ъ": "", "ь": "", "ѓ": "dj", "ќ": "c", "ѕ": "dz",
+    # Latin letters without a Unicode decomposition
+    "đ": "dj", "ł": "l", "ø": "o", "ß": "ss",
+})
+
+_WORD = re.compile(r"\w+")
+_NON_DIGIT = re.compile(r"\D")
+
+
+def fold(value: str) -> str:
+    """Lowercase, transliterate Cyrillic to Latin and strip diacritics.
+
+    "Андрић" → "andric", "Đorđe Balašević" → "djordje balasevic"
+    """
+    if not value:
+        return ""
+    value = value.lower().translate(_TRANSLIT)
+    value = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in value if not unicodedata.combining(ch))
+
+
+def tokens(value: str) -> list:
+    """Folded word tokens of a string."""
+    return _WORD.findall(fold(value))
+
+
+def trigrams(value: str) -> set:
+    """Trigrams of every folded word, padded like pg_trgm ("  a", " an", "and", ..., "ic ")."""
+    result = set()
+    for word in tokens(value):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def normalize_phone(value: str) -> str:
+    """Digits only, with the +381 / 00381 country prefix turned into a local 0.
+
+    "+381 60 123-4567" → "0601234567"
+    """
+    digits = _NON_DIGIT.sub("", value or "")
+    for prefix in ("00381", "381"):
+        # local numbers always start with 0, so a leading 381 is the country code
+        if digits.startswith(prefix) and len(digits) > len(prefix):
+            return "0" + digits[len(prefix):]
+    return digits
@@ -0,0 +1,85 @@
+"""
+Benchmark slanja notifikacija: nova SMTP konekcija po poruci (staro ponašanje)
+naspram Mailer-a (trajne sesije, paralelni radnici, ograničenje brzine).
+
+Koristi lokalni SMTP stand-in (benchmarks/smtp_standin.py), pa ne šalje ništa
+napolje. --rtt simulira kašnjenje mreže do provajdera.
+
+Pokretanje (iz korena projekta):
+    python benchmarks/notification_send.py [--messages 2000] [--rtt 0.02] [--workers 4] [--rate 0]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from smtp_standin import StandinSMTPServer  # noqa: E402
+from app.services.mailer import Mailer, SmtpTransport  # noqa: E402
+
+
+def _messages(count: int) -> list:
+    return [
+        (f"clan{i}@example.com", f"Podsetnik {i}", "Poštovani/a,\n\nknjiga kasni.\n\nBiblioteka")
+        for i in range(count)
+    ]
+
+
+def per_message_connection(config: dict, messages: list) -> int:
+    failed = 0
+    for to_email, subject, body in messages:
+        transport = SmtpTransport(config)
+        try:
+            transport.send(to_email, subject, body)
+        except Exception:
+            failed += 1
+        finally:
+            transport.close()
+    return failed
+
+
+def pooled(config: dict, messages: list, workers: int, rate: float) -> int:
+    with Mailer(config, workers=workers, rate=rate) as mailer:
+        results = mailer.send_many(messages)
+    return sum(1 for ok, _ in results if not ok)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--rtt", type=float, default=0.02, help="simulirani RTT u sekundama")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=0, help="poruka u sekundi, 0 = bez ograničenja")
+    parser.add_argument("--baseline-messages", type=int, default=200,
+                        help="staro ponašanje se meri na manjem uzorku i preračunava")
+    args = parser.parse_args()
+
+    server = StandinSMTPServer(rtt=args.rtt).start()
+    config = {
+        "host": server.host, "port": server.port, "user": "biblioteka", "password": "x",
+        "sender_name": "Biblioteka", "enabled": True, "starttls": False,
+    }
+    try:
+        sample = min(args.baseline_messages, args.messages)
+        started = time.perf_counter()
+        failed = per_message_connection(config, _messages(sample))
+        per_message = (time.perf_counter() - started) / sample
+        print(f"konekcija po poruci: {per_message * 1000:.1f} ms/poruci, "
+              f"procena za {args.messages}: {per_message * args.messages:.1f} s (neuspešno: {failed})")
+
+        connections = server.connections
+        started = time.perf_counter()
+        failed = pooled(config, _messages(args.messages), args.workers, args.rate)
+        elapsed = time.perf_counter() - started
+        print(f"Mailer ({args.workers} radnika): {args.messages} poruka za {elapsed:.1f} s, "
+              f"{server.connections - connections} konekcija (neuspešno: {failed})")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
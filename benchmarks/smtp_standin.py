@@ -0,0 +1,118 @@
+"""
+Minimal in-process SMTP server for benchmarks and manual testing of the
+notification transport — accepts every message, stores nothing.
+
+    server = StandinSMTPServer(rtt=0.02).start()
+    config = {..., "host": server.host, "port": server.port, "starttls": False}
+    ...
+    server.stop()
+
+rtt simulates network round-trip time: every reply is delayed by it, so
+connection setup (greeting, EHLO, AUTH) costs as much as it would against a
+remote provider.
+
+For tests: connections, logins and messages are counted; drop_connections()
+cuts every open session from the server side, and with reject = True new
+connections are refused with a 421 greeting.
+"""
+
+import socket
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str):
+        if self.server.rtt:
+            time.sleep(self.server.rtt)
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        standin = self.server
+        with standin.lock:
+            standin.connections += 1
+            if standin.reject:
+                self._reply("421 standin unavailable")
+                return
+            standin.sockets.add(self.connection)
+        try:
+            self._serve()
+        finally:
+            with standin.lock:
+                standin.sockets.discard(self.connection)
+
+    def _serve(self):
+        standin = self.server
+        self._reply("220 standin ESMTP")
+        while True:
+            try:
+                line = self.rfile.readline()
+            except OSError:  # dropped by drop_connections()
+                return
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-standin\r\n250-AUTH PLAIN LOGIN\r\n")
+                self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 standin")
+            elif verb == "AUTH":
+                with standin.lock:
+                    standin.logins += 1
+                self._reply("235 2.7.0 Authentication successful")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with standin.lock:
+                    standin.messages += 1
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:  # MAIL, RCPT, RSET, NOOP
+                self._reply("250 OK")
+
+
+class StandinSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, rtt: float = 0.0):
+        super().__init__((host, port), _Handler)
+        self.rtt = rtt
+        self.lock = threading.Lock()
+        self.reject = False
+        self.sockets = set()
+        self.connections = 0
+        self.logins = 0
+        self.messages = 0
+
+    @property
+    def host(self) -> str:
+        return self.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "StandinSMTPServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def drop_connections(self):
+        """Close every open client session, as a server restart or idle timeout would."""
+        with self.lock:
+            sockets, self.sockets = self.sockets, set()
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,124 @@
+"""
+Benchmark SQLite PRAGMA profiles (SQLITE_PROFILE) on the circulation hot paths.
+
+Za svaki profil pravi praznu bazu, puni je test podacima i meri:
+  - loan    — POST /loans
+  - return  — POST /loans/{id}/return
+  - list    — GET /books (prva strana i pretraga)
+
+Pokretanje (iz korena projekta):
+    python benchmarks/sqlite_profiles.py [--books 2000] [--loans 300] [--profiles safe,balanced]
+"""
+
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _percentiles(samples: list) -> dict:
+    samples = sorted(samples)
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0}
+    return {
+        "p50": samples[len(samples) // 2] * 1000,
+        "p95": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+    }
+
+
+def run_profile(books: int, loans: int) -> dict:
+    """Runs inside a child process; SQLITE_PROFILE/DATABASE_PATH are already set."""
+    sys.path.insert(0, ROOT)
+    logging.disable(logging.CRITICAL)
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.database import SessionLocal
+    from app.models.book import Book
+    from app.models.book_copy import BookCopy
+    from app.models.member import Member
+
+    with TestClient(app) as client:
+        db = SessionLocal()
+        try:
+            for i in range(books):
+                book = Book(title=f"Naslov {i:06d}", author=f"Autor {i % 500}", genre="roman", total_copies=1)
+                db.add(book)
+                db.flush()
+                db.add(BookCopy(library_number=f"INV-{i:06d}", book_id=book.id, status="available"))
+            for i in range(loans):
+                db.add(Member(member_number=f"B-{i:05d}", first_name="Ime", last_name=f"Prezime {i}"))
+            db.commit()
+            copy_ids = [c.id for c in db.query(BookCopy.id).limit(loans).all()]
+            member_ids = [m.id for m in db.query(Member.id).limit(loans).all()]
+        finally:
+            db.close()
+
+        token = client.post("/auth/login", json={"username": "admin", "password": "admin"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        loan_times, return_times, list_times = [], [], []
+        loan_ids = []
+        for copy_id, member_id in zip(copy_ids, member_ids):
+            start = time.perf_counter()
+            res = client.post("/loans", json={"copy_id": copy_id, "member_id": member_id}, headers=headers)
+            loan_times.append(time.perf_counter() - start)
+            loan_ids.append(res.json()["id"])
+
+        for loan_id in loan_ids:
+            start = time.perf_counter()
+            client.post(f"/loans/{loan_id}/return", headers=headers)
+            return_times.append(time.perf_counter() - start)
+
+        for i in range(loans):
+            params = {"page": i % 20 + 1} if i % 2 else {"q": f"Autor {i % 500}"}
+            start = time.perf_counter()
+            client.get("/books", params=params, headers=headers)
+            list_times.append(time.perf_counter() - start)
+
+    return {
+        "loan": _percentiles(loan_times),
+        "return": _percentiles(return_times),
+        "list_books": _percentiles(list_times),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite PRAGMA profile benchmark")
+    parser.add_argument("--books", type=int, default=2000)
+    parser.add_argument("--loans", type=int, default=300)
+    parser.add_argument("--profiles", default="safe,balanced,throughput")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_profile(args.books, args.loans)))
+        return
+
+    results = {}
+    for profile in args.profiles.split(","):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ)
+            env["SQLITE_PROFILE"] = profile
+            env["DATABASE_PATH"] = os.path.join(tmp, "bench.db")
+            env.setdefault("JWT_SECRET_KEY", "benchmark-only-secret-key-not-for-production")
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child",
+                 "--books", str(args.books), "--loans", str(args.loans)],
+                env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+            )
+            results[profile] = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"{'profil':<12} {'loan p50/p95 (ms)':>20} {'return p50/p95 (ms)':>22} {'list_books p50/p95 (ms)':>26}")
+    for profile, r in results.items():
+        cols = [f"{r[k]['p50']:.2f} / {r[k]['p95']:.2f}" for k in ("loan", "return", "list_books")]
+        print(f"{profile:<12} {cols[0]:>20} {cols[1]:>22} {cols[2]:>26}")
+
+
+if __name__ == "__main__":
+    main()
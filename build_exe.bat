@@ -29,6 +29,7 @@ pyinstaller --onefile --name Biblioteka ^
     --hidden-import=app.routes.reports ^
     --hidden-import=app.routes.settings ^
     --hidden-import=app.routes.import_export ^
+    --hidden-import=app.routes.search ^
     launcher.py
 
 echo.
@@ -8,8 +8,7 @@ const API = '';
 let CONFIG = {
     currency: "RSD",
     language: "sr",
-    currencies: {},
-    languages: {},
+    translation_versions: {},
     translations: {},
     library_name: "Biblioteka",
 };
@@ -20,12 +19,22 @@ let SESSION_WARNING_MINUTES = 5;
 let sessionTimeoutId;
 let sessionWarningId;
 
+// Load a language's translation bundle; the versioned URL is cached by the browser for good
+async function loadTranslations(language, versions) {
+    if (!versions) return {};
+    if (!versions[language]) language = 'sr';  // same fallback as the server
+    if (!versions[language]) return {};
+    const res = await fetch(`${API}/settings/public/translations/${language}?v=${versions[language]}`);
+    return res.ok ? res.json() : {};
+}
+
 // Load all public configuration from server
 async function loadPublicConfig() {
     try {
         const res = await fetch(API + '/settings/public/config');
         if (res.ok) {
             const newConfig = await res.json();
+            newConfig.translations = await loadTranslations(newConfig.language, newConfig.translation_versions);
             
             // Keep user's selected language from localStorage, don't override
             const savedLanguage = localStorage.getItem('selected_language');
@@ -307,17 +316,15 @@ function initSidebar() {
     // Apply per-user nav permissions (async, non-blocking)
     if (!user.is_admin) applyNavPermissions();
 
-    // Load library name/logo
-    apiFetch('/settings').then(r => r.json()).then(s => {
-        const libName = document.getElementById('lib-name');
-        if (libName && s.library_name) libName.textContent = s.library_name;
-        const libLogo = document.getElementById('lib-logo');
-        if (libLogo && s.library_logo_path) {
-            libLogo.onload = () => { libLogo.style.display = ''; };
-            libLogo.onerror = () => { libLogo.style.display = 'none'; };
-            libLogo.src = s.library_logo_path + '?v=' + Date.now();
-        }
-    }).catch(() => {});
+    // Library name/logo from the public config (the logo URL carries its content hash)
+    const libName = document.getElementById('lib-name');
+    if (libName && CONFIG.library_name) libName.textContent = CONFIG.library_name;
+    const libLogo = document.getElementById('lib-logo');
+    if (libLogo && CONFIG.library_logo_url) {
+        libLogo.onload = () => { libLogo.style.display = ''; };
+        libLogo.onerror = () => { libLogo.style.display = 'none'; };
+        libLogo.src = CONFIG.library_logo_url;
+    }
 }
 
 // ============================================================
@@ -419,32 +426,20 @@ async function initBooksPage() {
         booksPage = 1;
         loadBooks();
     });
-
-    // Load genres for filter
-    try {
-        const res = await apiFetch('/books/genres');
-        const genres = await res.json();
-        const sel = document.getElementById('genre-filter');
-        if (sel) {
-            genres.forEach(g => {
-                const opt = document.createElement('option');
-                opt.value = g; opt.textContent = g;
-                sel.appendChild(opt);
-            });
-        }
-    } catch (e) {}
 }
 
 async function loadBooks() {
     const q = document.getElementById('book-search')?.value || '';
     const genre = document.getElementById('genre-filter')?.value || '';
-    let url = `/books?page=${booksPage}&per_page=50`;
+    let url = `/books/browse?page=${booksPage}&per_page=50`;
     if (q) url += `&q=${encodeURIComponent(q)}`;
     if (genre) url += `&genre=${encodeURIComponent(genre)}`;
 
     try {
         const res = await apiFetch(url);
-        const books = await res.json();
+        const data = await res.json();
+        const books = data.items;
+        renderGenreFacet(data.facets.genre, genre);
         const tbody = document.getElementById('books-tbody');
         if (!tbody) return;
         tbody.innerHTML = books.map(b => `
@@ -464,6 +459,19 @@ async function loadBooks() {
     }
 }
 
+function renderGenreFacet(buckets, selected) {
+    // Genre options come with the page (counted for the current search), no separate request
+    const sel = document.getElementById('genre-filter');
+    if (!sel) return;
+    while (sel.options.length > 1) sel.remove(1);
+    buckets.filter(f => f.value).forEach(f => {
+        const opt = document.createElement('option');
+        opt.value = f.value; opt.textContent = `${f.value} (${f.count})`;
+        sel.appendChild(opt);
+    });
+    sel.value = selected;
+}
+
 async function openBookDetail(bookId) {
     try {
         const res = await apiFetch(`/books/${bookId}`);
@@ -995,20 +1003,21 @@ async function initReservationsPage() {
     loadReservations('active');
 }
 
-async function loadReservations(status = 'active') {
-    // 'active' is frontend shorthand for waiting+notified combined
-    let url = '/reservations';
-    if (status && status !== 'active') url += `?status=${status}`;
+let reservationsCursor = null;
+
+async function loadReservations(status = 'active', more = false) {
+    // 'active' is shorthand for waiting+notified combined; pages of 50, newest first
+    const params = new URLSearchParams({ per_page: 50 });
+    if (status) params.set('status', status);
+    if (more && reservationsCursor) params.set('cursor', reservationsCursor);
     try {
-        const res = await apiFetch(url);
+        const res = await apiFetch(`/reservations?${params}`);
         if (!res) return;
-        const data = await res.json();
-        const rows = status === 'active'
-            ? data.filter(r => r.status === 'waiting' || r.status === 'notified')
-            : data;
+        const rows = await res.json();
+        reservationsCursor = res.headers.get('X-Next-Cursor');
         const tbody = document.getElementById('reservations-tbody');
         if (!tbody) return;
-        tbody.innerHTML = rows.map(r => `
+        const html = rows.map(r => `
             <tr>
                 <td>${r.book_title || '-'}</td>
                 <td>${r.member_name || '-'} (${r.member_number || ''})</td>
@@ -1023,14 +1032,26 @@ async function loadReservations(status = 'active') {
                 </td>
             </tr>
         `).join('');
-        if (rows.length === 0) {
-            tbody.innerHTML = `<tr><td colspan="6" class="empty-state">${t('no_results')}</td></tr>`;
+        if (more) {
+            tbody.insertAdjacentHTML('beforeend', html);
+        } else {
+            tbody.innerHTML = html;
+            if (rows.length === 0) {
+                tbody.innerHTML = `<tr><td colspan="6" class="empty-state">${t('no_results')}</td></tr>`;
+            }
         }
+        const moreBtn = document.getElementById('reservations-more');
+        if (moreBtn) moreBtn.style.display = reservationsCursor ? '' : 'none';
     } catch (e) {
         showToast(t('error'), 'error');
     }
 }
 
+function loadMoreReservations() {
+    const status = document.getElementById('reservation-filter')?.value ?? 'active';
+    loadReservations(status, true);
+}
+
 async function cancelReservation(id) {
     if (!confirm(t('confirm_delete'))) return;
     const res = await apiFetch(`/reservations/${id}/cancel`, { method: 'POST' });
@@ -1244,6 +1265,7 @@ async function loadSettings() {
     document.getElementById('setting-email-password').value = '';
     document.getElementById('setting-email-sender').value = data.email_sender_name || '';
     document.getElementById('setting-email-enabled').checked = data.email_enabled === 'true';
+    document.getElementById('setting-email-digest').checked = data.email_digest === 'true';
 
     // Membership prices
     try {
@@ -1295,6 +1317,7 @@ async function saveEmailSettings() {
     if (pwd) await saveSetting('email_smtp_password', pwd);
     await saveSetting('email_sender_name', document.getElementById('setting-email-sender').value);
     await saveSetting('email_enabled', document.getElementById('setting-email-enabled').checked ? 'true' : 'false');
+    await saveSetting('email_digest', document.getElementById('setting-email-digest').checked ? 'true' : 'false');
 }
 
 async function savePriceSettings() {
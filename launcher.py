@@ -2,9 +2,16 @@
 Biblioteka — System Tray Launcher
 Pokreće FastAPI server i prikazuje ikonicu u system tray-u.
 Dvostruki klik na ikonicu otvara aplikaciju u browseru.
+
+    Biblioteka.exe                # jedan proces (podrazumevano)
+    Biblioteka.exe --workers auto # jedan radni proces po jezgru procesora
+    Biblioteka.exe --workers 4
 """
 
+import argparse
+import multiprocessing
 import os
+import signal
 import sys
 import threading
 import webbrowser
@@ -26,10 +33,20 @@ def get_local_ip():
         return "127.0.0.1"
 
 
-def start_server():
-    """Start the uvicorn server."""
+def worker_count(value: str) -> int:
+    """'auto' = one worker per CPU core; the scheduler jobs still run in only one of them."""
+    if value == "auto":
+        return os.cpu_count() or 1
+    count = int(value)
+    if count < 1:
+        raise argparse.ArgumentTypeError("broj radnih procesa mora biti najmanje 1")
+    return count
+
+
+def start_server(workers: int = 1):
+    """Start the uvicorn server. With more than one worker this must run on the main thread."""
     import uvicorn
-    uvicorn.run("app.main:app", host=HOST, port=PORT, log_level="info")
+    uvicorn.run("app.main:app", host=HOST, port=PORT, log_level="info", workers=workers)
 
 
 def open_browser():
@@ -47,6 +64,12 @@ def main():
         from dotenv import load_dotenv
         load_dotenv(env_path)
 
+    parser = argparse.ArgumentParser(description="Biblioteka server")
+    parser.add_argument("--workers", type=worker_count, default=worker_count(os.environ.get("WORKERS", "1")),
+                        help="broj radnih procesa ili 'auto' (po jedan na jezgro); podrazumevano WORKERS ili 1")
+    args = parser.parse_args()
+    workers = args.workers
+
     local_ip = get_local_ip()
     print("=" * 50)
     print("  BIBLIOTEKA — Sistem upravljanja")
@@ -54,6 +77,7 @@ def main():
     print(f"  Lokalni pristup:  http://127.0.0.1:{PORT}")
     print(f"  Mrežni pristup:   http://{local_ip}:{PORT}")
     print(f"  API dokumentacija: http://127.0.0.1:{PORT}/docs")
+    print(f"  Radni procesi:     {workers}")
     print("=" * 50)
     print("  Login: admin / admin123")
     print("  (Promenite lozinku posle prvog logovanja!)")
@@ -80,7 +104,11 @@ def main():
 
         def on_quit(icon, item):
             icon.stop()
-            os._exit(0)
+            if workers > 1:
+                # let uvicorn's supervisor on the main thread stop the worker processes
+                signal.raise_signal(signal.SIGINT)
+            else:
+                os._exit(0)
 
         menu = pystray.Menu(
             pystray.MenuItem("Otvori u browseru", on_open, default=True),
@@ -91,15 +119,20 @@ def main():
 
         icon = pystray.Icon("Biblioteka", create_icon_image(), "Biblioteka", menu)
 
-        # Start server in background thread
-        server_thread = threading.Thread(target=start_server, daemon=True)
-        server_thread.start()
-
         # Open browser after a short delay
         threading.Timer(2.0, open_browser).start()
 
-        # Run tray icon (blocks)
-        icon.run()
+        if workers > 1:
+            # uvicorn's multi-process supervisor needs the main thread for its signal handlers
+            icon.run_detached()
+            start_server(workers)
+        else:
+            # Start server in background thread
+            server_thread = threading.Thread(target=start_server, daemon=True)
+            server_thread.start()
+
+            # Run tray icon (blocks)
+            icon.run()
 
     except ImportError:
         # pystray not installed — run without system tray
@@ -111,8 +144,10 @@ def main():
         threading.Timer(2.0, open_browser).start()
 
         # Start server (blocks)
-        start_server()
+        start_server(workers)
 
 
 if __name__ == "__main__":
+    # worker processes are spawned from the frozen executable too
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,86 @@
+"""
+Biblioteka — administrativne komande.
+
+    python manage.py rebuild-search       # ponovo izgradi indekse pretrage (knjige, članovi)
+    python manage.py reconcile-counters   # preračunaj brojače kontrolne table
+    python manage.py rebuild-circulation  # ponovo izgradi dnevnu statistiku pozajmica
+"""
+
+import argparse
+import os
+import sys
+
+
+def _load_env():
+    env_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", ".env")
+    if os.path.exists(env_path):
+        from dotenv import load_dotenv
+        load_dotenv(env_path)
+
+
+def rebuild_search(args):
+    from app.database import SessionLocal, init_db
+    from app.services.search import rebuild_book_index, rebuild_trigram_index, rebuild_member_index
+
+    init_db()
+    db = SessionLocal()
+    try:
+        books = rebuild_book_index(db)
+        rebuild_trigram_index(db)
+        members = rebuild_member_index(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Indeks pretrage izgrađen: {books} knjiga, {members} članova")
+
+
+def reconcile_counters(args):
+    from app.database import init_db
+    from app.services.counters import reconcile
+
+    init_db()
+    drift = reconcile()
+    if drift:
+        for name, (stored, actual) in sorted(drift.items()):
+            print(f"{name}: {stored} -> {actual}")
+    else:
+        print("Brojači su ispravni")
+
+
+def rebuild_circulation(args):
+    from app.database import SessionLocal, init_db
+    from app.services.circulation import TABLES, rebuild
+    from app.utils.cache import mark_changed
+
+    init_db()
+    db = SessionLocal()
+    try:
+        rows = rebuild(db.connection())
+        mark_changed(db, *TABLES)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Statistika pozajmica izgrađena: {rows} dnevnih zapisa po knjigama")
+
+
+COMMANDS = {
+    "rebuild-search": (rebuild_search, "Rebuild the catalog and member search indices"),
+    "reconcile-counters": (reconcile_counters, "Recompute the dashboard counters and report drift"),
+    "rebuild-circulation": (rebuild_circulation, "Rebuild the daily circulation rollups from the loans"),
+}
+
+
+def main():
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    _load_env()
+
+    parser = argparse.ArgumentParser(description="Biblioteka management commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        sub.add_parser(name, help=help_text)
+    args = parser.parse_args()
+    COMMANDS[args.command][0](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Shared fixtures: one application instance on a throwaway database for the
+whole run (the app's lifespan starts process-wide background threads, so
+it is entered once). Tests create the rows they need through the API.
+"""
+
+import itertools
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="biblioteka-tests-"), "test.db")
+os.environ["JWT_SECRET_KEY"] = "test-secret-key-not-for-production-use"
+os.environ["EMAIL_ENABLED"] = "False"
+# Keep background jobs and the data_versions poll quiet while tests count statements
+for _name in ("DATA_VERSION_POLL", "LEADER_HEARTBEAT", "OUTBOX_DISPATCH_INTERVAL", "DASHBOARD_RECONCILE_INTERVAL"):
+    os.environ[_name] = "3600"
+
+_numbers = itertools.count(1000)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth(client):
+    response = client.post("/auth/login", json={"username": "admin", "password": "admin"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": "Bearer " + response.json()["access_token"]}
+
+
+def _ok(response):
+    assert response.status_code < 400, (response.request.url, response.status_code, response.text)
+    return response.json()
+
+
+@pytest.fixture
+def make_book(client, auth):
+    def make(copies: int = 1, **fields) -> tuple:
+        """A book and its copies: (book, [copy, ...])."""
+        n = next(_numbers)
+        book = _ok(client.post("/books", json={"title": f"Knjiga {n}", "author": "Autor", **fields}, headers=auth))
+        made = [
+            _ok(client.post(f"/books/{book['id']}/copies", json={"library_number": f"INV-{n}-{i}"}, headers=auth))
+            for i in range(copies)
+        ]
+        return book, made
+    return make
+
+
+@pytest.fixture
+def make_member(client, auth):
+    def make(**fields) -> dict:
+        n = next(_numbers)
+        data = {"member_number": n, "first_name": "Ime", "last_name": f"Prezime{n}", **fields}
+        return _ok(client.post("/members", json=data, headers=auth))
+    return make
+
+
+@pytest.fixture
+def make_loan(client, auth):
+    def make(copy_id: int, member_id: int) -> dict:
+        return _ok(client.post("/loans", json={"copy_id": copy_id, "member_id": member_id}, headers=auth))
+    return make
+
+
+@pytest.fixture
+def standin():
+    """The in-process SMTP stand-in from benchmarks/, on a free local port."""
+    from benchmarks.smtp_standin import StandinSMTPServer
+
+    server = StandinSMTPServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def count_queries():
+    """with count_queries() as statements: ... — SQL statements sent on either engine."""
+    from sqlalchemy import event
+    from app.database import engine, read_engine
+
+    @contextmanager
+    def counting():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        for e in (engine, read_engine):
+            event.listen(e, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            for e in (engine, read_engine):
+                event.remove(e, "before_cursor_execute", record)
+    return counting
@@ -0,0 +1,47 @@
+"""A login records last_login without invalidating the cached principals of other users."""
+
+from app.database import SessionLocal
+from app.models.staff import Staff
+from app.utils.auth import principal_cache
+from app.utils.cache import table_versions
+
+
+def _login(client, username: str, password: str) -> str:
+    response = client.post("/auth/login", json={"username": username, "password": password})
+    assert response.status_code == 200, response.text
+    return response.json()["access_token"]
+
+
+def _last_login(username: str):
+    with SessionLocal() as db:
+        return db.query(Staff.last_login).filter(Staff.username == username).scalar()
+
+
+def test_login_keeps_other_principals_cached(client, auth):
+    token = auth["Authorization"].split(" ", 1)[1]
+    assert client.get("/auth/me", headers=auth).status_code == 200
+    assert principal_cache.get(token) is not None
+    versions = table_versions.get("staff")
+    before = _last_login("admin")
+
+    _login(client, "admin", "admin")
+
+    assert _last_login("admin") != before
+    assert table_versions.get("staff") == versions
+    assert principal_cache.get(token) is not None
+
+
+def test_staff_edit_still_invalidates(client, auth):
+    created = client.post("/auth/staff", json={"username": "blagajnik", "password": "lozinka123",
+                                               "full_name": "Blagajnik"}, headers=auth)
+    assert created.status_code == 200, created.text
+    token = _login(client, "blagajnik", "lozinka123")
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/auth/me", headers=headers).status_code == 200
+    versions = table_versions.get("staff")
+
+    response = client.put(f"/auth/staff/{created.json()['id']}", json={"is_active": False}, headers=auth)
+
+    assert response.status_code == 200, response.text
+    assert table_versions.get("staff") != versions
+    assert client.get("/auth/me", headers=headers).status_code == 401
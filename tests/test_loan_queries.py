@@ -0,0 +1,40 @@
+"""Loan list endpoints issue a fixed number of statements however many loans they return."""
+
+from sqlalchemy import text
+
+from app.database import SessionLocal
+
+N = 12
+
+
+def _make_overdue(loan_ids):
+    with SessionLocal() as db:
+        db.execute(text("UPDATE loans SET due_date = '2000-01-01' WHERE id IN (%s)"
+                        % ",".join(str(i) for i in loan_ids)))
+        db.commit()
+
+
+def _statements(client, auth, count_queries, url) -> tuple:
+    """(statements, rows) for one warm request."""
+    assert client.get(url, headers=auth).status_code == 200  # warm caches, mark overdue loans
+    with count_queries() as statements:
+        response = client.get(url, headers=auth)
+    assert response.status_code == 200
+    return len(statements), len(response.json())
+
+
+def test_loan_lists_use_constant_queries(client, auth, count_queries, make_book, make_member, make_loan):
+    urls = lambda member: ["/loans/active", "/loans/overdue", f"/members/{member['id']}/loans"]
+
+    _, copies = make_book(copies=N)
+    member = make_member()
+    _make_overdue([make_loan(copies[0]["id"], member["id"])["id"]])
+    small = {url: _statements(client, auth, count_queries, url) for url in urls(member)}
+
+    _make_overdue([make_loan(copy["id"], member["id"])["id"] for copy in copies[1:]])
+    large = {url: _statements(client, auth, count_queries, url) for url in urls(member)}
+
+    for url in urls(member):
+        (small_queries, small_rows), (large_queries, large_rows) = small[url], large[url]
+        assert large_rows - small_rows == N - 1, url
+        assert small_queries == large_queries, (url, small_queries, large_queries)
@@ -0,0 +1,61 @@
+"""Mailer against the in-process SMTP stand-in (benchmarks/smtp_standin.py)."""
+
+import time
+
+from app.services import mailer
+from app.services.mailer import Mailer
+
+
+def _config(server) -> dict:
+    return {
+        "enabled": True, "host": server.host, "port": server.port, "starttls": False,
+        "user": "biblioteka@example.com", "password": "secret", "sender_name": "Biblioteka",
+    }
+
+
+def _messages(n: int) -> list:
+    return [(f"clan{i}@example.com", "Podsetnik", "Rok za vraćanje knjige ističe sutra.") for i in range(n)]
+
+
+def test_one_session_per_worker_for_a_whole_run(standin):
+    with Mailer(_config(standin), workers=2, rate=0) as m:
+        results = m.send_many(_messages(20))
+
+    assert results == [(True, None)] * 20
+    assert standin.messages == 20
+    assert standin.connections <= 2
+    assert standin.logins == standin.connections
+
+
+def test_reconnects_after_the_server_drops_the_session(standin):
+    with Mailer(_config(standin), workers=1, rate=0) as m:
+        assert m.send_many(_messages(3)) == [(True, None)] * 3
+        standin.drop_connections()
+        assert m.send_many(_messages(3)) == [(True, None)] * 3
+
+    assert standin.messages == 6
+    assert standin.connections == 2
+    assert standin.logins == 2
+
+
+def test_rate_limit_caps_messages_per_second(standin):
+    rate, n = 20, 11
+    started = time.monotonic()
+    with Mailer(_config(standin), workers=4, rate=rate) as m:
+        results = m.send_many(_messages(n))
+    elapsed = time.monotonic() - started
+
+    assert all(ok for ok, _ in results)
+    # n messages are spaced 1/rate apart: n - 1 gaps
+    assert elapsed >= (n - 1) / rate * 0.95
+
+
+def test_fails_fast_after_consecutive_failures(standin):
+    standin.reject = True
+    with Mailer(_config(standin), workers=1, rate=0) as m:
+        results = m.send_many(_messages(mailer.MAX_CONSECUTIVE_FAILURES + 5))
+
+    assert not any(ok for ok, _ in results)
+    assert all(error for _, error in results)
+    # each failing send connects twice (one reconnect); after the limit nothing connects at all
+    assert standin.connections == 2 * mailer.MAX_CONSECUTIVE_FAILURES
@@ -0,0 +1,11 @@
+def test_update_member_with_numeric_member_number(client, auth, make_member):
+    member = make_member()
+
+    # the edit form sends member_number as a number
+    response = client.put(f"/members/{member['id']}", json={"member_number": 987654, "first_name": "Nova"},
+                          headers=auth)
+
+    assert response.status_code == 200, response.text
+    assert response.json()["member_number"] == "987654"
+    found = client.get("/members?q=987654", headers=auth).json()
+    assert [m["id"] for m in found] == [member["id"]]
@@ -0,0 +1,148 @@
+"""Notification outbox: idempotency keys, retry backoff, dead letters and transactional enqueue."""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.database import SessionLocal
+from app.models.notification import Notification
+from app.models.notification_outbox import NotificationOutbox
+from app.models.staff import Staff
+from app.routes import loans
+from app.services import outbox
+
+_keys = iter(range(10 ** 6))
+
+
+@pytest.fixture
+def email(client, auth, standin):
+    """Email enabled and pointed at the SMTP stand-in for the duration of a test."""
+    settings = {
+        "email_smtp_host": standin.host, "email_smtp_port": str(standin.port), "email_smtp_starttls": "false",
+        "email_smtp_user": "biblioteka@example.com", "email_smtp_password": "secret", "email_enabled": "true",
+    }
+    for key, value in settings.items():
+        assert client.put("/settings", json={"key": key, "value": value}, headers=auth).status_code == 200
+    yield standin
+    assert client.put("/settings", json={"key": "email_enabled", "value": "false"}, headers=auth).status_code == 200
+
+
+def _message(key: str) -> dict:
+    return {"idempotency_key": key, "trigger_type": "test", "entity_id": 1, "member_id": 1,
+            "email_to": "clan@example.com", "subject": "Test", "body": "Poruka"}
+
+
+def _enqueue(key: str):
+    with SessionLocal() as db:
+        outbox.enqueue(db, [_message(key)])
+        db.commit()
+
+
+def _row(key: str) -> NotificationOutbox:
+    with SessionLocal() as db:
+        return db.query(NotificationOutbox).filter(NotificationOutbox.idempotency_key == key).one()
+
+
+def _make_due(key: str, **values):
+    with SessionLocal() as db:
+        db.query(NotificationOutbox).filter(NotificationOutbox.idempotency_key == key).update(
+            {NotificationOutbox.next_attempt_at: datetime.utcnow() - timedelta(seconds=1), **values})
+        db.commit()
+
+
+def test_enqueue_with_the_same_key_is_a_noop(client):
+    key = f"test:{next(_keys)}"
+    _enqueue(key)
+    with SessionLocal() as db:
+        outbox.enqueue(db, [{**_message(key), "subject": "Drugi put"}])
+        db.commit()
+        rows = db.query(NotificationOutbox).filter(NotificationOutbox.idempotency_key == key).all()
+
+    assert [row.subject for row in rows] == ["Test"]
+
+
+def test_failed_send_is_rescheduled_with_growing_backoff(email):
+    email.reject = True
+    key = f"test:{next(_keys)}"
+    _enqueue(key)
+
+    delays = []
+    for attempt in (1, 2, 3):
+        _make_due(key)
+        before = datetime.utcnow()
+        outbox.dispatch_due()
+        row = _row(key)
+        assert (row.status, row.attempts) == ("pending", attempt)
+        assert row.last_error
+        delays.append(row.next_attempt_at - before)
+
+    assert delays[0] > timedelta(0)
+    assert delays[0] < delays[1] < delays[2]
+
+
+def test_message_goes_dead_after_max_attempts(email):
+    email.reject = True
+    key = f"test:{next(_keys)}"
+    _enqueue(key)
+    _make_due(key, attempts=outbox.OUTBOX_MAX_ATTEMPTS - 1)
+
+    outbox.dispatch_due()
+
+    row = _row(key)
+    assert (row.status, row.attempts) == ("dead", outbox.OUTBOX_MAX_ATTEMPTS)
+    _make_due(key)
+    outbox.dispatch_due()
+    assert _row(key).attempts == outbox.OUTBOX_MAX_ATTEMPTS  # dead messages are not retried
+    with SessionLocal() as db:
+        history = db.query(Notification).filter(Notification.trigger_type == "test",
+                                                Notification.subject == "Test",
+                                                Notification.success == False).count()
+    assert history >= 1
+
+
+def _reserved_loan(client, auth, make_book, make_member, make_loan):
+    """A loaned copy whose book has a waiting reservation: (loan, reservation)."""
+    book, (copy,) = make_book()
+    loan = make_loan(copy["id"], make_member()["id"])
+    waiting = make_member(email="rezervacija@example.com")
+    reservation = client.post("/reservations", json={"book_id": book["id"], "member_id": waiting["id"]},
+                              headers=auth)
+    assert reservation.status_code == 200, reservation.text
+    return loan, reservation.json()
+
+
+def _queued(reservation_id: int) -> list:
+    with SessionLocal() as db:
+        return db.query(NotificationOutbox).filter(
+            NotificationOutbox.idempotency_key == f"reservation_available:{reservation_id}").all()
+
+
+def test_return_enqueues_reservation_available(client, auth, email, make_book, make_member, make_loan):
+    loan, reservation = _reserved_loan(client, auth, make_book, make_member, make_loan)
+
+    response = client.post(f"/loans/{loan['id']}/return", headers=auth)
+
+    assert response.json()["reservation_notified"] == reservation["id"]
+    assert [row.email_to for row in _queued(reservation["id"])] == ["rezervacija@example.com"]
+
+
+def test_rolled_back_return_leaves_no_outbox_row(client, auth, email, make_book, make_member, make_loan):
+    loan, reservation = _reserved_loan(client, auth, make_book, make_member, make_loan)
+
+    db = SessionLocal()
+    try:
+        def fail():
+            raise RuntimeError("commit failed")
+        db.commit = fail  # the return fails at its commit, after the message was queued
+        admin = db.query(Staff).filter(Staff.username == "admin").one()
+        with pytest.raises(RuntimeError):
+            loans.return_loan(loan["id"], SimpleNamespace(client=None), current_user=admin, db=db)
+        assert db.query(NotificationOutbox).filter(
+            NotificationOutbox.idempotency_key == f"reservation_available:{reservation['id']}").count() == 1
+        db.rollback()
+    finally:
+        db.close()
+
+    assert _queued(reservation["id"]) == []
+    assert client.get(f"/members/{loan['member_id']}/loans", headers=auth).json()[0]["status"] == "active"
@@ -0,0 +1,44 @@
+"""Rebuilds of the typeahead index for other workers' writes are coalesced."""
+
+import threading
+import time
+
+from app.services.typeahead import CoalescedRebuild
+
+
+def _counting():
+    runs = []
+    done = threading.Event()
+
+    def rebuild():
+        runs.append(time.monotonic())
+        done.set()
+    return runs, done, rebuild
+
+
+def test_a_burst_of_changes_rebuilds_once():
+    runs, done, rebuild = _counting()
+    coalesced = CoalescedRebuild(rebuild, interval=0.3)
+
+    for _ in range(50):
+        coalesced.request({"books"})
+    assert done.wait(2)
+    time.sleep(0.1)
+
+    assert len(runs) == 1
+
+
+def test_rebuilds_are_spaced_by_the_interval():
+    runs, done, rebuild = _counting()
+    coalesced = CoalescedRebuild(rebuild, interval=0.3)
+
+    coalesced.request({"members"})
+    assert done.wait(2)
+    done.clear()
+    for _ in range(10):
+        coalesced.request({"members"})
+    assert done.wait(2)
+    time.sleep(0.1)
+
+    assert len(runs) == 2
+    assert runs[1] - runs[0] >= 0.29